@@ -0,0 +1,127 @@
+"""A fake Storm peer for benchmarking pyleus components in-process.
+
+The peer writes to a temporary file everything Storm would send to a shell
+component (handshake, tuples and heartbeats) so that the component under test
+can read it through its real serializer, while everything the component
+writes back is counted by :class:`CountingStream`.
+"""
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+
+import msgpack
+
+try:
+    import simplejson as json
+    _ = json # pyflakes
+except ImportError:
+    import json
+
+
+def _tuple_command(i, values):
+    return {
+        'id': str(i),
+        'comp': "spout",
+        'stream': "default",
+        'task': 1,
+        'tuple': values,
+    }
+
+
+def _heartbeat_command():
+    return {
+        'id': None,
+        'comp': None,
+        'stream': "__heartbeat",
+        'task': -1,
+        'tuple': [],
+    }
+
+
+def storm_messages(pid_dir, n_tuples, values, heartbeat_every=100):
+    """Yield the messages Storm sends to a bolt: the setup info followed by
+    ``n_tuples`` tuples, interleaved with a heartbeat every
+    ``heartbeat_every`` tuples.
+    """
+    yield {'pidDir': pid_dir, 'conf': {}, 'context': {}}
+    for i in range(n_tuples):
+        if heartbeat_every and i % heartbeat_every == 0:
+            yield _heartbeat_command()
+        yield _tuple_command(i, values)
+
+
+def encode_msgpack(messages):
+    return b"".join(msgpack.packb(msg, use_bin_type=True) for msg in messages)
+
+
+def encode_json(messages):
+    return b"".join(
+        (json.dumps(msg) + "\nend\n").encode("utf-8") for msg in messages)
+
+
+class CountingStream(object):
+    """Output stream writing to /dev/null through a regular buffered file,
+    like stdout would, and counting writes, flushes and bytes.
+    """
+
+    def __init__(self):
+        self.writes = 0
+        self.flushes = 0
+        self.bytes = 0
+        self._devnull = open(os.devnull, "wb")
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes += len(data)
+        self._devnull.write(data)
+
+    def flush(self):
+        self.flushes += 1
+        self._devnull.flush()
+
+    def close(self):
+        self._devnull.close()
+
+
+class FakeStorm(object):
+    """Context manager feeding a component with the messages Storm would send
+    to it, encoded with ``encode``.
+    """
+
+    def __init__(self, encode, n_tuples, values, heartbeat_every=100):
+        self._encode = encode
+        self._n_tuples = n_tuples
+        self._values = values
+        self._heartbeat_every = heartbeat_every
+        self.pid_dir = None
+        self.input_stream = None
+        self.output_stream = None
+
+    def __enter__(self):
+        self.pid_dir = tempfile.mkdtemp()
+        self.input_stream = tempfile.TemporaryFile()
+        self.input_stream.write(self._encode(storm_messages(
+            self.pid_dir, self._n_tuples, self._values,
+            self._heartbeat_every)))
+        self.input_stream.seek(0)
+        self.output_stream = CountingStream()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.output_stream.close()
+        self.input_stream.close()
+        shutil.rmtree(self.pid_dir)
+
+
+def run_component(component_cls, fake_storm, pyleus_config):
+    """Run a component against a fake Storm peer until input is exhausted."""
+    component = component_cls(input_stream=fake_storm.input_stream,
+                              output_stream=fake_storm.output_stream)
+    component.options = {}
+    component.pyleus_config = pyleus_config
+    component.initialize_serializer()
+    component.setup_component()
+    component.run_component()
+    return component
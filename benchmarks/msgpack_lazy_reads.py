@@ -0,0 +1,77 @@
+"""Compare the eager msgpack input reader, decoding whole messages, against
+the lazy one reading tuples as LazyStormTuple, for small and big tuples,
+with the tuple values left alone or accessed.
+
+Input is fed from memory in chunks of the default read size, so that only
+the parsing is measured. Set MSGPACK_PUREPYTHON=1 to benchmark the pure
+Python msgpack implementation instead of the C extension.
+
+Usage: python -m benchmarks.msgpack_lazy_reads [N_TUPLES]
+"""
+from __future__ import absolute_import, print_function
+
+import sys
+import time
+
+import msgpack
+
+from pyleus.storm import StormWentAwayError
+from pyleus.storm.serializers import msgpack_serializer
+
+# Values of the tuples, and how many of them to read relatively to N_TUPLES
+TUPLES = {
+    'small': (["word", 42], 1),
+    'big': (["x" * 1000, {'key': "value", 'values': list(range(100))}], 0.1),
+    'huge': ([[{'key': "value", 'values': list(range(100))}] * 100], 0.01),
+}
+
+
+def _chunks(data, read_size):
+    for i in range(0, len(data), read_size):
+        yield data[i:i + read_size]
+
+
+def bench(name, generator_factory, values, access, n_tuples):
+    msg = {
+        'id': "1234567890",
+        'comp': "spout",
+        'stream': "default",
+        'task': 3,
+        'tuple': values,
+    }
+    data = msgpack.packb(msg, use_bin_type=True) * n_tuples
+    chunks = list(_chunks(data, msgpack_serializer.DEFAULT_READ_SIZE))
+
+    start = time.time()
+    try:
+        for message in generator_factory(iter(chunks)):
+            if access:
+                if isinstance(message, dict):
+                    message['tuple']
+                else:
+                    message.values
+    except StormWentAwayError:
+        pass
+    elapsed = time.time() - start
+
+    print("  {0:<6} {1:<16} s: {2:7.3f}  tuples/s: {3:10.0f}".format(
+        name, "values accessed" if access else "values ignored", elapsed,
+        n_tuples / elapsed))
+
+
+def main():
+    n_tuples = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print("msgpack implementation: {0}".format(msgpack.Unpacker.__module__))
+    for size in ("small", "big", "huge"):
+        values, ratio = TUPLES[size]
+        n = max(1, int(n_tuples * ratio))
+        print("{0} tuples".format(size))
+        for access in (False, True):
+            bench("eager", msgpack_serializer._messages_generator,
+                  values, access, n)
+            bench("lazy", msgpack_serializer._lazy_messages_generator,
+                  values, access, n)
+
+
+if __name__ == '__main__':
+    main()
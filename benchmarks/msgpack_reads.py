@@ -0,0 +1,93 @@
+"""Compare memory churn of the msgpack input reader against the previous
+implementation allocating a new bytes object for every os.read() call.
+
+Messages are written by a thread into a pipe, the way Storm feeds the stdin of
+a shell component. For each reader we report throughput and the minor page
+faults per MiB ingested: large short-lived allocations are served by mmap(2),
+so every os.read() of a big chunk faults fresh pages in, while reading into
+the same buffer does not.
+
+Usage: python -m benchmarks.msgpack_reads [MIB_INGESTED]
+"""
+from __future__ import absolute_import, print_function
+
+import os
+import resource
+import sys
+import threading
+import time
+
+import msgpack
+
+from pyleus.storm import StormWentAwayError
+from pyleus.storm.serializers import msgpack_serializer
+from pyleus.storm.serializers.serializer import read_chunks
+
+MIB = 1024 ** 2
+
+
+def _legacy_messages_generator(input_stream, read_size):
+    unpacker = msgpack.Unpacker(encoding="latin1")
+    while True:
+        line = os.read(input_stream.fileno(), read_size)
+        if not line:
+            raise StormWentAwayError()
+        unpacker.feed(line)
+        for i in unpacker:
+            yield i
+
+
+def _readinto_messages_generator(input_stream, read_size):
+    return msgpack_serializer._messages_generator(
+        read_chunks(input_stream, read_size))
+
+
+def _feed(write_fd, chunk, n_chunks):
+    with os.fdopen(write_fd, "wb") as f:
+        for _ in range(n_chunks):
+            f.write(chunk)
+
+
+def bench(name, generator_factory, mib, read_size):
+    msg = {
+        'id': "1234567890",
+        'comp': "spout",
+        'stream': "default",
+        'task': 3,
+        'tuple': ["x" * 1000, 42],
+    }
+    chunk = msgpack.packb(msg, use_bin_type=True) * 1000
+    n_chunks = max(1, mib * MIB // len(chunk))
+
+    read_fd, write_fd = os.pipe()
+    feeder = threading.Thread(target=_feed,
+                              args=(write_fd, chunk, n_chunks))
+    feeder.start()
+
+    with os.fdopen(read_fd, "rb") as input_stream:
+        faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+        start = time.time()
+        try:
+            for _ in generator_factory(input_stream, read_size):
+                pass
+        except StormWentAwayError:
+            pass
+        elapsed = time.time() - start
+        faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults
+
+    feeder.join()
+
+    ingested = float(len(chunk) * n_chunks) / MIB
+    print("{0:<10} MiB/s: {1:8.1f}  minor faults/MiB: {2:8.1f}".format(
+        name, ingested / elapsed, faults / ingested))
+
+
+def main():
+    mib = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    read_size = msgpack_serializer.DEFAULT_READ_SIZE
+    bench("os.read", _legacy_messages_generator, mib, read_size)
+    bench("readinto", _readinto_messages_generator, mib, read_size)
+
+
+if __name__ == '__main__':
+    main()
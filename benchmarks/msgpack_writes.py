@@ -0,0 +1,53 @@
+"""Count output writes per tuple of a one-emit-per-input SimpleBolt running
+against a fake Storm peer, with and without msgpack output buffering.
+
+Usage: python -m benchmarks.msgpack_writes [N_TUPLES]
+"""
+from __future__ import absolute_import, print_function
+
+import logging
+import sys
+import time
+
+from pyleus.storm import SimpleBolt
+
+from benchmarks.fake_storm import FakeStorm
+from benchmarks.fake_storm import encode_msgpack
+from benchmarks.fake_storm import run_component
+
+
+class EchoBolt(SimpleBolt):
+
+    def process_tuple(self, tup):
+        self.emit(tup.values, anchors=[tup], need_task_ids=False)
+
+
+def bench(n_tuples, serializer_options):
+    with FakeStorm(encode_msgpack, n_tuples, ["word", 42]) as fake_storm:
+        start = time.time()
+        run_component(EchoBolt, fake_storm, {
+            'serializer': "msgpack",
+            'serializer_options': serializer_options,
+        })
+        elapsed = time.time() - start
+
+    out = fake_storm.output_stream
+    print("{0:<30} writes/tuple: {1:6.3f}  flushes/tuple: {2:6.3f}  "
+          "tuples/s: {3:10.0f}".format(
+              str(serializer_options),
+              float(out.writes) / n_tuples,
+              float(out.flushes) / n_tuples,
+              n_tuples / elapsed))
+
+
+def main():
+    # Silence the "Disconnected from Storm" warning at the end of each run
+    logging.disable(logging.WARNING)
+
+    n_tuples = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    bench(n_tuples, {})
+    bench(n_tuples, {'buffered': True})
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ import random
 import os
 import tempfile
 
-from pyleus.storm import Spout
+from pyleus.storm import BufferedSpout
 
 log = logging.getLogger('counter')
 
@@ -43,14 +43,15 @@ quis iaculis ante pharetra id. In
 """.strip().split('\n')
 
 
-class LineSpout(Spout):
+class LineSpout(BufferedSpout):
 
     OUTPUT_FIELDS = ["line"]
 
-    def next_tuple(self):
-        line = random.choice(LINES)
-        log.debug(line)
-        self.emit((line,), tup_id=random.randrange(999999999))
+    def generate(self):
+        while True:
+            line = random.choice(LINES)
+            log.debug(line)
+            yield (line,), random.randrange(999999999)
 
 
 if __name__ == '__main__':
@@ -14,9 +14,8 @@ class SplitWordsBolt(SimpleBolt):
     def process_tuple(self, tup):
         line, = tup.values
         log.debug(line)
-        for word in line.split():
-            log.debug(word)
-            self.emit((word,), anchors=[tup])
+        self.emit_many(
+            [(word,) for word in line.split()], anchors=[tup])
 
 
 if __name__ == '__main__':
@@ -1,8 +1,11 @@
 from __future__ import absolute_import
 
-import pkg_resources
+import os
 
 __version__ = '0.3.0'
 
 BASE_JAR = "pyleus-base.jar"
-BASE_JAR_PATH = pkg_resources.resource_filename('pyleus', BASE_JAR)
+# Not looked up with pkg_resources, which is slow to import and missing from
+# virtualenvs without setuptools, since components import this package too
+BASE_JAR_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), BASE_JAR)
@@ -0,0 +1,12 @@
+"""This module is used only by pyleus.cli.build._resolve_serializer_protocol
+to load a serializer inside the topology virtualenv, where packages providing
+serializers are installed, and print the Storm multilang protocol it speaks.
+"""
+from __future__ import absolute_import, print_function
+
+import sys
+
+from pyleus.storm.serializers import load_serializer
+
+if __name__ == '__main__':
+    print(load_serializer(sys.argv[1]).PROTOCOL)
@@ -0,0 +1,348 @@
+"""Bolt and Spout components driven by an `asyncio`_ event loop, whose
+processing methods are coroutines. A single component can then wait on many
+network calls at once.
+
+They require Python 3.7 or later: older interpreters cannot even import this
+module, since it uses the ``async``/``await`` syntax.
+
+.. _asyncio: https://docs.python.org/3/library/asyncio.html
+"""
+from __future__ import absolute_import
+
+import asyncio
+import logging
+import threading
+
+from .storm import Bolt
+from .storm import Spout
+from .storm import StormWentAwayError
+from .storm import is_heartbeat
+from .storm import is_tick
+from .storm.instrumentation import clock
+
+log = logging.getLogger(__name__)
+
+
+def _timed(instrumentation, phase, coroutine_function):
+    """Return a wrapper of coroutine_function recording how long each
+    coroutine takes to complete.
+    """
+    histogram = instrumentation.histograms[phase]
+
+    async def timed_coroutine_function(*args):
+        start = clock()
+        try:
+            return await coroutine_function(*args)
+        finally:
+            histogram.record(clock() - start)
+
+    return timed_coroutine_function
+
+
+class _AsyncComponentMixin(object):
+    """Event loop machinery shared by :class:`~.AsyncBolt` and
+    :class:`~.AsyncSpout`.
+
+    A reader thread blocks on the input stream and hands every message over
+    to the event loop. Task ids resolve the pending emits right away, while
+    commands are queued in ``_pending_commands`` and dispatched as coroutines,
+    at most ``MAX_IN_FLIGHT`` at a time. The reader thread keeps reading
+    while all the slots are busy, so that heartbeats are still answered: only
+    the dispatch of the other commands is held back. All the output is
+    written from the event loop thread.
+    """
+
+    #: ``int`` maximum number of coroutines running at the same time.
+    MAX_IN_FLIGHT = 100
+
+    # The reader thread would race with the event loop on the output buffer
+    SUPPORTS_BUFFERED_SERIALIZER = False
+
+    def _init_event_loop(self, loop):
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self.MAX_IN_FLIGHT)
+        self._commands_ready = asyncio.Event()
+        self._read_error = None
+        # Keep a reference to running tasks, the event loop does not
+        self._tasks = set()
+
+    def run_component(self):
+        """Run the event loop until Storm goes away."""
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run_async(loop))
+        except StormWentAwayError:
+            log.warning("Disconnected from Storm. Exiting.")
+        finally:
+            loop.close()
+
+    async def _run_async(self, loop):
+        self._init_event_loop(loop)
+
+        reader = threading.Thread(target=self._read_loop)
+        # Do not hang on exit because of a thread blocked reading from Storm
+        reader.daemon = True
+        reader.start()
+
+        try:
+            while True:
+                msg = await self._next_command()
+                await self._dispatch(msg)
+        finally:
+            tasks = list(self._tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _read_loop(self):
+        """Reader thread main loop."""
+        try:
+            while True:
+                msg = self._serializer.read_msg()
+                self._loop.call_soon_threadsafe(self._handle_msg, msg)
+        except Exception as e:
+            try:
+                self._loop.call_soon_threadsafe(self._handle_read_error, e)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+    def _handle_msg(self, msg):
+        if self._msg_is_taskid(msg):
+            self._pending_taskids.append(msg)
+            self._resolve_taskids()
+        else:
+            self._enqueue_command(msg)
+
+    def _enqueue_command(self, msg):
+        """Queue a command to be dispatched."""
+        self._pending_commands.append(msg)
+        self._commands_ready.set()
+
+    def _handle_read_error(self, e):
+        self._read_error = e
+        self._commands_ready.set()
+
+    async def _next_command(self):
+        while not self._pending_commands:
+            if self._read_error is not None:
+                raise self._read_error
+            self._commands_ready.clear()
+            await self._commands_ready.wait()
+
+        return self._pending_commands.popleft()
+
+    async def _dispatch(self, msg):
+        """Handle a command read from Storm.
+
+        .. note:: Implement in AsyncBolt and AsyncSpout.
+        """
+        raise NotImplementedError
+
+    async def _spawn(self, coro):
+        """Wait for a free slot, then run coro in a new task."""
+        await self._slots.acquire()
+        task = self._loop.create_task(self._run_in_slot(coro))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_in_slot(self, coro):
+        try:
+            await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Exception in {0} coroutine".format(
+                self.COMPONENT_TYPE))
+        finally:
+            self._slots.release()
+
+    def _to_asyncio_future(self, future):
+        aio_future = self._loop.create_future()
+
+        def set_result(task_ids):
+            if not aio_future.done():
+                aio_future.set_result(task_ids)
+
+        future.add_done_callback(set_result)
+        return aio_future
+
+    def _send_emit(self, command_dict, need_task_ids, pipelined):
+        """Send an emit command and return an ``asyncio.Future`` for the task
+        ids the tuple has been sent to, if needed.
+        """
+        future = super(_AsyncComponentMixin, self)._send_emit(
+            command_dict, need_task_ids, True)
+        if future is None:
+            return None
+
+        return self._to_asyncio_future(future)
+
+    def _send_emits(self, command_dicts, need_task_ids, pipelined):
+        """Send several emit commands at once and return the list of
+        ``asyncio.Future`` for the task ids each tuple has been sent to, if
+        needed.
+        """
+        futures = super(_AsyncComponentMixin, self)._send_emits(
+            command_dicts, need_task_ids, True)
+        if futures is None:
+            return None
+
+        return [self._to_asyncio_future(future) for future in futures]
+
+
+class AsyncBolt(_AsyncComponentMixin, Bolt):
+    """A Bolt whose process_tuple() and process_tick() are coroutines,
+    processing up to ``MAX_IN_FLIGHT`` tuples at the same time and
+    automatically acking/failing them as soon as they are processed.
+
+    Heartbeats are answered as soon as they are read, even while all the
+    slots are busy.
+
+    :meth:`~pyleus.storm.bolt.Bolt.emit` and
+    :meth:`~pyleus.storm.bolt.Bolt.emit_many` return an ``asyncio.Future``
+    for the task ids, or a ``list`` of them, unless ``need_task_ids`` is
+    ``False``:
+
+    .. code-block:: python
+
+       task_ids = await self.emit((word,), anchors=[tup])
+    """
+
+    async def process_tuple(self, tup):
+        """Process the incoming tuple.
+
+        :param tup: pyleus tuple representing the message to be processed
+        :type tup: :class:`~pyleus.storm.StormTuple`
+
+        .. note:: Implement in subclass.
+        """
+        pass
+
+    async def process_tick(self):
+        """Code to be executed when a tick tuple reaches the component.
+
+        .. note:: Implement in subclass."""
+        pass
+
+    def _enqueue_command(self, msg):
+        """Answer heartbeats right away, queue the other tuples."""
+        tup = self._to_storm_tuple(msg)
+        if is_heartbeat(tup):
+            self.sync()
+        else:
+            super(AsyncBolt, self)._enqueue_command(tup)
+
+    def _instrument(self, instrumentation):
+        """Time the tuples processed by _process_tuple_async(), until they
+        are processed.
+        """
+        super(AsyncBolt, self)._instrument(instrumentation)
+        self._process_tuple_async = _timed(
+            instrumentation, 'process', self._process_tuple_async)
+
+    def _add_builtin_metrics(self, instrumentation):
+        """Count the tuples processed by _process_tuple_async()."""
+        super(AsyncBolt, self)._add_builtin_metrics(instrumentation)
+
+        process_tuple_async = self._process_tuple_async
+        counters = instrumentation.counters
+
+        async def counted_process_tuple_async(tup):
+            counters['tuples'] += 1
+            await process_tuple_async(tup)
+
+        self._process_tuple_async = counted_process_tuple_async
+
+    async def _dispatch(self, tup):
+        await self._spawn(self._process_tuple_async(tup))
+
+    async def _process_tuple_async(self, tup):
+        try:
+            if is_tick(tup):
+                await self.process_tick()
+            else:
+                await self.process_tuple(tup)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Failing tuple {0}".format(tup.id))
+            self.fail(tup)
+        else:
+            self.ack(tup)
+
+
+class AsyncSpout(_AsyncComponentMixin, Spout):
+    """A Spout whose next_tuple(), ack() and fail() are coroutines. Storm is
+    told it can send the next command as soon as the coroutine for the
+    current one is started, as long as fewer than ``MAX_IN_FLIGHT`` are
+    running.
+
+    :meth:`~pyleus.storm.spout.Spout.emit` and
+    :meth:`~pyleus.storm.spout.Spout.emit_many` return an ``asyncio.Future``
+    for the task ids, or a ``list`` of them, unless ``need_task_ids`` is
+    ``False``.
+    """
+
+    async def next_tuple(self):
+        """Emit the next tuple into the topology.
+
+        .. note:: Implement in subclass.
+        """
+        pass
+
+    async def ack(self, tup_id):
+        """Ack a tuple to the source.
+
+        :param tup_id: tuple identifier
+        :type tup_id: ``str`` or ``long``
+
+        .. note:: Implement in subclass. Default behaviour is ``pass``.
+        """
+        pass
+
+    async def fail(self, tup_id):
+        """Fail a tuple to the source.
+
+        :param tup_id: tuple identifier
+        :type tup_id: ``str`` or ``long``
+
+        .. note:: Implement in subclass. Default behaviour is ``pass``.
+        """
+        pass
+
+    def _instrument(self, instrumentation):
+        """Time the commands handled by _handle_command_async(), until
+        they are handled.
+        """
+        super(AsyncSpout, self)._instrument(instrumentation)
+        self._handle_command_async = _timed(
+            instrumentation, 'process', self._handle_command_async)
+
+    def _add_builtin_metrics(self, instrumentation):
+        """Count the tuples acked or failed by _handle_command_async()."""
+        super(AsyncSpout, self)._add_builtin_metrics(instrumentation)
+
+        handle_command_async = self._handle_command_async
+
+        async def counted_handle_command_async(msg):
+            instrumentation.count_commands(msg['command'])
+            await handle_command_async(msg)
+
+        self._handle_command_async = counted_handle_command_async
+
+    async def _dispatch(self, msg):
+        if msg['command'] in ('next', 'ack', 'fail'):
+            await self._spawn(self._handle_command_async(msg))
+
+        self._sync()
+
+    async def _handle_command_async(self, msg):
+        command = msg['command']
+
+        if command == 'next':
+            await self.next_tuple()
+        elif command == 'ack':
+            await self.ack(msg['id'])
+        elif command == 'fail':
+            await self.fail(msg['id'])
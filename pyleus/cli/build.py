@@ -7,17 +7,27 @@ from __future__ import absolute_import
 
 import glob
 import logging
+import multiprocessing
 import os
 import re
 import shutil
 import tempfile
 import yaml
 import zipfile
+import zlib
 
 from pyleus import __version__
+from pyleus.cli.build_cache import VirtualenvCache
+from pyleus.cli.build_cache import venv_cache_key
+from pyleus.cli.jar import JarWriter
+from pyleus.cli.jar import file_crc32
+from pyleus.cli.jar import read_raw_entry
 from pyleus.cli.topology_spec import TopologySpec
 from pyleus.compat import StringIO
 from pyleus.storm.component import DESCRIBE_OPT
+from pyleus.storm.serializers import PROTOCOLS
+from pyleus.storm.serializers import SERIALIZERS
+from pyleus.exception import ConfigurationError
 from pyleus.exception import InvalidTopologyError
 from pyleus.exception import JarError
 from pyleus.utils import expand_path
@@ -48,31 +58,119 @@ def _open_jar(base_jar):
     return zip_file
 
 
-def _zip_dir(src, arc):
-    """Build a zip archive from the specified src.
+def _unchanged_entry(previous_jar, path, arcname):
+    """Return the ZipInfo of the entry of previous_jar holding the same
+    content as the file at path, if any.
+    """
+    try:
+        info = previous_jar.getinfo(arcname.replace(os.sep, "/"))
+    except KeyError:
+        return None
+    if (info.file_size != os.path.getsize(path) or
+            info.CRC != file_crc32(path)):
+        return None
+    return info
+
+
+def _zip_dir(src, writer, previous_jar=None):
+    """Add the content of the specified src to a jar through writer, a
+    JarWriter.
+
+    If previous_jar is given, the entries of the files whose content did not
+    change since it was built are copied from it without being compressed
+    again.
+    """
+    previous_fp = None
+    if previous_jar is not None:
+        previous_fp = open(previous_jar.filename, "rb")
+
+    try:
+        src_re = re.compile(re.escape(src + os.sep) + "*")
+        for root, dirs, files in os.walk(src):
+            # hack for copying everything but the top directory
+            prefix = re.sub(src_re, "", root)
+            for f in files:
+                path = os.path.join(root, f)
+                arcname = os.path.join(prefix, f)
+                if previous_fp is not None:
+                    info = _unchanged_entry(previous_jar, path, arcname)
+                    if info is not None:
+                        writer.add_raw(info, read_raw_entry(previous_fp, info))
+                        continue
+                # zipfile creates directories if missing
+                writer.add_file(path, arcname)
+    finally:
+        if previous_fp is not None:
+            try:
+                # Entries waiting to be written are read from previous_fp
+                writer.flush()
+            finally:
+                previous_fp.close()
+
 
-    Note: If the archive already exists, files will be simply
-    added to it, but the original archive will not be replaced.
+def _copy_jar_entries(zip_file, writer):
+    """Add all the entries of zip_file to a jar through writer, as they are
+    stored.
     """
-    src_re = re.compile(re.escape(src + os.sep) + "*")
-    for root, dirs, files in os.walk(src):
-        # hack for copying everything but the top directory
-        prefix = re.sub(src_re, "", root)
-        for f in files:
-            # zipfile creates directories if missing
-            arc.write(os.path.join(root, f), os.path.join(prefix, f),
-                      zipfile.ZIP_DEFLATED)
-
-
-def _pack_jar(tmp_dir, output_jar):
-    """Build a jar from the temporary directory."""
+    with open(zip_file.filename, "rb") as fp:
+        try:
+            for info in zip_file.infolist():
+                writer.add_raw(info, read_raw_entry(fp, info))
+        finally:
+            # Entries waiting to be written are read from fp
+            writer.flush()
+
+
+def _write_jar(tmp_dir, output_jar, base_jar, previous_jar, compress_level,
+               compress_workers):
     zf = zipfile.ZipFile(output_jar, "w")
     try:
-        _zip_dir(tmp_dir, zf)
+        writer = JarWriter(zf, level=compress_level, workers=compress_workers)
+        try:
+            if base_jar is not None:
+                _copy_jar_entries(base_jar, writer)
+            _zip_dir(tmp_dir, writer, previous_jar)
+        finally:
+            writer.close()
     finally:
         zf.close()
 
 
+def _pack_jar(tmp_dir, output_jar, base_jar=None, incremental=False,
+              compress_level=zlib.Z_DEFAULT_COMPRESSION, compress_workers=1):
+    """Build a jar from the temporary directory, compressing files with
+    compress_level in compress_workers threads.
+
+    If base_jar, an open ZipFile, is given, its entries are copied first as
+    they are stored, without being extracted and compressed again.
+
+    If incremental is True and output_jar already exists, reuse its entries
+    for the files that did not change, then replace it.
+    """
+    if not incremental or not zipfile.is_zipfile(output_jar):
+        _write_jar(tmp_dir, output_jar, base_jar, None, compress_level,
+                   compress_workers)
+        return
+
+    log.debug("Updating {0}".format(output_jar))
+    tmp_jar = output_jar + ".tmp"
+    previous_jar = zipfile.ZipFile(output_jar, "r")
+    try:
+        _write_jar(tmp_dir, tmp_jar, base_jar, previous_jar, compress_level,
+                   compress_workers)
+    except Exception:
+        if os.path.exists(tmp_jar):
+            os.remove(tmp_jar)
+        raise
+    finally:
+        previous_jar.close()
+
+    if os.name == 'nt':
+        # Windows does not replace existing files on rename
+        os.remove(output_jar)
+    os.rename(tmp_jar, output_jar)
+
+
 def _validate_venv(topology_dir, venv):
     """Ensure that VIRTUALENV does not exist inside the directory"""
     if os.path.exists(venv):
@@ -107,33 +205,85 @@ def _remove_pyleus_base_jar(venv):
 
 def _set_up_virtualenv(venv_name, tmp_dir, req,
                        include_packages, system_site_packages,
-                       pypi_index_url, python_interpreter, verbose):
+                       pypi_index_url, python_interpreter, verbose,
+                       cache=None, wheelhouse=None, update_wheelhouse=False):
     """Create a virtualenv with the specified options and the default packages
     specified in configuration. Then run `pip install -r [requirements file]`.
+
+    If a wheelhouse directory is given, install everything at once from the
+    wheels it holds, without accessing the package index, after storing the
+    wheels of all the packages and their dependencies into it if
+    update_wheelhouse is True.
+
+    If a cache is given, reuse the virtualenv it holds for the same options
+    and requirements instead, or cache the new one.
     """
-    venv = VirtualenvProxy(
-        os.path.join(tmp_dir, venv_name),
+    venv_path = os.path.join(tmp_dir, venv_name)
+    venv_options = dict(
         system_site_packages=system_site_packages,
         pypi_index_url=pypi_index_url,
         python_interpreter=python_interpreter,
-        verbose=verbose
+        verbose=verbose,
     )
 
+    def cache_key():
+        return venv_cache_key(
+            req, include_packages, system_site_packages, pypi_index_url,
+            python_interpreter, wheelhouse)
+
+    # The wheelhouse is about to change, so the virtualenv too
+    if cache is not None and not update_wheelhouse:
+        if cache.get(cache_key(), venv_path):
+            return VirtualenvProxy(venv_path, create=False, **venv_options)
+
+    venv = VirtualenvProxy(venv_path, **venv_options)
+
     packages = ["pyleus=={0}".format(__version__)]
     if include_packages is not None:
         packages += include_packages
 
-    for package in packages:
-        venv.install_package(package)
+    if wheelhouse is not None:
+        if update_wheelhouse:
+            venv.download_wheels(packages, req, wheelhouse)
+        venv.install_from_wheelhouse(packages, req, wheelhouse)
+    else:
+        for package in packages:
+            venv.install_package(package)
 
-    if req is not None:
-        venv.install_from_requirements(req)
+        if req is not None:
+            venv.install_from_requirements(req)
 
     _remove_pyleus_base_jar(venv)
 
+    if cache is not None:
+        cache.put(cache_key(), venv_path)
+
     return venv
 
 
+def _resolve_serializer_protocol(spec, venv, resources_dir):
+    """Find out which Storm multilang protocol the serializer speaks when it
+    is not named after it. Serializers that are not built into pyleus are
+    loaded inside the virtualenv.
+    """
+    serializer = getattr(spec, "serializer", None)
+    if serializer is None or serializer in PROTOCOLS:
+        return
+
+    if serializer in SERIALIZERS:
+        protocol = SERIALIZERS[serializer].PROTOCOL
+    else:
+        protocol = venv.execute_module(module="pyleus._serializer_protocol",
+                                       args=[serializer],
+                                       cwd=resources_dir).strip()
+    if protocol not in PROTOCOLS:
+        raise InvalidTopologyError(
+            "Serializer {0} uses an unsupported protocol. Allowed: {1}."
+            " Found: {2}".format(serializer, list(PROTOCOLS), protocol))
+
+    spec.serializer_protocol = protocol
+
+
 def _assemble_full_topology_yaml(spec, venv, resources_dir):
     """Assemble a full version of the topology yaml file given by the user
     adding to it the information coming from the python source files.
@@ -183,14 +333,20 @@ def _copy_dir_content(src, dst, exclude):
 
 def _create_pyleus_jar(original_topology_spec, topology_dir, base_jar,
                        output_jar, zip_file, tmp_dir, include_packages,
-                       system_site_packages, pypi_index_url, verbose):
+                       system_site_packages, pypi_index_url, verbose,
+                       venv_cache=None, wheelhouse=None,
+                       update_wheelhouse=False, incremental=False,
+                       compress_level=zlib.Z_DEFAULT_COMPRESSION,
+                       compress_workers=1):
     """Coordinate the creation of the the topology JAR:
 
         - Validate the topology
-        - Extract the base JAR into a temporary directory
-        - Copy all source files into the directory
-        - If using virtualenv, create it and install dependencies
-        - Re-pack the temporary directory into the final JAR
+        - Copy all source files into a temporary directory
+        - If using virtualenv, create it and install dependencies, or reuse
+          the cached one
+        - Pack the base JAR entries as they are and the temporary directory
+          into the final JAR, or only the files that changed since the
+          previous build if incremental is True
     """
     requirements_filename = original_topology_spec.requirements_filename
     if not requirements_filename:
@@ -205,10 +361,8 @@ def _create_pyleus_jar(original_topology_spec, topology_dir, base_jar,
 
     _validate_venv(topology_dir, venv)
 
-    # Extract pyleus base jar content in a tmp dir
-    zip_file.extractall(tmp_dir)
-
-    # Create resources directory
+    # Only the resources are staged in the tmp dir, the entries of the pyleus
+    # base jar are copied directly from it when packing
     resources_dir = os.path.join(tmp_dir, RESOURCES_PATH)
     os.mkdir(resources_dir)
 
@@ -227,7 +381,15 @@ def _create_pyleus_jar(original_topology_spec, topology_dir, base_jar,
         system_site_packages=system_site_packages,
         pypi_index_url=pypi_index_url,
         python_interpreter=python_interpreter,
-        verbose=verbose)
+        verbose=verbose,
+        cache=venv_cache,
+        wheelhouse=wheelhouse,
+        update_wheelhouse=update_wheelhouse)
+
+    _resolve_serializer_protocol(
+        spec=original_topology_spec,
+        venv=venv,
+        resources_dir=resources_dir)
 
     # Assemble the full version of the topolgy yaml file from the user yaml and
     # the python code
@@ -241,8 +403,10 @@ def _create_pyleus_jar(original_topology_spec, topology_dir, base_jar,
     with open(jar_yaml, 'w') as f:
         f.write(new_yaml)
 
-    # Pack the tmp directory into a jar
-    _pack_jar(tmp_dir, output_jar)
+    # Pack the base jar and the tmp directory into a jar
+    _pack_jar(tmp_dir, output_jar, base_jar=zip_file, incremental=incremental,
+              compress_level=compress_level,
+              compress_workers=compress_workers)
 
 
 def _build_output_path(output_arg, topology_name):
@@ -282,6 +446,28 @@ def build_topology_jar(configs):
     if configs.include_packages is not None:
         include_packages = configs.include_packages.split(" ")
 
+    wheelhouse = None
+    if configs.wheelhouse is not None:
+        wheelhouse = expand_path(configs.wheelhouse)
+        if not configs.update_wheelhouse and not os.path.isdir(wheelhouse):
+            raise ConfigurationError(
+                "Wheelhouse directory not found: {0}. Run with "
+                "--update-wheelhouse to fill it".format(wheelhouse))
+    elif configs.update_wheelhouse:
+        raise ConfigurationError(
+            "No wheelhouse directory set in the configuration")
+
+    venv_cache = None
+    if not configs.no_cache:
+        venv_cache = VirtualenvCache(
+            expand_path(configs.build_cache_dir),
+            int(configs.build_cache_size) * 1024 ** 2)
+
+    compress_workers = configs.compress_workers
+    if compress_workers is None:
+        compress_workers = multiprocessing.cpu_count()
+    compress_workers = int(compress_workers)
+
     # Open the base jar as a zip
     zip_file = _open_jar(base_jar)
 
@@ -300,6 +486,12 @@ def build_topology_jar(configs):
                 system_site_packages=configs.system_site_packages,
                 pypi_index_url=configs.pypi_index_url,
                 verbose=configs.verbose,
+                venv_cache=venv_cache,
+                wheelhouse=wheelhouse,
+                update_wheelhouse=configs.update_wheelhouse,
+                incremental=configs.incremental,
+                compress_level=int(configs.compress_level),
+                compress_workers=compress_workers,
             )
         finally:
             shutil.rmtree(tmp_dir)
@@ -0,0 +1,233 @@
+"""Local cache of the virtualenvs built by pyleus build.
+
+A virtualenv only depends on the inputs hashed by :func:`venv_cache_key`, so
+topologies sharing them reuse the same virtualenv instead of installing all
+their dependencies again. Cached virtualenvs are hard-linked into the build
+directory when possible, copied otherwise, and the least recently used ones
+are evicted once the cache grows bigger than its maximum size.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+from pyleus import __version__
+
+# Name of the file holding the size in bytes of a cache entry, written last
+SIZE_FILENAME = "size"
+VENV_DIRNAME = "venv"
+
+# Entries being filled by a build
+TMP_PREFIX = ".tmp-"
+# Age in seconds after which an entry still being filled has been abandoned
+TMP_MAX_AGE = 24 * 60 * 60
+
+# Requirements file options including other files
+_INCLUDE_RE = re.compile(
+    r"^\s*(?:-r|--requirement|-c|--constraint)(?:\s+|=)(\S+)")
+
+log = logging.getLogger(__name__)
+
+
+def _requirements_contents(req, seen=None):
+    """Return the contents of the requirements file req, followed by the
+    ones of the requirements and constraints files it includes.
+    """
+    if seen is None:
+        seen = set()
+    req = os.path.realpath(req)
+    if req in seen:
+        return b""
+    seen.add(req)
+
+    with open(req, "rb") as f:
+        contents = f.read()
+
+    included = []
+    for line in contents.decode("utf-8", "replace").splitlines():
+        match = _INCLUDE_RE.match(line)
+        if match:
+            path = os.path.join(os.path.dirname(req), match.group(1))
+            if os.path.isfile(path):
+                included.append(_requirements_contents(path, seen))
+    return contents + b"".join(included)
+
+
+def _interpreter_id(python_interpreter):
+    """Identify the interpreter a virtualenv is built with by its resolved
+    path and modification time, which changes when it is upgraded.
+    """
+    if python_interpreter is None:
+        path = sys.executable
+    else:
+        path = _which(python_interpreter) or python_interpreter
+    path = os.path.realpath(path)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    return [path, mtime]
+
+
+def _which(program):
+    if os.path.dirname(program):
+        return program
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        path = os.path.join(directory, program)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def _wheelhouse_contents(wheelhouse):
+    """Return the names of the wheels in wheelhouse, which include their
+    versions.
+    """
+    if wheelhouse is None or not os.path.isdir(wheelhouse):
+        return None
+    return sorted(os.listdir(wheelhouse))
+
+
+def venv_cache_key(req, include_packages, system_site_packages,
+                   pypi_index_url, python_interpreter, wheelhouse=None):
+    """Return the hash of everything the content of a topology virtualenv
+    depends on.
+    """
+    inputs = {
+        "interpreter": _interpreter_id(python_interpreter),
+        "pyleus": __version__,
+        "include_packages": list(include_packages or []),
+        "system_site_packages": bool(system_site_packages),
+        "pypi_index_url": pypi_index_url,
+        "wheelhouse": _wheelhouse_contents(wheelhouse),
+    }
+    digest = hashlib.sha256(
+        json.dumps(inputs, sort_keys=True).encode("utf-8"))
+    if req is not None:
+        digest.update(_requirements_contents(req))
+    return digest.hexdigest()
+
+
+def _link_tree(src, dst):
+    """Recreate the directory tree src as dst, hard-linking files when
+    possible and copying them otherwise. Symlinks are preserved.
+
+    :return: total size in bytes of the files
+    """
+    size = 0
+    os.makedirs(dst)
+    for root, dirs, files in os.walk(src):
+        dst_root = os.path.join(dst, os.path.relpath(root, src))
+        for name in list(dirs):
+            src_path = os.path.join(root, name)
+            if os.path.islink(src_path):
+                # os.walk does not follow it, handle it like a file
+                files.append(name)
+            else:
+                os.mkdir(os.path.join(dst_root, name))
+        for name in files:
+            src_path = os.path.join(root, name)
+            dst_path = os.path.join(dst_root, name)
+            if os.path.islink(src_path):
+                os.symlink(os.readlink(src_path), dst_path)
+                continue
+            try:
+                os.link(src_path, dst_path)
+            except OSError:
+                shutil.copy2(src_path, dst_path)
+            size += os.path.getsize(src_path)
+    return size
+
+
+class VirtualenvCache(object):
+    """Virtualenvs by cache key in cache_dir, which holds at most max_size
+    bytes of them.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _entry_size(self, entry_path):
+        """Return the size of a complete entry, None for an incomplete one."""
+        try:
+            with open(os.path.join(entry_path, SIZE_FILENAME)) as f:
+                return int(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+
+    def get(self, key, dst):
+        """Link the virtualenv cached under key to dst.
+
+        :return: whether the virtualenv was found
+        """
+        entry_path = self._entry_path(key)
+        if self._entry_size(entry_path) is None:
+            return False
+
+        log.debug("Using cached virtualenv {0}".format(entry_path))
+        _link_tree(os.path.join(entry_path, VENV_DIRNAME), dst)
+        # The modification time of an entry is its last use
+        os.utime(entry_path, None)
+        return True
+
+    def put(self, key, src):
+        """Cache the virtualenv src under key, then evict the least recently
+        used virtualenvs if the cache is too big.
+        """
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # Fill the entry aside, so that concurrent builds never see it
+        # incomplete
+        tmp_path = tempfile.mkdtemp(dir=self.cache_dir, prefix=TMP_PREFIX)
+        try:
+            size = _link_tree(src, os.path.join(tmp_path, VENV_DIRNAME))
+            with open(os.path.join(tmp_path, SIZE_FILENAME), "w") as f:
+                f.write(str(size))
+            os.rename(tmp_path, self._entry_path(key))
+        except OSError:
+            # Most likely cached by a concurrent build in the meantime
+            log.debug("Failed to cache virtualenv {0}".format(key),
+                      exc_info=True)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Remove the least recently used entries, other than keep, until
+        the cache holds at most max_size bytes.
+        """
+        entries = []
+        total_size = 0
+        for key in os.listdir(self.cache_dir):
+            entry_path = self._entry_path(key)
+            size = self._entry_size(entry_path)
+            if size is None:
+                if (key.startswith(TMP_PREFIX) and
+                        time.time() - os.path.getmtime(entry_path) >
+                        TMP_MAX_AGE):
+                    shutil.rmtree(entry_path, ignore_errors=True)
+                continue
+            total_size += size
+            if key != keep:
+                entries.append((os.path.getmtime(entry_path), size, key))
+
+        entries.sort()
+        for _, size, key in entries:
+            if total_size <= self.max_size:
+                break
+            log.debug("Evicting cached virtualenv {0}".format(key))
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            total_size -= size
@@ -35,6 +35,20 @@ class BuildSubCommand(SubCommand):
             "-s", "--system-site-packages", dest="system_site_packages",
             action="store_true",
             help="Do not install packages already present on your system.")
+        parser.add_argument(
+            "--no-cache", dest="no_cache", action="store_true",
+            help="Build the virtualenv from scratch instead of reusing a "
+            "cached one, and do not cache it.")
+        parser.add_argument(
+            "--update-wheelhouse", dest="update_wheelhouse",
+            action="store_true",
+            help="Store the wheels of all the packages to install into the "
+            "wheelhouse directory set in the configuration before "
+            "installing them from it.")
+        parser.add_argument(
+            "--incremental", dest="incremental", action="store_true",
+            help="Update the existing output jar, only compressing the files "
+            "that changed since it was built.")
 
     def run(self, configs):
         build_topology_jar(configs)
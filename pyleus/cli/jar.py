@@ -0,0 +1,304 @@
+"""Low level helpers writing jar entries.
+
+Entries are compressed by :class:`~.JarWriter` outside of the zipfile module,
+in a pool of threads if ``concurrent.futures`` is available, then written as
+they are stored. Entries of another jar can also be copied as they are stored,
+without decompressing and compressing their content again.
+
+The zipfile module does not provide this, so entries are read from the jar
+file directly, and written through the internals of ZipFile. Should these
+internals be missing, entries are decompressed and written through the public
+API of ZipFile instead.
+"""
+from __future__ import absolute_import, division
+
+from collections import deque
+import copy
+import os
+import struct
+import sys
+import time
+import zipfile
+import zlib
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # Python 2 without the futures backport: compress in the calling thread
+    ThreadPoolExecutor = None
+
+# Local file header: signature, ..., file name length, extra field length
+_LOCAL_HEADER = struct.Struct("<4s22xHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\003\004"
+
+# General purpose flag telling that the sizes and CRC follow the data
+_DATA_DESCRIPTOR_FLAG = 0x08
+
+_CHUNK_SIZE = 1024 * 1024
+
+# ZipFile internals write_raw_entry() writes entries through, as
+# ZipFile.write() does. start_dir, the end of the last entry, does not exist
+# in Python 2.
+_ZIPFILE_INTERNALS = ("fp", "filelist", "NameToInfo", "_didModify",
+                      "_writecheck")
+if sys.version_info >= (3,):
+    _ZIPFILE_INTERNALS += ("start_dir",)
+
+#: Extensions of the files stored without compression, since their content
+#: is already compressed
+STORED_EXTENSIONS = frozenset([
+    ".bz2", ".egg", ".gif", ".gz", ".jar", ".jpeg", ".jpg", ".lzma", ".png",
+    ".tgz", ".whl", ".xz", ".zip",
+])
+
+# Files bigger than this are stored if a sample of their content does not
+# compress to less than _MAX_SAMPLE_RATIO of its size
+_SAMPLE_MIN_FILE_SIZE = 64 * 1024
+_SAMPLE_SIZE = 16 * 1024
+_MAX_SAMPLE_RATIO = 0.9
+
+# Oldest date a zip entry can hold
+_MIN_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def file_crc32(path):
+    """Return the CRC-32 of the content of a file, as stored in zip
+    entries.
+    """
+    crc = 0
+    with open(path, "rb") as f:
+        chunk = f.read(_CHUNK_SIZE)
+        while chunk:
+            crc = zlib.crc32(chunk, crc)
+            chunk = f.read(_CHUNK_SIZE)
+    return crc & 0xffffffff
+
+
+def read_raw_entry(fp, info):
+    """Return an iterator over the compressed data of the entry described by
+    the ZipInfo info, read in chunks from fp, a binary file object of its jar.
+
+    fp must stay open until the iterator is exhausted. Each chunk is read at
+    its own offset, so that fp can be shared by several iterators.
+    """
+    fp.seek(info.header_offset)
+    signature, name_length, extra_length = _LOCAL_HEADER.unpack(
+        fp.read(_LOCAL_HEADER.size))
+    if signature != _LOCAL_HEADER_SIGNATURE:
+        raise ValueError("Bad local file header for {0}".format(info.filename))
+    offset = fp.tell() + name_length + extra_length
+    return _read_chunks(fp, offset, info.compress_size)
+
+
+def _read_chunks(fp, offset, size):
+    """Yield size bytes of fp from offset in chunks."""
+    while size > 0:
+        fp.seek(offset)
+        chunk = fp.read(min(size, _CHUNK_SIZE))
+        if not chunk:
+            raise ValueError("Unexpected end of file")
+        offset += len(chunk)
+        size -= len(chunk)
+        yield chunk
+
+
+def _has_zipfile_internals(zip_file):
+    """Tell whether zip_file has the internals write_raw_entry() relies
+    on.
+    """
+    return all(hasattr(zip_file, name) for name in _ZIPFILE_INTERNALS)
+
+
+def write_raw_entry(zip_file, info, raw):
+    """Append to zip_file, opened for writing on a seekable file, an entry
+    described by the ZipInfo info whose compressed data is raw, either bytes
+    or an iterable of bytes.
+    """
+    if isinstance(raw, bytes):
+        raw = [raw]
+    if not _has_zipfile_internals(zip_file):
+        _write_entry(zip_file, info, raw)
+        return
+
+    info = copy.copy(info)
+    # The sizes and CRC are known, write them in the local header
+    info.flag_bits &= ~_DATA_DESCRIPTOR_FLAG
+
+    # What ZipFile.write() does after compressing
+    if getattr(zip_file, "_writing", False):
+        raise ValueError(
+            "Cannot write {0} while an entry is open for writing".format(
+                info.filename))
+    fp = zip_file.fp
+    if hasattr(zip_file, "start_dir"):
+        fp.seek(zip_file.start_dir)
+    info.header_offset = fp.tell()
+    zip_file._writecheck(info)
+    fp.write(info.FileHeader())
+    size = 0
+    for chunk in raw:
+        fp.write(chunk)
+        size += len(chunk)
+    if size != info.compress_size:
+        raise ValueError("{0} changed while being written".format(
+            info.filename))
+
+    zip_file.filelist.append(info)
+    zip_file.NameToInfo[info.filename] = info
+    zip_file.start_dir = fp.tell()
+    zip_file._didModify = True
+
+
+def _write_entry(zip_file, info, raw):
+    """Same as write_raw_entry() through the public API of ZipFile, which
+    compresses the content again.
+    """
+    info = copy.copy(info)
+    decompressor = None
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+    # Closing the entry sets the sizes of info to what was written
+    file_size = info.file_size
+    size = 0
+    with zip_file.open(info, "w") as f:
+        for chunk in raw:
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            f.write(chunk)
+            size += len(chunk)
+        if decompressor is not None:
+            chunk = decompressor.flush()
+            f.write(chunk)
+            size += len(chunk)
+    if size != file_size:
+        raise ValueError("{0} changed while being written".format(
+            info.filename))
+
+
+def _is_compressible(size, head):
+    """Guess whether a file of the given size is worth compressing from how
+    well a sample of head, its first bytes, compresses with the fastest
+    level.
+    """
+    if size < _SAMPLE_MIN_FILE_SIZE:
+        return True
+    sample = head[:_SAMPLE_SIZE]
+    return len(zlib.compress(sample, 1)) < len(sample) * _MAX_SAMPLE_RATIO
+
+
+def _read_file(path):
+    """Yield the content of the file at path in chunks."""
+    with open(path, "rb") as f:
+        chunk = f.read(_CHUNK_SIZE)
+        while chunk:
+            yield chunk
+            chunk = f.read(_CHUNK_SIZE)
+
+
+def compress_file(path, arcname, level=zlib.Z_DEFAULT_COMPRESSION,
+                  stored_extensions=STORED_EXTENSIONS):
+    """Return the ZipInfo and the compressed data of a jar entry named
+    arcname holding the content of the file at path, as ZipFile.write
+    would, except that the content is stored without compression if it
+    is already compressed.
+
+    The file is read in chunks. The compressed data is a list of chunks,
+    or a generator reading the file again when it is written if its content
+    is stored, so that big files are never held in memory.
+    """
+    st = os.stat(path)
+    date_time = max(time.localtime(st.st_mtime)[:6], _MIN_DATE_TIME)
+    info = zipfile.ZipInfo(arcname.replace(os.sep, "/"), date_time)
+    info.external_attr = (st.st_mode & 0xFFFF) << 16
+
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as f:
+        chunk = f.read(_CHUNK_SIZE)
+        if (level != 0 and extension not in stored_extensions and
+                _is_compressible(st.st_size, chunk)):
+            compressor = zlib.compressobj(
+                level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            raw = []
+            crc = 0
+            size = 0
+            while chunk:
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                raw.append(compressor.compress(chunk))
+                chunk = f.read(_CHUNK_SIZE)
+            raw.append(compressor.flush())
+
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.file_size = size
+            info.CRC = crc & 0xffffffff
+            info.compress_size = sum(len(piece) for piece in raw)
+            return info, raw
+
+    info.compress_type = zipfile.ZIP_STORED
+    info.file_size = info.compress_size = st.st_size
+    info.CRC = file_crc32(path)
+    return info, _read_file(path)
+
+
+class JarWriter(object):
+    """Add entries to zip_file, opened for writing, compressing files with
+    the given level in a pool of workers threads, or in the calling thread
+    without ``concurrent.futures``. Entries are written in the order they
+    were added.
+    """
+
+    def __init__(self, zip_file, level=zlib.Z_DEFAULT_COMPRESSION,
+                 workers=1, stored_extensions=STORED_EXTENSIONS):
+        self._zip_file = zip_file
+        self._level = level
+        self._stored_extensions = stored_extensions
+
+        self._executor = None
+        if workers > 1 and ThreadPoolExecutor is not None:
+            self._executor = ThreadPoolExecutor(workers)
+        # Bounds the memory held by entries waiting to be written
+        self._max_pending = 4 * workers
+        # Callables returning the ZipInfo and data of the entries to write
+        self._pending = deque()
+
+    def add_file(self, path, arcname):
+        """Add the file at path as arcname."""
+        args = (path, arcname, self._level, self._stored_extensions)
+        if self._executor is None:
+            self._write(*compress_file(*args))
+        else:
+            self._pending.append(
+                self._executor.submit(compress_file, *args).result)
+            self._flush(self._max_pending)
+
+    def add_raw(self, info, raw):
+        """Add an entry described by info, whose data is already
+        compressed.
+        """
+        if self._pending:
+            self._pending.append(lambda: (info, raw))
+            self._flush(self._max_pending)
+        else:
+            self._write(info, raw)
+
+    def _write(self, info, raw):
+        write_raw_entry(self._zip_file, info, raw)
+
+    def _flush(self, max_pending=0):
+        while len(self._pending) > max_pending:
+            self._write(*self._pending.popleft()())
+
+    def flush(self):
+        """Write the entries still pending, for instance before closing the
+        file their data is read from.
+        """
+        self._flush()
+
+    def close(self):
+        """Write the entries still pending. Does not close zip_file."""
+        try:
+            self._flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
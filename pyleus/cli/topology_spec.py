@@ -8,9 +8,11 @@ from __future__ import absolute_import
 
 import copy
 
+import six
+
 from pyleus.exception import InvalidTopologyError
 from pyleus.storm import DEFAULT_STREAM
-from pyleus.storm.component import SERIALIZERS
+from pyleus.storm.serializers import SERIALIZERS
 
 
 def _as_set(obj):
@@ -21,6 +23,13 @@ def _as_list(obj):
     return list() if obj is None else list(obj)
 
 
+def _verify_profiler(name, profiler):
+    if not isinstance(profiler, (bool, dict)):
+        raise InvalidTopologyError(
+            "[{0}] Profiler must be a boolean or a map of options."
+            " Found: {1}".format(name, profiler))
+
+
 class TopologySpec(object):
     """Topology level specification class."""
 
@@ -65,12 +74,37 @@ class TopologySpec(object):
             self.transfer_buffer_size = specs["transfer_buffer_size"]
 
         if "serializer" in specs:
-            if specs["serializer"] in SERIALIZERS:
+            # Serializers other than the built-in ones may come from the
+            # topology requirements, so they can only be resolved once the
+            # topology virtualenv is ready.
+            if (isinstance(specs["serializer"], six.string_types) and
+                    specs["serializer"]):
                 self.serializer = specs["serializer"]
             else:
                 raise InvalidTopologyError(
-                    "Unknown serializer. Allowed: {0}. Found: {1}"
-                    .format(SERIALIZERS, specs["serializer"]))
+                    "Unknown serializer. Allowed: {0}, an entry point name or"
+                    " a class path. Found: {1}"
+                    .format(list(SERIALIZERS), specs["serializer"]))
+
+        if "serializer_options" in specs:
+            if isinstance(specs["serializer_options"], dict):
+                self.serializer_options = specs["serializer_options"]
+            else:
+                raise InvalidTopologyError(
+                    "Serializer options must be a map. Found: {0}"
+                    .format(specs["serializer_options"]))
+
+        if "profiler" in specs:
+            _verify_profiler(self.name, specs["profiler"])
+            self.profiler = specs["profiler"]
+
+        if "instrumentation" in specs:
+            if isinstance(specs["instrumentation"], bool):
+                self.instrumentation = specs["instrumentation"]
+            else:
+                raise InvalidTopologyError(
+                    "Instrumentation must be a boolean. Found: {0}"
+                    .format(specs["instrumentation"]))
 
         self.requirements_filename = specs.get("requirements_filename")
         self.python_interpreter = specs.get("python_interpreter")
@@ -120,7 +154,7 @@ class ComponentSpec(object):
 
     KEYS_LIST = [
         "name", "type", "module", "tick_freq_secs", "parallelism_hint",
-        "options", "output_fields", "groupings", "tasks"]
+        "options", "output_fields", "groupings", "tasks", "profiler"]
 
     def __init__(self, specs):
         """Convert a component specs dictionary coming from the yaml file into
@@ -151,6 +185,9 @@ class ComponentSpec(object):
             self.parallelism_hint = specs["parallelism_hint"]
         if "tasks" in specs:
             self.tasks = specs["tasks"]
+        if "profiler" in specs:
+            _verify_profiler(self.name, specs["profiler"])
+            self.profiler = specs["profiler"]
 
         # These two are not currently specified in the yaml file
         self.options = specs.get("options", None)
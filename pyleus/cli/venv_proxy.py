@@ -80,8 +80,10 @@ class VirtualenvProxy(object):
                  pypi_index_url=None,
                  use_wheel=True,
                  python_interpreter=None,
-                 verbose=False):
-        """Creates the virtualenv with the options specified"""
+                 verbose=False,
+                 create=True):
+        """Creates the virtualenv with the options specified, unless create
+        is False, to use an existing one"""
         self.path = path
         self._system_site_packages = system_site_packages
         self._pypi_index_url = pypi_index_url
@@ -94,7 +96,8 @@ class VirtualenvProxy(object):
             self._out_stream = open(os.devnull, "w")
         self._err_stream = subprocess.STDOUT
 
-        self._create_virtualenv()
+        if create:
+            self._create_virtualenv()
 
     def _create_virtualenv(self):
         """Creates the actual virtualenv"""
@@ -156,6 +159,44 @@ class VirtualenvProxy(object):
             err_msg="Failed to install dependencies for this topology."
             " Run with --verbose for detailed info.")
 
+    def download_wheels(self, packages, req, wheelhouse):
+        """Interface to `pip wheel -w WHEELHOUSE PACKAGES -r REQUIREMENTS_FILE`
+
+        Resolve the packages and their dependencies, then store them as wheels
+        into the wheelhouse directory.
+        """
+        cmd = [self._get_path_to_bin('python'), "-m", "pip",
+               "wheel", "-w", wheelhouse] + list(packages)
+
+        if req is not None:
+            cmd += ["-r", req]
+
+        if self._pypi_index_url is not None:
+            cmd += ["-i", self._pypi_index_url]
+
+        _exec_shell_cmd(
+            cmd, stdout=self._out_stream, stderr=self._err_stream,
+            err_msg="Failed to download wheels into {0}."
+            " Run with --verbose for detailed info.".format(wheelhouse))
+
+    def install_from_wheelhouse(self, packages, req, wheelhouse):
+        """Interface to `pip install --no-index --find-links WHEELHOUSE
+        PACKAGES -r REQUIREMENTS_FILE`
+
+        Install all the packages at once, from the wheelhouse directory only.
+        """
+        cmd = [self._get_path_to_bin('python'), "-m", "pip",
+               "install", "--no-index", "--find-links", wheelhouse]
+        cmd += list(packages)
+
+        if req is not None:
+            cmd += ["-r", req]
+
+        _exec_shell_cmd(
+            cmd, stdout=self._out_stream, stderr=self._err_stream,
+            err_msg="Failed to install dependencies for this topology from"
+            " {0}. Run with --verbose for detailed info.".format(wheelhouse))
+
     def execute_module(self, module, args=None, cwd=None):
         """Call "virtualenv/interpreter -m" to execute a python module."""
         cmd = [self._get_path_to_bin("python"), "-m", module]
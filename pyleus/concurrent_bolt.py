@@ -0,0 +1,347 @@
+"""Bolt components processing tuples concurrently, either in a thread pool
+or in a pool of worker processes.
+
+On Python 2 it requires the `futures`_ backport of ``concurrent.futures``:
+without it, this module can be imported but its bolts cannot be created.
+
+.. _futures: https://pypi.python.org/pypi/futures
+"""
+from __future__ import absolute_import
+
+from collections import deque
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import six
+
+from .storm import Bolt
+from .storm import is_heartbeat
+from .storm import is_tick
+from .storm.instrumentation import clock
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    # Python 2 without the futures backport
+    ProcessPoolExecutor = None
+    ThreadPoolExecutor = None
+
+log = logging.getLogger(__name__)
+
+# Executors taking a multiprocessing context and a worker initializer
+_HAS_EXECUTOR_INITIALIZER = sys.version_info >= (3, 7)
+
+# ProcessPoolBolt instance, in its worker processes, and the pid of the
+# process it was initialized in
+_worker_bolt = None
+_worker_pid = None
+
+
+def _acquire(semaphore, timeout):
+    """Acquire semaphore, waiting at most timeout seconds. Return whether it
+    was acquired.
+    """
+    if not six.PY2:
+        return semaphore.acquire(timeout=timeout)
+
+    # Python 2 semaphores cannot wait with a timeout
+    deadline = time.time() + timeout
+    while not semaphore.acquire(False):
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class ConcurrentBolt(Bolt):
+    """A Bolt processing up to ``MAX_IN_FLIGHT`` tuples at the same time in a
+    thread pool, and automatically acking/failing them as soon as they are
+    processed. This is meant for bolts spending most of their time waiting
+    on I/O, e.g. querying an external service.
+
+    Implement process_tuple() and process_tick() as you would for a
+    :class:`~pyleus.storm.bolt.SimpleBolt`. They are called from the worker
+    threads, so they must be thread-safe. Tuples are acked as soon as
+    process_tuple() returns, or failed if it raises an exception, so they are
+    not acked in the order they were received.
+
+    Heartbeats are answered right away by the main thread. When all the
+    worker threads are busy for more than ``SLOT_TIMEOUT`` seconds, the main
+    thread keeps reading from Storm, answering heartbeats and holding the
+    other tuples back until a worker thread is free.
+
+    .. note::
+       Task ids cannot be read while the main thread is waiting for tuples,
+       so ``need_task_ids`` is not supported by :meth:`~.emit` and
+       :meth:`~.emit_many`. Buffered serializers are not supported either.
+    """
+
+    #: ``int`` maximum number of tuples processed at the same time.
+    MAX_IN_FLIGHT = 16
+
+    #: ``float`` number of seconds to wait for a worker to be free before
+    #: reading more messages from Storm, in order to answer heartbeats.
+    SLOT_TIMEOUT = 1.0
+
+    SUPPORTS_BUFFERED_SERIALIZER = False
+
+    def __init__(self, *args, **kwargs):
+        if ThreadPoolExecutor is None:
+            raise ImportError(
+                "{0} requires concurrent.futures, install the futures "
+                "backport on Python 2".format(type(self).__name__))
+        super(ConcurrentBolt, self).__init__(*args, **kwargs)
+
+        # Worker threads and main thread share the output stream
+        self._write_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.MAX_IN_FLIGHT)
+        self._executor = None
+        # Tuples read while waiting for a free slot
+        self._backlog = deque()
+
+    def process_tick(self):
+        """Code to be executed when a tick tuple reaches the component.
+
+        .. note:: Implement in subclass."""
+        pass
+
+    def run_component(self):
+        """ConcurrentBolt main loop, dispatching tuples to the thread pool."""
+        self._executor = self._create_executor()
+        try:
+            super(ConcurrentBolt, self).run_component()
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def _create_executor(self):
+        return ThreadPoolExecutor(max_workers=self.MAX_IN_FLIGHT)
+
+    def _instrument(self, instrumentation):
+        """Time the tuples processed in the executor rather than their
+        submission by _process_tuple().
+        """
+        process_tuple = self._process_tuple
+        super(ConcurrentBolt, self)._instrument(instrumentation)
+        self._process_tuple = process_tuple
+        self._process_in_executor = instrumentation.timed(
+            'process', self._process_in_executor)
+
+    def _process_tuple(self, tup):
+        """ConcurrentBolt middleware level tuple processing."""
+        if is_heartbeat(tup):
+            self.sync()
+            return
+
+        self._backlog.append(tup)
+        while self._backlog:
+            if not _acquire(self._slots, self.SLOT_TIMEOUT):
+                self._read_while_busy()
+                continue
+            try:
+                self._submit(self._backlog.popleft())
+            except:
+                self._slots.release()
+                raise
+
+    def _read_while_busy(self):
+        """Read the next message while all the slots are in use, answering
+        it right away if it is a heartbeat or holding it back otherwise.
+        """
+        tup = self.read_tuple()
+        if is_heartbeat(tup):
+            self.sync()
+        else:
+            self._backlog.append(tup)
+
+    def _submit(self, tup):
+        """Hand a tuple over to the executor, making sure the slot it uses
+        is released once it is processed.
+        """
+        self._executor.submit(self._process_in_executor, tup)
+
+    def _process_in_executor(self, tup):
+        try:
+            if is_tick(tup):
+                self.process_tick()
+            else:
+                self.process_tuple(tup)
+        except Exception:
+            log.exception("Failing tuple {0}".format(tup.id))
+            self.fail(tup)
+        else:
+            self.ack(tup)
+        finally:
+            self._slots.release()
+
+    def send_command(self, command, opts_dict=None):
+        """Same as :meth:`~pyleus.storm.component.Component.send_command`,
+        but safe to be called from several threads.
+        """
+        with self._write_lock:
+            super(ConcurrentBolt, self).send_command(command, opts_dict)
+
+    def send_commands(self, command, opts_dicts):
+        """Same as :meth:`~pyleus.storm.component.Component.send_commands`,
+        but safe to be called from several threads.
+        """
+        with self._write_lock:
+            super(ConcurrentBolt, self).send_commands(command, opts_dicts)
+
+    def emit(
+            self, values,
+            stream=None, anchors=None,
+            direct_task=None, need_task_ids=False):
+        """Same as :meth:`~pyleus.storm.bolt.Bolt.emit`, without task ids."""
+        if need_task_ids:
+            raise ValueError("ConcurrentBolt does not support need_task_ids")
+        return super(ConcurrentBolt, self).emit(
+            values, stream=stream, anchors=anchors, direct_task=direct_task,
+            need_task_ids=False)
+
+    def emit_many(
+            self, values_iterable,
+            stream=None, anchors=None,
+            direct_task=None, need_task_ids=False):
+        """Same as :meth:`~pyleus.storm.bolt.Bolt.emit_many`, without task
+        ids.
+        """
+        if need_task_ids:
+            raise ValueError("ConcurrentBolt does not support need_task_ids")
+        return super(ConcurrentBolt, self).emit_many(
+            values_iterable, stream=stream, anchors=anchors,
+            direct_task=direct_task, need_task_ids=False)
+
+
+def _init_worker(bolt):
+    global _worker_bolt, _worker_pid
+    _worker_bolt = bolt
+    _worker_pid = os.getpid()
+    bolt.initialize_worker()
+
+
+def _run_in_worker(tup):
+    if _worker_pid != os.getpid():
+        # Forked without initializer, see ProcessPoolBolt._create_executor()
+        _init_worker(_worker_bolt)
+    return _worker_bolt.process_tuple_in_worker(tup)
+
+
+class ProcessPoolBolt(ConcurrentBolt):
+    """A Bolt processing tuples in ``WORKERS`` worker processes, in order to
+    use several cores from a single Storm executor. The bolt process only
+    talks to Storm: it sends each tuple to a worker, then emits the result
+    and acks the tuple, or fails it if the worker raised an exception.
+
+    Implement process_tuple_in_worker() in a subclass, returning the values
+    to emit. Override process_result() to emit them differently. Tick tuples
+    are handled by process_tick() in the bolt process.
+
+    Worker processes are forked from the bolt process after
+    :meth:`~pyleus.storm.component.Component.initialize`, so they inherit its
+    state, and cannot talk to Storm themselves. Tuples and results are
+    pickled to go through the pipes connecting them to the bolt process.
+
+    Worker processes are always forked, which is not available on Windows.
+    Before Python 3.7, initialize_worker() is called in each worker process
+    when it receives its first tuple rather than when it starts.
+
+    .. note::
+       process_result() is called from a background thread of the bolt
+       process, while process_tick() is called from the main thread.
+    """
+
+    #: ``int`` number of worker processes, default to the number of CPUs.
+    WORKERS = None
+
+    #: ``int`` maximum number of tuples sent to workers and not processed
+    #: yet. Default to twice the number of workers, so that workers do not
+    #: wait for the next tuple.
+    MAX_IN_FLIGHT = None
+
+    # Histogram of the time tuples take from their submission to their
+    # result, once instrumented
+    _process_histogram = None
+
+    def __init__(self, *args, **kwargs):
+        if self.WORKERS is None:
+            self.WORKERS = multiprocessing.cpu_count()
+        if self.MAX_IN_FLIGHT is None:
+            self.MAX_IN_FLIGHT = 2 * self.WORKERS
+        super(ProcessPoolBolt, self).__init__(*args, **kwargs)
+
+    def initialize_worker(self):
+        """Called in each worker process when it starts.
+
+        .. note:: Implement in subclass.
+        """
+        pass
+
+    def process_tuple_in_worker(self, tup):
+        """Process the incoming tuple in a worker process.
+
+        :param tup: pyleus tuple representing the message to be processed
+        :type tup: :class:`~pyleus.storm.StormTuple`
+
+        :return: values of the tuples to emit, or ``None`` to emit nothing.
+        :rtype: ``list`` of ``tuple`` or ``None``
+
+        .. note:: Implement in subclass.
+        """
+        raise NotImplementedError()
+
+    def process_result(self, tup, result):
+        """Handle the value returned by :meth:`~.process_tuple_in_worker`
+        in the bolt process. By default, emit each item of ``result`` as a
+        tuple anchored to ``tup``.
+        """
+        if result:
+            self.emit_many(result, anchors=[tup])
+
+    def _create_executor(self):
+        # Fork workers so that they inherit the bolt without pickling it
+        if _HAS_EXECUTOR_INITIALIZER:
+            return ProcessPoolExecutor(
+                max_workers=self.WORKERS,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker, initargs=(self,))
+
+        # Older executors always fork workers and cannot initialize them:
+        # they inherit the bolt from this module and initialize it lazily
+        global _worker_bolt
+        _worker_bolt = self
+        return ProcessPoolExecutor(max_workers=self.WORKERS)
+
+    def _submit(self, tup):
+        if is_tick(tup):
+            self._process_in_executor(tup)
+            return
+
+        start = clock()
+        future = self._executor.submit(_run_in_worker, tup)
+        future.add_done_callback(
+            lambda future: self._handle_future(tup, future, start))
+
+    def _instrument(self, instrumentation):
+        """Also time the tuples processed by the worker processes, from
+        their submission to the handling of their result.
+        """
+        super(ProcessPoolBolt, self)._instrument(instrumentation)
+        self._process_histogram = instrumentation.histograms['process']
+
+    def _handle_future(self, tup, future, start):
+        try:
+            self.process_result(tup, future.result())
+        except Exception:
+            log.exception("Failing tuple {0}".format(tup.id))
+            self.fail(tup)
+        else:
+            self.ack(tup)
+        finally:
+            if self._process_histogram is not None:
+                self._process_histogram.record(clock() - start)
+            self._slots.release()
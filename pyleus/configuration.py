@@ -43,6 +43,29 @@ invocations.
 
    # list of packages to always include in your topologies
    include_packages: foo bar<4.0 baz==0.1
+
+   # directory where built virtualenvs are cached for later builds
+   # (default: ~/.cache/pyleus/venvs, use --no-cache to skip the cache)
+   build_cache_dir: /home/myuser/.cache/pyleus/venvs
+
+   # maximum size of the cache in MiB, evicting the least recently used
+   # virtualenvs first (default: 2048)
+   build_cache_size: 4096
+
+   # directory of wheels to install all the packages from at once, without
+   # accessing the package index. Run pyleus build --update-wheelhouse on a
+   # host with access to the index to store the wheels of the requirements of
+   # a topology into it (default: none, install from the package index)
+   wheelhouse: /opt/pyleus/wheelhouse
+
+   # compression level of the jar entries, from 0 (no compression, fastest)
+   # to 9 (smallest jar). Already compressed files are always stored as they
+   # are (default: -1, zlib default level)
+   compress_level: 1
+
+   # number of threads compressing the jar entries (default: number of CPUs;
+   # always 1 on Python 2 without the futures package)
+   compress_workers: 4
 """
 from __future__ import absolute_import
 
@@ -65,20 +88,27 @@ CONFIG_FILES_PATH = [
 
 Configuration = collections.namedtuple(
     "Configuration",
-    "base_jar config_file debug func include_packages output_jar \
-     pypi_index_url nimbus_host nimbus_port storm_cmd_path \
-     system_site_packages topology_path topology_jar topology_name verbose \
-     wait_time jvm_opts"
+    "base_jar build_cache_dir build_cache_size compress_level \
+     compress_workers config_file debug func include_packages incremental \
+     no_cache output_jar pypi_index_url nimbus_host nimbus_port \
+     storm_cmd_path system_site_packages topology_path topology_jar \
+     topology_name update_wheelhouse verbose wait_time wheelhouse jvm_opts"
 )
 """Namedtuple containing all pyleus configuration values."""
 
 
 DEFAULTS = Configuration(
     base_jar=BASE_JAR_PATH,
+    build_cache_dir="~/.cache/pyleus/venvs",
+    build_cache_size=2048,
+    compress_level=-1,
+    compress_workers=None,
     config_file=None,
     debug=False,
     func=None,
     include_packages=None,
+    incremental=False,
+    no_cache=False,
     output_jar=None,
     pypi_index_url=None,
     nimbus_host=None,
@@ -88,8 +118,10 @@ DEFAULTS = Configuration(
     topology_path="pyleus_topology.yaml",
     topology_jar=None,
     topology_name=None,
+    update_wheelhouse=False,
     verbose=False,
     wait_time=None,
+    wheelhouse=None,
     jvm_opts=None,
 )
 
@@ -22,6 +22,57 @@ StormTuple = namedtuple('StormTuple', "id comp stream task values")
 """
 
 
+class LazyStormTuple(object):
+    """Compact alternative to :class:`~.StormTuple` whose values are decoded
+    only when first accessed, so that components looking only at the other
+    fields never pay for deserializing large payloads.
+
+    It exposes the same attributes as :class:`~.StormTuple` and can be
+    iterated over, indexed, unpacked and compared like it.
+    """
+
+    __slots__ = ("id", "comp", "stream", "task", "_values", "_decode")
+
+    _fields = StormTuple._fields
+
+    def __init__(self, id, comp, stream, task, raw_values, decode):
+        self.id = id
+        self.comp = comp
+        self.stream = stream
+        self.task = task
+        self._values = raw_values
+        # Set to None once values have been decoded
+        self._decode = decode
+
+    @property
+    def values(self):
+        if self._decode is not None:
+            self._values = self._decode(self._values)
+            self._decode = None
+        return self._values
+
+    def __iter__(self):
+        return iter((self.id, self.comp, self.stream, self.task, self.values))
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "LazyStormTuple(id={0!r}, comp={1!r}, stream={2!r}, " \
+            "task={3!r}, values={4!r})".format(*self)
+
+
 def is_tick(tup):
     """Tell whether the tuple is a tick tuple or not.
 
@@ -54,7 +105,9 @@ class StormWentAwayError(Exception):
         super(StormWentAwayError, self).__init__(message)
 
 
-from pyleus.storm.bolt import Bolt, SimpleBolt
-from pyleus.storm.spout import Spout
+from pyleus.storm.bolt import Bolt, SimpleBolt, BatchingBolt
+from pyleus.storm.spout import Spout, BufferedSpout, BatchSpout
+from pyleus.storm.spout import ReliableSpout
 
-_ = [Bolt, SimpleBolt, Spout] # pyflakes
+_ = [Bolt, SimpleBolt, BatchingBolt,
+     Spout, BufferedSpout, BatchSpout, ReliableSpout] # pyflakes
@@ -1,10 +1,12 @@
-"""Module containing the implementation of the Bolt component and a subclassed
+"""Module containing the implementation of the Bolt component, a subclassed
 SimpleBolt component which takes care of acking/failing tuples and exposing a
-nicer API for handling tick tuples.
+nicer API for handling tick tuples, and a subclassed BatchingBolt component
+processing tuples in batches.
 """
 from __future__ import absolute_import
 
 import logging
+import time
 
 from pyleus.storm import is_tick, is_heartbeat, StormWentAwayError
 from pyleus.storm.component import Component
@@ -12,6 +14,22 @@ from pyleus.storm.component import Component
 log = logging.getLogger(__name__)
 
 
+def _anchor_ids(anchors):
+    if anchors is None:
+        return []
+    return [anchor.id for anchor in anchors]
+
+
+def _cap_timeout(timeout, conf):
+    """Cap a number of seconds tuples are held back to half of the topology
+    message timeout, so that Storm does not fail them in the meantime.
+    """
+    message_timeout = conf and conf.message_timeout
+    if message_timeout:
+        return min(timeout, message_timeout / 2.0)
+    return timeout
+
+
 class Bolt(Component):
     """Bolt component class. Inherit from
     :class:`~pyleus.storm.component.Component`.
@@ -41,6 +59,26 @@ class Bolt(Component):
         else:
             return self.process_tuple(tup)
 
+    def _instrument(self, instrumentation):
+        """Also time the tuples going through _process_tuple()."""
+        super(Bolt, self)._instrument(instrumentation)
+        self._process_tuple = instrumentation.timed(
+            'process', self._process_tuple)
+
+    def _add_builtin_metrics(self, instrumentation):
+        """Also count the tuples going through _process_tuple()."""
+        super(Bolt, self)._add_builtin_metrics(instrumentation)
+
+        process_tuple = self._process_tuple
+        counters = instrumentation.counters
+
+        def counted_process_tuple(tup):
+            if not is_heartbeat(tup):
+                counters['tuples'] += 1
+            return process_tuple(tup)
+
+        self._process_tuple = counted_process_tuple
+
     def run_component(self):
         """Bolt main loop."""
         try:
@@ -84,15 +122,32 @@ class Bolt(Component):
             'id': tup.id,
         })
 
+    def ack_many(self, tups):
+        """Ack several tuples, sending all the commands with a single write.
+
+        :param tups: tuples to ack
+        :type tups: iterable of :class:`~pyleus.storm.StormTuple`
+        """
+        self.send_commands('ack', [{'id': tup.id} for tup in tups])
+
+    def fail_many(self, tups):
+        """Fail several tuples, sending all the commands with a single write.
+
+        :param tups: tuples to fail
+        :type tups: iterable of :class:`~pyleus.storm.StormTuple`
+        """
+        self.send_commands('fail', [{'id': tup.id} for tup in tups])
+
     def sync(self):
-        """Respond to heartbeat.
+        """Respond to heartbeat, flushing metrics beforehand when due.
         """
+        self._maybe_flush_metrics()
         self.send_command('sync')
 
     def emit(
             self, values,
             stream=None, anchors=None,
-            direct_task=None, need_task_ids=True):
+            direct_task=None, need_task_ids=True, pipelined=False):
         """Build and send an output tuple command dict and return the ids of
         the tasks to which the tuple was sent by Storm.
 
@@ -111,22 +166,57 @@ class Bolt(Component):
          whether emit should return the ids of the task the message has been
          sent to, default ``True``
         :type need_task_ids: ``bool``
+        :param pipelined:
+         return a :class:`~pyleus.storm.component.TaskIdsFuture` instead of
+         waiting for Storm to send the task ids, so that other tuples can be
+         emitted meanwhile, default ``False``
+        :type pipelined: ``bool``
 
         .. tip::
            Setting ``need_task_ids`` to ``False`` really helps in achieving
            better performances. You should always do that if your application
-           does not leverage task ids.
+           does not leverage task ids. If it does, consider ``pipelined``.
 
         .. danger::
            ``direct_task`` is not yet supported.
         """
-        assert isinstance(values, list) or isinstance(values, tuple)
+        command_dict = self._emit_command_dict(
+            values, stream, _anchor_ids(anchors), direct_task)
 
-        if anchors is None:
-            anchors = []
+        return self._send_emit(command_dict, need_task_ids, pipelined)
+
+    def emit_many(
+            self, values_iterable,
+            stream=None, anchors=None,
+            direct_task=None, need_task_ids=True, pipelined=False):
+        """Build the output tuple command dicts for several tuples, send them
+        to Storm with a single write and return the list of the ids of the
+        tasks to which each tuple was sent by Storm.
+
+        :param values_iterable: pyleus tuple values to be emitted
+        :type values_iterable: iterable of ``tuple`` or ``list``
+
+        All the tuples share the other arguments, documented in
+        :meth:`~.emit`. With ``pipelined``, a list of
+        :class:`~pyleus.storm.component.TaskIdsFuture` is returned.
+
+        .. tip::
+           Bolts emitting many tuples for each input, such as splitters,
+           should prefer this method over repeated :meth:`~.emit` calls.
+        """
+        anchor_ids = _anchor_ids(anchors)
+
+        command_dicts = [
+            self._emit_command_dict(values, stream, anchor_ids, direct_task)
+            for values in values_iterable]
+
+        return self._send_emits(command_dicts, need_task_ids, pipelined)
+
+    def _emit_command_dict(self, values, stream, anchor_ids, direct_task):
+        assert isinstance(values, list) or isinstance(values, tuple)
 
         command_dict = {
-            'anchors': [anchor.id for anchor in anchors],
+            'anchors': anchor_ids,
             # Different versions of simplejson serialize namedtuples differently.
             # Cast to tuple in order to have consistent
             # behavior between msgpack, json and simplejson.
@@ -139,16 +229,7 @@ class Bolt(Component):
         if direct_task is not None:
             command_dict['task'] = direct_task
 
-        # By default, Storm sends back to the component the task ids of the
-        # tasks receiving the tuple. If need_task_ids is set to False, Storm
-        # won't send the task ids for that message
-        if not need_task_ids:
-            command_dict['need_task_ids'] = False
-
-        self.send_command('emit', command_dict)
-
-        if need_task_ids:
-            return self.read_taskid()
+        return command_dict
 
 
 class SimpleBolt(Bolt):
@@ -156,8 +237,37 @@ class SimpleBolt(Bolt):
 
     Implement process_tick() in a subclass to handle tick tuples with a nicer
     API.
+
+    Set ``ACK_BATCH_SIZE`` in a subclass to coalesce acks: they are then sent
+    together with :meth:`~.Bolt.ack_many` once ``ACK_BATCH_SIZE`` tuples are
+    processed, once the oldest one has waited ``ACK_BATCH_TIMEOUT`` seconds,
+    when a heartbeat or a tick tuple is received, or before waiting for more
+    input from Storm, so that acks of the tuples read at once are coalesced
+    but never held back while the bolt is idle.
     """
 
+    #: ``int`` maximum number of acks sent together. The default ``1`` acks
+    #: every tuple as soon as it is processed.
+    ACK_BATCH_SIZE = 1
+
+    #: ``float`` maximum number of seconds an ack can be held back. It is
+    #: capped to half of the topology message timeout, so that coalescing
+    #: acks never makes Storm fail tuples.
+    ACK_BATCH_TIMEOUT = 1.0
+
+    def __init__(self, *args, **kwargs):
+        super(SimpleBolt, self).__init__(*args, **kwargs)
+
+        # Processed tuples waiting to be acked and when the first one was
+        # processed
+        self._pending_acks = []
+        self._pending_acks_time = None
+
+    def initialize_serializer(self):
+        super(SimpleBolt, self).initialize_serializer()
+        if self.ACK_BATCH_SIZE > 1:
+            self._serializer.before_read = self.flush_acks
+
     def process_tick(self):
         """Code to be executed when a tick tuple reaches the component.
 
@@ -167,6 +277,7 @@ class SimpleBolt(Bolt):
     def _process_tuple(self, tup):
         """SimpleBolt middleware level tuple processing."""
         if is_heartbeat(tup):
+            self.flush_acks()
             self.sync()
         else:
             if is_tick(tup):
@@ -174,4 +285,143 @@ class SimpleBolt(Bolt):
             else:
                 self.process_tuple(tup)
 
+            self._ack(tup)
+
+            if is_tick(tup):
+                self.flush_acks()
+
+    def _ack(self, tup):
+        """Ack a processed tuple, right away or along with the next ones."""
+        if self.ACK_BATCH_SIZE <= 1:
             self.ack(tup)
+            return
+
+        now = time.time()
+        if not self._pending_acks:
+            self._pending_acks_time = now
+        self._pending_acks.append(tup)
+
+        if (len(self._pending_acks) >= self.ACK_BATCH_SIZE or
+                now - self._pending_acks_time >=
+                    _cap_timeout(self.ACK_BATCH_TIMEOUT, self.conf)):
+            self.flush_acks()
+
+    def flush_acks(self):
+        """Send the acks held back because of ``ACK_BATCH_SIZE``."""
+        if self._pending_acks:
+            self.ack_many(self._pending_acks)
+            self._pending_acks = []
+            self._pending_acks_time = None
+
+
+class BatchingBolt(Bolt):
+    """A Bolt that processes tuples in batches and automatically acks/fails
+    them.
+
+    Implement process_batch() in a subclass. It is called with the tuples
+    received so far once ``BATCH_SIZE`` of them have been received, once the
+    oldest one has waited ``BATCH_TIMEOUT`` seconds, or when a tick tuple is
+    received. The whole batch is then acked, or failed if process_batch()
+    raises an exception. Tuples emitted during process_batch() are anchored to
+    all the tuples of the batch, unless ``anchors`` are specified.
+
+    Implement process_tick() in a subclass to handle tick tuples.
+    """
+
+    #: ``int`` maximum number of tuples in a batch.
+    BATCH_SIZE = 100
+
+    #: ``float`` maximum number of seconds a tuple can wait for its batch to
+    #: be processed. It is capped to half of the topology message timeout.
+    #: Since the bolt only gets control back when receiving a tuple, batches
+    #: of an idle bolt are processed on the next heartbeat, about every
+    #: second.
+    BATCH_TIMEOUT = 1.0
+
+    def __init__(self, *args, **kwargs):
+        super(BatchingBolt, self).__init__(*args, **kwargs)
+
+        # Tuples waiting to be processed and when the first one was received
+        self._batch = []
+        self._batch_time = None
+        # Batch being processed, emitted tuples are anchored to it
+        self._current_batch = None
+
+    def process_batch(self, tups):
+        """Process a batch of incoming tuples.
+
+        :param tups: tuples of the batch, in the order they were received
+        :type tups: ``list`` of :class:`~pyleus.storm.StormTuple`
+
+        .. note:: Implement in subclass.
+        """
+        pass
+
+    def process_tick(self):
+        """Code to be executed when a tick tuple reaches the component, right
+        after the pending batch has been processed.
+
+        .. note:: Implement in subclass."""
+        pass
+
+    def _process_tuple(self, tup):
+        """BatchingBolt middleware level tuple processing."""
+        if is_heartbeat(tup):
+            if self._batch_expired(time.time()):
+                self.flush_batch()
+            self.sync()
+        elif is_tick(tup):
+            self.flush_batch()
+            self.process_tick()
+            self.ack(tup)
+        else:
+            now = time.time()
+            if not self._batch:
+                self._batch_time = now
+            self._batch.append(tup)
+
+            if (len(self._batch) >= self.BATCH_SIZE or
+                    self._batch_expired(now)):
+                self.flush_batch()
+
+    def _batch_expired(self, now):
+        return bool(self._batch) and now - self._batch_time >= _cap_timeout(
+            self.BATCH_TIMEOUT, self.conf)
+
+    def flush_batch(self):
+        """Process, then ack or fail, the tuples received so far."""
+        if not self._batch:
+            return
+
+        batch = self._batch
+        self._batch = []
+        self._batch_time = None
+
+        self._current_batch = batch
+        try:
+            self.process_batch(batch)
+        except Exception:
+            log.exception("Failing batch of {0} tuples".format(len(batch)))
+            self.fail_many(batch)
+        else:
+            self.ack_many(batch)
+        finally:
+            self._current_batch = None
+
+    def emit(self, values, stream=None, anchors=None, **kwargs):
+        """Same as :meth:`~.Bolt.emit`, but anchor the tuple to the whole
+        batch being processed if no ``anchors`` are specified.
+        """
+        if anchors is None:
+            anchors = self._current_batch
+        return super(BatchingBolt, self).emit(
+            values, stream=stream, anchors=anchors, **kwargs)
+
+    def emit_many(self, values_iterable, stream=None, anchors=None, **kwargs):
+        """Same as :meth:`~.Bolt.emit_many`, but anchor the tuples to the
+        whole batch being processed if no ``anchors`` are specified.
+        """
+        if anchors is None:
+            anchors = self._current_batch
+        return super(BatchingBolt, self).emit_many(
+            values_iterable, stream=stream, anchors=anchors, **kwargs)
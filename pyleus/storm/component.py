@@ -9,6 +9,7 @@ import logging
 import logging.config
 import os
 import sys
+import time
 import traceback
 
 try:
@@ -23,9 +24,18 @@ from pyleus.storm import LOG_DEBUG
 from pyleus.storm import LOG_INFO
 from pyleus.storm import LOG_WARN
 from pyleus.storm import LOG_ERROR
+from pyleus.storm import LazyStormTuple
 from pyleus.storm import StormTuple
-from pyleus.storm.serializers.msgpack_serializer import MsgpackSerializer
-from pyleus.storm.serializers.json_serializer import JSONSerializer
+from pyleus.storm.instrumentation import Instrumentation
+from pyleus.storm.metrics import METRICS_NAME
+from pyleus.storm.metrics import MetricsRegistry
+from pyleus.storm.metrics import add_instrumentation_values
+from pyleus.storm.profiler import SamplingProfiler
+from pyleus.storm.serializers import JSON_SERIALIZER
+from pyleus.storm.serializers import MSGPACK_SERIALIZER
+from pyleus.storm.serializers import SERIALIZERS
+from pyleus.storm.serializers import load_serializer
+from pyleus.storm.serializers import supports_batching
 
 
 # Please keeep in sync with java TopologyBuilder
@@ -35,12 +45,10 @@ PYLEUS_CONFIG_OPT = "--pyleus-config"
 
 DEFAULT_LOGGING_CONFIG_PATH = "pyleus_logging.conf"
 
-JSON_SERIALIZER = "json"
-MSGPACK_SERIALIZER = "msgpack"
-SERIALIZERS = {
-    JSON_SERIALIZER: JSONSerializer,
-    MSGPACK_SERIALIZER: MsgpackSerializer,
-}
+_ = [JSON_SERIALIZER, MSGPACK_SERIALIZER, SERIALIZERS] # pyflakes
+
+# Commands after which buffered output must reach Storm right away
+FLUSH_COMMANDS = frozenset(["sync", "error"])
 
 
 log = logging.getLogger(__name__)
@@ -103,6 +111,74 @@ class StormConfig(dict):
         """
         return self.get("topology.tick.tuple.freq.secs")
 
+    @property
+    def message_timeout(self):
+        """Helper property to access the number of seconds Storm waits for a
+        tuple tree to be acked before failing it.
+
+        :return: message timeout for the topology
+        :rtype: ``float`` or ``None``
+        """
+        return self.get("topology.message.timeout.secs")
+
+    @property
+    def metrics_bucket_size(self):
+        """Helper property to access the number of seconds between two
+        collections of the metrics by Storm.
+
+        :return: metrics bucket size for the topology
+        :rtype: ``float`` or ``None``
+        """
+        return self.get("topology.builtin.metrics.bucket.size.secs")
+
+
+class TaskIdsFuture(object):
+    """Handle on the ids of the tasks a pipelined emit has been sent to,
+    available once Storm answers. Storm answers emits in order, so waiting for
+    a result also resolves the handles of all the previous emits.
+
+    .. seealso:: ``pipelined`` argument of :meth:`~pyleus.storm.Bolt.emit`
+       and :meth:`~pyleus.storm.Spout.emit`
+    """
+
+    def __init__(self, component):
+        self._component = component
+        self._task_ids = None
+        self._done = False
+        self._callbacks = []
+
+    def done(self):
+        """Tell whether task ids have been received.
+
+        :rtype: ``bool``
+        """
+        return self._done
+
+    def result(self):
+        """Return the task ids, reading Storm messages until they arrive.
+
+        :rtype: ``list`` of ``int``
+        """
+        if not self._done:
+            self._component._wait_taskids(self)
+        return self._task_ids
+
+    def add_done_callback(self, fn):
+        """Call ``fn`` with the task ids as soon as they are received, or
+        right away if they already are.
+        """
+        if self._done:
+            fn(self._task_ids)
+        else:
+            self._callbacks.append(fn)
+
+    def _set_result(self, task_ids):
+        self._task_ids = task_ids
+        self._done = True
+        for fn in self._callbacks:
+            fn(task_ids)
+        self._callbacks = None
+
 
 class Component(object):
     """Base class for all pyleus components."""
@@ -121,6 +197,14 @@ class Component(object):
     #: .. note:: Specify in subclass.
     OPTIONS = None
 
+    #: ``float`` number of seconds between two flushes of :attr:`~.metrics`
+    #: to Storm. Default to the metrics bucket size of the topology.
+    METRICS_INTERVAL = None
+
+    #: ``bool`` telling whether the component can use a buffered serializer,
+    #: whose output is flushed by the thread reading from Storm.
+    SUPPORTS_BUFFERED_SERIALIZER = True
+
     # Populated in Component.run()
 
     #: ``dict`` containing options passed to component in the yaml definition
@@ -136,6 +220,15 @@ class Component(object):
 
     pyleus_config = None
 
+    #: :class:`~pyleus.storm.instrumentation.Instrumentation` recording the
+    #: component activity, ``None`` until the component runs. It only keeps
+    #: counters unless :meth:`~.enable_instrumentation` is called.
+    instrumentation = None
+
+    #: :class:`~pyleus.storm.metrics.MetricsRegistry` holding the metrics
+    #: sent to Storm.
+    metrics = None
+
     def __init__(self, input_stream=None, output_stream=None):
         """The Storm component will parse the command line in order
         to figure out if it has been queried for a description or for
@@ -163,9 +256,19 @@ class Component(object):
 
         self._pending_commands = deque()
         self._pending_taskids = deque()
+        # TaskIdsFuture of emits still waiting for their task ids, in emit
+        # order
+        self._taskid_futures = deque()
 
         self._serializer = None
 
+        self.metrics = MetricsRegistry()
+        # Time of the next metrics flush, once the component is set up
+        self._metrics_deadline = None
+
+        # Directory of the pidfile, received from Storm
+        self._pid_dir = None
+
     def describe(self):
         """Print to stdout a JSON description of the component.
 
@@ -192,13 +295,81 @@ class Component(object):
         """Load serializer type from command line configuration and instantiate
         the associated
         :class:`~pyleus.storm.serializers.serializer.Serializer`.
+
+        .. seealso:: :mod:`pyleus.storm.serializers`
         """
         serializer = self.pyleus_config.get('serializer')
-        if serializer in SERIALIZERS:
-            self._serializer = SERIALIZERS[serializer](
-                self._input_stream, self._output_stream)
-        else:
-            raise ValueError("Unknown serializer: {0}", serializer)
+        serializer_options = self.pyleus_config.get('serializer_options') or {}
+
+        serializer_cls = load_serializer(serializer)
+        if serializer_options.get('buffered'):
+            if not supports_batching(serializer_cls):
+                raise ValueError(
+                    "Serializer {0} does not support buffered mode".format(
+                        serializer))
+            if not self.SUPPORTS_BUFFERED_SERIALIZER:
+                raise ValueError(
+                    "{0} does not support buffered serializers".format(
+                        type(self).__name__))
+
+        self._serializer = serializer_cls(
+            self._input_stream, self._output_stream, **serializer_options)
+
+    def enable_instrumentation(self):
+        """Start recording latency histograms for the hot path of the
+        component into :attr:`~.instrumentation`, which is returned, next to
+        the counters of the built-in metrics. Called right after the
+        serializer is initialized when the ``instrumentation`` option of the
+        topology YAML file is set.
+
+        .. seealso:: :mod:`pyleus.storm.instrumentation`
+        """
+        instrumentation = self._enable_builtin_metrics()
+        if not instrumentation.timing:
+            instrumentation.timing = True
+            self._serializer.instrument(instrumentation)
+            self._instrument(instrumentation)
+        return instrumentation
+
+    def _enable_builtin_metrics(self):
+        """Start counting the traffic with Storm into
+        :attr:`~.instrumentation`, and register the other built-in metrics.
+        Called right after the serializer is initialized, whether
+        instrumentation is enabled or not.
+        """
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation(timing=False)
+            self._serializer.count(self.instrumentation)
+            self._add_builtin_metrics(self.instrumentation)
+        return self.instrumentation
+
+    def _instrument(self, instrumentation):
+        """Wrap the methods of this instance on the hot path to record their
+        duration into instrumentation, leaving the component untouched while
+        it is disabled. Bolt and Spout extend it to time processing.
+        """
+        self._wait_taskids = instrumentation.timed(
+            'taskids', self._wait_taskids)
+
+    def _add_builtin_metrics(self, instrumentation):
+        """Wrap the methods of this instance sending commands to count them
+        into instrumentation. Bolt and Spout extend it to count the tuples
+        they process and register their own built-in metrics.
+        """
+        send_command = self.send_command
+        send_commands = self.send_commands
+
+        def counted_send_command(command, opts_dict=None):
+            instrumentation.count_commands(command)
+            send_command(command, opts_dict)
+
+        def counted_send_commands(command, opts_dicts):
+            opts_dicts = list(opts_dicts)
+            instrumentation.count_commands(command, len(opts_dicts))
+            send_commands(command, opts_dicts)
+
+        self.send_command = counted_send_command
+        self.send_commands = counted_send_commands
 
     def setup_component(self):
         """Storm component setup before execution. It will also
@@ -206,6 +377,7 @@ class Component(object):
         """
         self.conf, self.context = self._init_component()
         self.initialize()
+        self._metrics_deadline = time.time() + self._metrics_interval()
 
     def initialize(self):
         """Called after component has been launched, but before processing any
@@ -215,6 +387,43 @@ class Component(object):
         """
         pass
 
+    def _metrics_interval(self):
+        if self.METRICS_INTERVAL is not None:
+            return self.METRICS_INTERVAL
+        return self.conf.metrics_bucket_size or 60
+
+    def flush_metrics(self):
+        """Send the metrics recorded since the previous flush to Storm, along
+        with the built-in ones.
+
+        Metrics are flushed every :attr:`~.METRICS_INTERVAL` seconds by the
+        component main loop, at the first heartbeat for bolts or command for
+        spouts following the deadline. Call it from
+        :meth:`~pyleus.storm.bolt.SimpleBolt.process_tick` to flush on tick
+        tuples instead.
+
+        .. seealso:: :mod:`pyleus.storm.metrics`
+        """
+        values = self.metrics.get_values_and_reset()
+        if self.instrumentation is not None:
+            add_instrumentation_values(values, self.instrumentation)
+
+        if values['counters'] or values['values']:
+            self.send_command('metrics', {
+                'name': METRICS_NAME,
+                'params': values,
+            })
+
+    def _maybe_flush_metrics(self):
+        """Flush metrics if the deadline is over."""
+        if self._metrics_deadline is None:
+            return
+
+        now = time.time()
+        if now >= self._metrics_deadline:
+            self._metrics_deadline = now + self._metrics_interval()
+            self.flush_metrics()
+
     def run(self):
         """Entry point for the component running logic.
 
@@ -244,12 +453,42 @@ class Component(object):
         try:
             self.initialize_logging()
             self.initialize_serializer()
+            self._enable_builtin_metrics()
+            if self.pyleus_config.get('instrumentation'):
+                self.enable_instrumentation()
             self.setup_component()
-            self.run_component()
+            profiler = self._start_profiler()
+            try:
+                self.run_component()
+            finally:
+                if profiler is not None:
+                    profiler.stop()
         except:
             log.exception("Exception in {0}.run".format(self.COMPONENT_TYPE))
             self.error(traceback.format_exc())
 
+    def _start_profiler(self):
+        """Start a :class:`~pyleus.storm.profiler.SamplingProfiler` writing
+        its samples in the pid directory if the ``profiler`` pyleus
+        configuration option is set, either to ``true`` or to a ``dict`` of
+        profiler keyword arguments, plus an optional ``dir`` to write the
+        samples to instead.
+        """
+        profiler_config = self.pyleus_config.get('profiler')
+        if not profiler_config:
+            return None
+
+        profiler_options = dict(profiler_config) \
+            if isinstance(profiler_config, dict) else {}
+        profile_dir = profiler_options.pop('dir', self._pid_dir)
+        path = os.path.join(
+            profile_dir, "profile-{0}.folded".format(os.getpid()))
+
+        profiler = SamplingProfiler(path, **profiler_options)
+        profiler.start()
+        log.info("Profiling {0} into {1}".format(self.COMPONENT_TYPE, path))
+        return profiler
+
     def run_component(self):
         """Run the main loop of the component. Implemented in Bolt and
         Spout subclasses.
@@ -258,9 +497,10 @@ class Component(object):
 
     def _msg_is_command(self, msg):
         """Storm differentiates between commands and taskids by whether the
-        message is a ``dict`` or ``list``.
+        message is a ``dict`` or ``list``. Serializers reading tuples lazily
+        return tuple commands as :class:`~pyleus.storm.LazyStormTuple`.
         """
-        return isinstance(msg, dict)
+        return isinstance(msg, (dict, LazyStormTuple))
 
     def _msg_is_taskid(self, msg):
         """..seealso::  :meth:`~._msg_is_command`"""
@@ -282,6 +522,9 @@ class Component(object):
             self._pending_taskids.append(msg)
             msg = self._serializer.read_msg()
 
+        if self._taskid_futures:
+            self._resolve_taskids()
+
         return msg
 
     def read_taskid(self):
@@ -299,9 +542,70 @@ class Component(object):
 
         return msg
 
+    def _resolve_taskids(self):
+        """Hand queued taskids to the pipelined emits waiting for them."""
+        while self._pending_taskids and self._taskid_futures:
+            future = self._taskid_futures.popleft()
+            future._set_result(self._pending_taskids.popleft())
+
+    def _wait_taskids(self, future):
+        """Read taskids, resolving pipelined emits in order, until future is
+        resolved.
+        """
+        while not future.done():
+            taskids = self.read_taskid()
+            self._taskid_futures.popleft()._set_result(taskids)
+
+    def _send_emit(self, command_dict, need_task_ids, pipelined):
+        """Send an emit command and return the task ids the tuple has been
+        sent to, or a :class:`~.TaskIdsFuture` for them if pipelined.
+        """
+        # By default, Storm sends back to the component the task ids of the
+        # tasks receiving the tuple. If need_task_ids is set to False, Storm
+        # won't send the task ids for that message
+        if not need_task_ids:
+            command_dict['need_task_ids'] = False
+
+        self.send_command('emit', command_dict)
+
+        if not need_task_ids:
+            return None
+
+        future = TaskIdsFuture(self)
+        self._taskid_futures.append(future)
+        if pipelined:
+            return future
+        return future.result()
+
+    def _send_emits(self, command_dicts, need_task_ids, pipelined):
+        """Send several emit commands at once and return the list of task ids
+        each tuple has been sent to, or of :class:`~.TaskIdsFuture` for them
+        if pipelined.
+        """
+        if not need_task_ids:
+            for command_dict in command_dicts:
+                command_dict['need_task_ids'] = False
+
+        self.send_commands('emit', command_dicts)
+
+        if not need_task_ids:
+            return None
+
+        futures = [TaskIdsFuture(self) for _ in command_dicts]
+        self._taskid_futures.extend(futures)
+        if pipelined:
+            return futures
+        # Waiting for the last one resolves all the others
+        return [future.result() for future in futures]
+
     def read_tuple(self):
         """Read and parse a command into a StormTuple object."""
-        cmd = self.read_command()
+        return self._to_storm_tuple(self.read_command())
+
+    def _to_storm_tuple(self, cmd):
+        """Parse a tuple command into a StormTuple object."""
+        if isinstance(cmd, LazyStormTuple):
+            return cmd
         return StormTuple(
             cmd['id'], cmd['comp'], cmd['stream'], cmd['task'], cmd['tuple'])
 
@@ -319,13 +623,15 @@ class Component(object):
 
         pid = os.getpid()
         self._serializer.send_msg({'pid': pid})
-        self._create_pidfile(setup_info['pidDir'], pid)
+        self._pid_dir = setup_info['pidDir']
+        self._create_pidfile(self._pid_dir, pid)
 
         return StormConfig(setup_info['conf']), setup_info['context']
 
     def send_command(self, command, opts_dict=None):
         """Merge command with options and send the message through
-        :class:`~pyleus.storm.serializers.serializer.Serializer`
+        :class:`~pyleus.storm.serializers.serializer.Serializer`. Commands
+        marking a protocol sync point also flush the serializer output.
         """
         if opts_dict is not None:
             command_dict = dict(opts_dict)
@@ -335,6 +641,25 @@ class Component(object):
 
         self._serializer.send_msg(command_dict)
 
+        if command in FLUSH_COMMANDS:
+            self._serializer.flush()
+
+    def send_commands(self, command, opts_dicts):
+        """Merge command with each of the options and send all the messages
+        at once through
+        :class:`~pyleus.storm.serializers.serializer.Serializer`.
+        """
+        command_dicts = []
+        for opts_dict in opts_dicts:
+            command_dict = dict(opts_dict)
+            command_dict['command'] = command
+            command_dicts.append(command_dict)
+
+        self._serializer.send_msgs(command_dicts)
+
+        if command in FLUSH_COMMANDS:
+            self._serializer.flush()
+
     def log(self, msg, level=LOG_INFO):
         """Send a log message.
 
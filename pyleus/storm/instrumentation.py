@@ -0,0 +1,243 @@
+"""Built-in instrumentation of the hot path of pyleus components: latency
+histograms for each phase of a tuple's life and counters of the traffic
+with Storm.
+
+Counters are always kept, and sent to Storm with the built-in metrics.
+Latency histograms are disabled by default and cost nothing until
+:meth:`~pyleus.storm.component.Component.enable_instrumentation` is called,
+since they work by wrapping the timed methods of that very component
+instance. Once enabled, recording a value is a few integer operations on
+fixed-size structures, so it can be left on in production.
+"""
+from __future__ import absolute_import, division
+
+import time
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    # Python 2
+    clock = time.time
+
+#: Phases timed by :class:`~.Instrumentation`:
+#:
+#: * **read**: time spent waiting for input from Storm
+#: * **deserialize**: time spent decoding messages, excluding the wait
+#: * **process**: time spent processing a tuple or a spout command
+#: * **emit**: time spent serializing and writing messages to Storm
+#: * **taskids**: time spent waiting for the task ids of emitted tuples
+PHASES = ("read", "deserialize", "process", "emit", "taskids")
+
+#: Counters kept by :class:`~.Instrumentation`.
+COUNTERS = ("tuples", "emits", "acks", "fails", "bytes_in", "bytes_out")
+
+# Counter incremented by each command sent or received
+_COMMAND_COUNTERS = {
+    'emit': "emits",
+    'ack': "acks",
+    'fail': "fails",
+}
+
+# Each power of two is split into 2 ** _SUB_BUCKET_BITS buckets, bounding the
+# relative error of recorded values to 1 / 2 ** _SUB_BUCKET_BITS
+_SUB_BUCKET_BITS = 4
+
+# Values are recorded in microseconds, up to about 12 days
+_MAX_VALUE = 2 ** 40 - 1
+
+_PERCENTILES = (("p50", 50.0), ("p90", 90.0), ("p99", 99.0), ("p999", 99.9))
+
+
+def _bit_length_legacy(value):
+    """int.bit_length() of a positive value, which Python 2.6 lacks."""
+    if not value:
+        return 0
+    return len(bin(value)) - 2
+
+
+if hasattr(int, "bit_length"):
+    def _bit_length(value):
+        # Also works with the long values of Python 2
+        return value.bit_length()
+else:
+    _bit_length = _bit_length_legacy
+
+
+def _bucket_index(value):
+    # Values lower than 2 ** (_SUB_BUCKET_BITS + 1) get a bucket each, then
+    # each power of two is split into the same number of buckets
+    shift = max(0, _bit_length(value) - _SUB_BUCKET_BITS - 1)
+    return (shift << _SUB_BUCKET_BITS) + (value >> shift)
+
+
+def _bucket_high(index):
+    """Return the highest value falling into the bucket at index."""
+    shift = max(0, (index >> _SUB_BUCKET_BITS) - 1)
+    low = (index - (shift << _SUB_BUCKET_BITS)) << shift
+    return low + (1 << shift) - 1
+
+
+class Histogram(object):
+    """Latency histogram in the spirit of `HdrHistogram`_. Durations are
+    counted in log-linear buckets of microseconds, so that it takes the same
+    amount of memory whatever the number of values recorded, and percentiles
+    are accurate to about 6%.
+
+    .. _HdrHistogram: http://hdrhistogram.org/
+    """
+
+    def __init__(self):
+        self._counts = [0] * (_bucket_index(_MAX_VALUE) + 1)
+        self.reset()
+
+    def reset(self):
+        """Forget all the recorded values."""
+        for i in range(len(self._counts)):
+            self._counts[i] = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        """Record a duration in seconds."""
+        value = min(max(int(seconds * 1000000), 0), _MAX_VALUE)
+        self._counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        """Mean of the recorded durations, ``None`` if there is none."""
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """Return the duration below which ``percent`` percent of the
+        recorded durations fall, ``None`` if there is none.
+        """
+        if not self.count:
+            return None
+
+        # Rank of the value in the sorted recorded values, starting from 1
+        rank = max(1, int(-(-percent * self.count // 100)))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                break
+        return min(_bucket_high(index) / 1000000, self.max)
+
+    def snapshot(self):
+        """Return a ``dict`` summing up the recorded durations: count,
+        min, max, mean and the p50, p90, p99 and p999 percentiles.
+        """
+        snapshot = {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+        }
+        for name, percent in _PERCENTILES:
+            snapshot[name] = self.percentile(percent)
+        return snapshot
+
+
+class CountingStream(object):
+    """Output stream wrapper counting the bytes written into
+    instrumentation.
+    """
+
+    def __init__(self, stream, instrumentation):
+        self._stream = stream
+        self._counters = instrumentation.counters
+
+    def write(self, data):
+        self._counters['bytes_out'] += len(data)
+        return self._stream.write(data)
+
+    def flush(self):
+        return self._stream.flush()
+
+
+class Instrumentation(object):
+    """Latency histograms and counters of a component, see :data:`~.PHASES`
+    and :data:`~.COUNTERS`.
+
+    Durations are only recorded into the histograms if ``timing`` is
+    ``True``, otherwise only the counters are kept.
+
+    .. note::
+       Updates are not synchronized, so counters of components writing to
+       Storm from several threads may miss a few increments.
+    """
+
+    def __init__(self, timing=True):
+        #: ``bool`` whether durations are recorded into the histograms
+        self.timing = timing
+        #: ``dict`` of :class:`~.Histogram` by phase
+        self.histograms = dict((phase, Histogram()) for phase in PHASES)
+        #: ``dict`` of ``int`` counters by name
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        # Total time spent waiting for input, which read_msg() excludes from
+        # deserialization time
+        self.read_wait = 0.0
+
+    def record(self, phase, seconds):
+        """Record the duration of a phase in seconds."""
+        self.histograms[phase].record(seconds)
+
+    def record_read(self, seconds, n_bytes):
+        """Record a wait for input, which returned n_bytes bytes."""
+        self.histograms['read'].record(seconds)
+        self.read_wait += seconds
+        self.counters['bytes_in'] += n_bytes
+
+    def count_read(self, n_bytes):
+        """Count n_bytes bytes of input, without timing the wait."""
+        self.counters['bytes_in'] += n_bytes
+
+    def count_commands(self, command, n_commands=1):
+        """Count commands sent to or received from Storm."""
+        counter = _COMMAND_COUNTERS.get(command)
+        if counter is not None:
+            self.counters[counter] += n_commands
+
+    def timed(self, phase, fn):
+        """Return a wrapper of fn recording how long each call takes."""
+        histogram = self.histograms[phase]
+
+        def timed_fn(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.record(clock() - start)
+
+        return timed_fn
+
+    def snapshot(self, reset=False):
+        """Return a ``dict`` with the ``histograms`` snapshots by phase and
+        a copy of the ``counters``. Start over if ``reset`` is ``True``.
+        """
+        snapshot = {
+            'histograms': dict(
+                (phase, histogram.snapshot())
+                for phase, histogram in self.histograms.items()),
+            'counters': dict(self.counters),
+        }
+        if reset:
+            self.reset()
+        return snapshot
+
+    def reset(self):
+        """Reset all the histograms and counters."""
+        for histogram in self.histograms.values():
+            histogram.reset()
+        for counter in self.counters:
+            self.counters[counter] = 0
@@ -0,0 +1,175 @@
+"""Metrics of pyleus components, sent to Storm through the multilang
+``metrics`` command so that they reach the metrics consumers registered
+for the topology, next to the built-in metrics of the JVM side.
+
+Each component owns a :class:`~.MetricsRegistry` in
+:attr:`~pyleus.storm.component.Component.metrics`:
+
+.. code-block:: python
+
+   def initialize(self):
+       self.lookups = self.metrics.counter("lookups")
+       self.latency = self.metrics.histogram("lookup_latency")
+
+   def process_tuple(self, tup):
+       self.lookups.incr()
+       ...
+
+The registry is flushed to Storm every
+:attr:`~pyleus.storm.component.Component.METRICS_INTERVAL` seconds, and
+consumers receive all the metrics of a component as a single ``pyleus``
+metric whose value maps metric names to their values.
+"""
+from __future__ import absolute_import, division
+
+from pyleus.storm.instrumentation import Histogram
+
+# Please keep in sync with java PyleusShellMetric
+METRICS_NAME = "pyleus"
+
+# Prefix of the metrics pyleus registers by itself
+BUILTIN_PREFIX = "pyleus."
+
+
+class CountMetric(object):
+    """Number of events since the previous flush. Counts of several flushes
+    falling into the same Storm metrics bucket are added up.
+    """
+
+    def __init__(self):
+        self._value = 0
+
+    def incr(self, incr_by=1):
+        self._value += incr_by
+
+    def get_value_and_reset(self):
+        value = self._value
+        self._value = 0
+        return value
+
+
+class GaugeMetric(object):
+    """Value at the time of the flush, either set explicitly or returned by
+    ``fn``, called without arguments at each flush.
+    """
+
+    def __init__(self, fn=None):
+        self._fn = fn
+        self._value = None
+
+    def set(self, value):
+        self._value = value
+
+    def get_value_and_reset(self):
+        if self._fn is not None:
+            return self._fn()
+        return self._value
+
+
+class MeanMetric(object):
+    """Mean of the values recorded since the previous flush, ``None`` if
+    there is none, like Storm ``ReducedMetric(MeanReducer())``.
+    """
+
+    def __init__(self):
+        self._sum = 0
+        self._count = 0
+
+    def record(self, value):
+        self._sum += value
+        self._count += 1
+
+    def get_value_and_reset(self):
+        if not self._count:
+            return None
+        value = self._sum / self._count
+        self._sum = 0
+        self._count = 0
+        return value
+
+
+class HistogramMetric(object):
+    """Distribution of the durations, in seconds, recorded since the
+    previous flush, as returned by
+    :meth:`~pyleus.storm.instrumentation.Histogram.snapshot`. ``None`` if
+    there is none.
+    """
+
+    def __init__(self):
+        self._histogram = Histogram()
+
+    def record(self, seconds):
+        self._histogram.record(seconds)
+
+    def get_value_and_reset(self):
+        if not self._histogram.count:
+            return None
+        value = self._histogram.snapshot()
+        self._histogram.reset()
+        return value
+
+
+class MetricsRegistry(object):
+    """Metrics of a component by name. Asking twice for the same name
+    returns the same metric.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def __len__(self):
+        return len(self._metrics)
+
+    def _get_or_register(self, name, metric_cls, *args):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = metric_cls(*args)
+        elif type(metric) is not metric_cls:
+            raise ValueError("Metric {0} is already registered as a {1}".format(
+                name, type(metric).__name__))
+        return metric
+
+    def counter(self, name):
+        """Return the :class:`~.CountMetric` called name."""
+        return self._get_or_register(name, CountMetric)
+
+    def gauge(self, name, fn=None):
+        """Return the :class:`~.GaugeMetric` called name, calling fn to get
+        its value if given.
+        """
+        return self._get_or_register(name, GaugeMetric, fn)
+
+    def mean(self, name):
+        """Return the :class:`~.MeanMetric` called name."""
+        return self._get_or_register(name, MeanMetric)
+
+    def histogram(self, name):
+        """Return the :class:`~.HistogramMetric` called name."""
+        return self._get_or_register(name, HistogramMetric)
+
+    def get_values_and_reset(self):
+        """Return the ``counters`` and the other ``values`` to send to Storm,
+        leaving out the metrics without a value, and start a new interval.
+        """
+        counters = {}
+        values = {}
+        for name, metric in self._metrics.items():
+            value = metric.get_value_and_reset()
+            if isinstance(metric, CountMetric):
+                counters[name] = value
+            elif value is not None:
+                values[name] = value
+        return {'counters': counters, 'values': values}
+
+
+def add_instrumentation_values(metrics_values, instrumentation):
+    """Add the counters and latency histograms recorded by instrumentation
+    since the previous call to metrics_values, as built-in metrics.
+    """
+    snapshot = instrumentation.snapshot(reset=True)
+    for counter, value in snapshot['counters'].items():
+        metrics_values['counters'][BUILTIN_PREFIX + counter] = value
+    for phase, histogram in snapshot['histograms'].items():
+        if histogram['count']:
+            metrics_values['values'][
+                BUILTIN_PREFIX + "latency." + phase] = histogram
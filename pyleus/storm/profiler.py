@@ -0,0 +1,106 @@
+"""Sampling profiler meant to be left running in a live component.
+
+Every ``interval`` seconds of CPU time used by the process, a ``SIGPROF``
+signal interrupts the component, whose current stack is counted. The counts
+are written to a file every ``dump_interval`` seconds in the folded stacks
+format, one stack per line with frames separated by ``;`` followed by the
+number of samples, that `FlameGraph`_ turns into a flame graph::
+
+    flamegraph.pl profile-1234.folded > profile.svg
+
+Only the CPU time is sampled, so a component waiting for tuples costs
+nothing and does not show up in the profile.
+
+.. _FlameGraph: https://github.com/brendangregg/FlameGraph
+"""
+from __future__ import absolute_import
+
+from collections import defaultdict
+import os
+import signal
+import sys
+import threading
+import time
+
+
+class SamplingProfiler(object):
+    """Sample the stack of the main thread, or of all the threads if
+    ``all_threads`` is ``True``, every ``interval`` seconds of CPU time and
+    write the folded stacks to path every ``dump_interval`` seconds and when
+    stopped.
+
+    Only available on platforms providing ``signal.setitimer``.
+    """
+
+    def __init__(self, path, interval=0.01, dump_interval=60.0,
+                 all_threads=False):
+        if not hasattr(signal, "setitimer"):
+            raise ValueError(
+                "The sampling profiler is not supported on this platform")
+
+        self.path = path
+        self.interval = interval
+        self.dump_interval = dump_interval
+        self.all_threads = all_threads
+
+        # Number of samples by folded stack
+        self._stacks = defaultdict(int)
+        # Frame labels by code object, to format each of them only once
+        self._labels = {}
+        self._next_dump = time.time() + dump_interval
+        self._previous_handler = None
+
+    def start(self):
+        """Start sampling. Must be called from the main thread."""
+        self._next_dump = time.time() + self.dump_interval
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        """Stop sampling and write the samples collected so far."""
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self.dump()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = "{0} ({1}:{2})".format(
+                code.co_name, os.path.basename(code.co_filename),
+                code.co_firstlineno)
+        return label
+
+    def _fold(self, frame):
+        """Return the folded stack of frame, outermost frame first."""
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def _sample(self, signum, frame):
+        if self.all_threads:
+            current_frames = sys._current_frames()
+            # The signal handler runs in the main thread
+            current_frames[threading.current_thread().ident] = frame
+            frames = current_frames.values()
+        else:
+            frames = [frame]
+
+        for thread_frame in frames:
+            self._stacks[self._fold(thread_frame)] += 1
+
+        if time.time() >= self._next_dump:
+            self._next_dump = time.time() + self.dump_interval
+            self.dump()
+
+    def dump(self):
+        """Write the folded stacks sampled since the profiler started to
+        path, replacing the previous dump at once.
+        """
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write("{0} {1}\n".format(stack, count))
+        os.rename(tmp_path, self.path)
@@ -0,0 +1,141 @@
+"""Registry of the serializers pyleus components use to talk with Storm.
+
+A serializer can be referred to, in the topology definition YAML file or in
+the pyleus configuration passed to components, by:
+
+* the name of a built-in serializer: ``json``, ``fast_json`` or ``msgpack``;
+* the name under which a package registers it in the ``pyleus.serializers``
+  setuptools entry point group;
+* the dotted path of its class, e.g. ``my_package.serializers.MySerializer``
+  or ``my_package.serializers:MySerializer``.
+
+Serializers are subclasses of
+:class:`~pyleus.storm.serializers.serializer.Serializer` implementing
+``read_msg`` and ``send_msg``. Their ``PROTOCOL`` attribute tells the Java
+topology builder which Storm multilang serializer speaks the same wire format,
+while ``SUPPORTS_BATCHING`` tells whether they accept the ``buffered`` option.
+"""
+from __future__ import absolute_import
+
+from pyleus.storm.serializers.fast_json_serializer import FastJSONSerializer
+from pyleus.storm.serializers.json_serializer import JSONSerializer
+from pyleus.storm.serializers.msgpack_serializer import MsgpackSerializer
+from pyleus.storm.serializers.serializer import Serializer
+
+ENTRY_POINT_GROUP = "pyleus.serializers"
+
+JSON_SERIALIZER = "json"
+FAST_JSON_SERIALIZER = "fast_json"
+MSGPACK_SERIALIZER = "msgpack"
+SERIALIZERS = {
+    JSON_SERIALIZER: JSONSerializer,
+    FAST_JSON_SERIALIZER: FastJSONSerializer,
+    MSGPACK_SERIALIZER: MsgpackSerializer,
+}
+
+# Wire formats the Java topology builder knows how to configure Storm for
+PROTOCOLS = (JSON_SERIALIZER, MSGPACK_SERIALIZER)
+
+
+def _import_from_path(path):
+    """Import and return the object a dotted path refers to."""
+    if ":" in path:
+        module_name, _, attr_name = path.partition(":")
+    else:
+        module_name, _, attr_name = path.rpartition(".")
+
+    if not module_name or not attr_name:
+        return None
+
+    try:
+        module = __import__(module_name, fromlist=[attr_name])
+    except ImportError:
+        return None
+
+    return getattr(module, attr_name, None)
+
+
+def _iter_entry_points(name):
+    """Return the entry points registered under name in
+    ENTRY_POINT_GROUP.
+
+    importlib.metadata is used if available, pkg_resources otherwise. Both
+    are only imported here: pkg_resources is slow to import, and missing
+    from virtualenvs without setuptools.
+    """
+    try:
+        import importlib.metadata as metadata
+    except ImportError:
+        # Python < 3.8
+        import pkg_resources
+        return list(pkg_resources.iter_entry_points(ENTRY_POINT_GROUP, name))
+
+    try:
+        entry_points = metadata.entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python 3.8 and 3.9 return a dict of entry points by group
+        entry_points = metadata.entry_points().get(ENTRY_POINT_GROUP, ())
+    return [
+        entry_point for entry_point in entry_points
+        if entry_point.name == name]
+
+
+def _load_entry_point(name):
+    """Load the serializer registered under name by an installed package."""
+    for entry_point in _iter_entry_points(name):
+        return entry_point.load()
+
+    return None
+
+
+def _is_implemented(serializer_cls, method_name):
+    method = getattr(serializer_cls, method_name, None)
+    base_method = getattr(Serializer, method_name)
+    # Unbound methods on Python 2, plain functions on Python 3
+    return (callable(method) and
+            getattr(method, "__func__", method) is not
+            getattr(base_method, "__func__", base_method))
+
+
+def validate_serializer(serializer_cls, name):
+    """Ensure that serializer_cls is a usable serializer class.
+
+    :raises ValueError: if it is not
+    """
+    if not (isinstance(serializer_cls, type) and
+            issubclass(serializer_cls, Serializer)):
+        raise ValueError(
+            "Serializer {0} is not a subclass of Serializer: {1}".format(
+                name, serializer_cls))
+
+    for method_name in ("read_msg", "send_msg"):
+        if not _is_implemented(serializer_cls, method_name):
+            raise ValueError(
+                "Serializer {0} does not implement {1}".format(
+                    name, method_name))
+
+
+def load_serializer(name):
+    """Return the serializer class referred to by name, looking in turn at
+    built-in serializers, entry points and dotted paths.
+
+    :raises ValueError: if no valid serializer is found
+    """
+    # Built-in serializers never look for entry points
+    if name in SERIALIZERS:
+        return SERIALIZERS[name]
+
+    serializer_cls = None
+    if name:
+        serializer_cls = _load_entry_point(name) or _import_from_path(name)
+
+    if serializer_cls is None:
+        raise ValueError("Unknown serializer: {0}".format(name))
+
+    validate_serializer(serializer_cls, name)
+    return serializer_cls
+
+
+def supports_batching(serializer_cls):
+    """Tell whether the serializer accepts the ``buffered`` option."""
+    return getattr(serializer_cls, "SUPPORTS_BATCHING", False)
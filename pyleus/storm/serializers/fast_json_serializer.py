@@ -0,0 +1,103 @@
+"""JSON implementation of Pyleus serializer backed by the fastest available
+JSON library: `orjson`_, then `ujson`_, then the same module used by
+:class:`~pyleus.storm.serializers.json_serializer.JSONSerializer`.
+
+The wire format is the one of the stock Storm JSON multilang protocol, so it
+can be used wherever the ``json`` serializer is.
+
+.. _orjson: https://pypi.python.org/pypi/orjson
+.. _ujson: https://pypi.python.org/pypi/ujson
+"""
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+from pyleus.storm.serializers.json_serializer import JSONSerializer
+
+ORJSON_BACKEND = "orjson"
+UJSON_BACKEND = "ujson"
+JSON_BACKEND = "json"
+
+
+def _available_backends():
+    """Return the names of the available backends, fastest first."""
+    backends = []
+    if orjson is not None:
+        backends.append(ORJSON_BACKEND)
+    if ujson is not None:
+        backends.append(UJSON_BACKEND)
+    backends.append(JSON_BACKEND)
+    return backends
+
+
+def _orjson_dumps(obj):
+    # Storm expects the same output as json.dumps, which turns non-string
+    # keys into strings
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, escape_forward_slashes=False).encode("utf-8")
+
+
+class FastJSONSerializer(JSONSerializer):
+    """JSON serializer using the fastest available JSON library, or the one
+    given as ``backend``: ``orjson``, ``ujson`` or ``json``.
+
+    Messages the backend cannot encode, such as integers bigger than 64 bits
+    or namedtuples with orjson, are encoded like
+    :class:`~pyleus.storm.serializers.json_serializer.JSONSerializer` does.
+
+    orjson only encodes: it decodes integers bigger than 64 bits as
+    ``float``, so messages are decoded with ujson, if available, or like
+    :class:`~pyleus.storm.serializers.json_serializer.JSONSerializer` does.
+    So are the messages ujson cannot decode.
+    """
+
+    def __init__(self, input_stream, output_stream, backend=None, **kwargs):
+        super(FastJSONSerializer, self).__init__(
+            input_stream, output_stream, **kwargs)
+
+        available_backends = _available_backends()
+        if backend is None:
+            backend = available_backends[0]
+        elif backend not in available_backends:
+            raise ValueError(
+                "JSON backend not available: {0}. Available: {1}".format(
+                    backend, available_backends))
+
+        self.backend = backend
+
+        self._dumps = None
+        self._loads = None
+        if backend == ORJSON_BACKEND:
+            self._dumps = _orjson_dumps
+        elif backend == UJSON_BACKEND:
+            self._dumps = _ujson_dumps
+        if backend != JSON_BACKEND and ujson is not None:
+            self._loads = ujson.loads
+
+    def _decode(self, frame):
+        """Decode a message straight from its UTF-8 encoded JSON text."""
+        if self._loads is not None:
+            try:
+                return self._loads(frame)
+            except ValueError:
+                # Such as integers too big for older ujson versions
+                pass
+        return super(FastJSONSerializer, self)._decode(frame)
+
+    def _encode(self, msg_dict):
+        if self._dumps is not None:
+            try:
+                return self._dumps(msg_dict)
+            except (TypeError, ValueError, OverflowError):
+                pass
+        return super(FastJSONSerializer, self)._encode(msg_dict)
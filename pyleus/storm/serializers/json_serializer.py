@@ -7,35 +7,107 @@ except ImportError:
     import json
 
 from pyleus.storm import StormWentAwayError
+from pyleus.storm.serializers.serializer import DEFAULT_READ_SIZE
 from pyleus.storm.serializers.serializer import Serializer
 
+# The Storm multilang protocol consists of JSON messages followed by a newline
+# and "end\n".
+END_OF_MESSAGE = b"\nend\n"
 
-class JSONSerializer(Serializer):
 
-    def read_msg(self):
-        """The Storm multilang protocol consists of JSON messages followed by
-        a newline and "end\n".
-        """
-        lines = []
+def _frames_generator(chunks):
+    """Yield the UTF-8 encoded JSON text of each message received in chunks
+    of input as a ``bytearray``, scanning a single read buffer for the end of
+    message delimiter instead of reading the input line by line.
+    """
+    pending = bytearray()
+    for chunk in chunks:
+        # The delimiter may straddle the previous chunk and this one
+        scan_start = max(0, len(pending) - len(END_OF_MESSAGE) + 1)
+        pending.extend(chunk)
+
+        frame_start = 0
         while True:
-            line = self._input_stream.readline()
-            if not line:
-                # Handle EOF, which usually means Storm went away
-                raise StormWentAwayError()
+            frame_end = pending.find(END_OF_MESSAGE, scan_start)
+            if frame_end == -1:
+                break
+            yield pending[frame_start:frame_end]
+            frame_start = scan_start = frame_end + len(END_OF_MESSAGE)
 
-            line = line.strip()
+        del pending[:frame_start]
 
-            if line == "end":
-                break
+    # Handle EOF, which usually means Storm went away
+    raise StormWentAwayError()
+
+
+class JSONSerializer(Serializer):
+    """JSON serializer.
+
+    In buffered mode, outgoing messages are encoded into a single reusable
+    ``bytearray``. Input is read in chunks of at most ``read_size`` bytes and
+    every message is decoded at once as soon as its delimiter is found.
+    """
+
+    PROTOCOL = "json"
+    SUPPORTS_BATCHING = True
+
+    def __init__(self, input_stream, output_stream, read_size=DEFAULT_READ_SIZE,
+                 **kwargs):
+        super(JSONSerializer, self).__init__(
+            input_stream, output_stream, **kwargs)
 
-            lines.append(line)
+        self._frames = _frames_generator(self._read_chunks(read_size))
 
-        msg_str = '\n'.join(lines)
-        return json.loads(msg_str)
+        self._decoder = json.JSONDecoder()
+        self._encoder = json.JSONEncoder()
+        self._out_buffer = bytearray()
+
+    def read_msg(self):
+        """The Storm multilang protocol consists of JSON messages followed by
+        a newline and "end\n".
+        """
+        return self._decode(next(self._frames))
 
     def send_msg(self, msg_dict):
         """Serialize to JSON a message dictionary and write it to the output
         stream, followed by a newline and "end\n".
         """
-        self._output_stream.write(json.dumps(msg_dict) + '\nend\n')
-        self._output_stream.flush()
+        data = self._encode(msg_dict) + END_OF_MESSAGE
+
+        if not self._buffered:
+            self._output_stream.write(data)
+            self._output_stream.flush()
+            return
+
+        self._out_buffer.extend(data)
+        self._buffer_updated(len(self._out_buffer))
+
+    def send_msgs(self, msg_dicts):
+        """Serialize several message dictionaries into one chunk of data and
+        write it to the output stream with a single flush.
+        """
+        if not self._buffered:
+            data = bytearray()
+            for msg_dict in msg_dicts:
+                data.extend(self._encode(msg_dict))
+                data.extend(END_OF_MESSAGE)
+            self._output_stream.write(bytes(data))
+            self._output_stream.flush()
+            return
+
+        for msg_dict in msg_dicts:
+            self._out_buffer.extend(self._encode(msg_dict))
+            self._out_buffer.extend(END_OF_MESSAGE)
+        self._buffer_updated(len(self._out_buffer))
+
+    def _decode(self, frame):
+        """Decode a message from its UTF-8 encoded JSON text."""
+        return self._decoder.decode(frame.decode("utf-8"))
+
+    def _encode(self, msg_dict):
+        """Return the UTF-8 encoded JSON text of a message."""
+        return self._encoder.encode(msg_dict).encode("utf-8")
+
+    def _write_buffer(self):
+        self._output_stream.write(bytes(self._out_buffer))
+        del self._out_buffer[:]
@@ -1,40 +1,171 @@
 """Messagepack implementation of Pyleus serializer"""
 
-import os
-
 import msgpack
 
+from pyleus.storm import LazyStormTuple
 from pyleus.storm import StormWentAwayError
+from pyleus.storm.serializers.serializer import DEFAULT_READ_SIZE
 from pyleus.storm.serializers.serializer import Serializer
 
 
-def _messages_generator(input_stream):
+def _messages_generator(chunks):
     unpacker = msgpack.Unpacker(encoding="latin1")
-    while True:
-        # f.read(n) on sys.stdin blocks until n bytes are read, causing
-        # serializer to hang.
-        # os.read(fileno, n) will block if there is nothing to read, but will
-        # return as soon as it is able to read at most n bytes.
-        line = os.read(input_stream.fileno(), 1024 ** 2)
-        if not line:
-            # Handle EOF, which usually means Storm went away
-            raise StormWentAwayError()
+    for chunk in chunks:
         # As python-msgpack docs suggest, we feed data to the unpacker
         # internal buffer in order to let the unpacker deal with message
         # boundaries recognition and uncomplete messages. In case input ends
         # with a partial message, unpacker raises a StopIteration and will be
         # able to continue after being feeded with the rest of the message.
-        unpacker.feed(line)
+        # The unpacker copies the data, so the chunk buffer can be reused
+        # right away.
+        unpacker.feed(chunk)
         for i in unpacker:
             yield i
 
+    # Handle EOF, which usually means Storm went away
+    raise StormWentAwayError()
+
+
+def _is_map(first_byte):
+    """Tell whether a msgpack object starting with first_byte is a map."""
+    # fixmap, map 16 and map 32
+    return 0x80 <= first_byte <= 0x8f or first_byte in (0xde, 0xdf)
+
+
+def _decode_values(raw_values):
+    return msgpack.unpackb(raw_values, encoding="latin1")
+
+
+# Key of the map entry being parsed, none yet
+_NO_KEY = object()
+
+
+class _MessageParser(object):
+    """Parse a message starting at the stream offset start of an unpacker,
+    across as many chunks as it spans. Maps holding a tuple are turned into
+    a :class:`~pyleus.storm.LazyStormTuple` straight away, keeping the
+    encoded tuple values, sliced out of the input.
+
+    When the unpacker runs out of data in the middle of the message, parse()
+    raises msgpack.OutOfData, and resumes from the object it was reading
+    once called again with more data.
+    """
+
+    def __init__(self, start, is_map):
+        self.start = start
+        self._is_map = is_map
+        # Map entries not parsed yet, once the map header is read
+        self._remaining = None
+        self._key = _NO_KEY
+        self._fields = {}
+        self._values_start = None
+        self._raw_values = None
+
+    def parse(self, unpacker, pending, pending_offset):
+        """Return the message, read from unpacker. pending holds the input
+        from the stream offset pending_offset, up to the end of the data fed
+        to unpacker.
+        """
+        if not self._is_map:
+            return unpacker.unpack()
+
+        if self._remaining is None:
+            self._remaining = unpacker.read_map_header()
+        while self._remaining:
+            if self._key is _NO_KEY:
+                self._key = unpacker.unpack()
+            if self._key == "tuple":
+                if self._values_start is None:
+                    self._values_start = unpacker.tell()
+                unpacker.skip()
+                self._raw_values = bytes(
+                    pending[self._values_start - pending_offset:
+                            unpacker.tell() - pending_offset])
+            else:
+                self._fields[self._key] = unpacker.unpack()
+            self._key = _NO_KEY
+            self._remaining -= 1
+
+        fields = self._fields
+        if self._raw_values is None:
+            # Not a tuple, e.g. the setup info or a spout command
+            return fields
+
+        return LazyStormTuple(fields.get("id"), fields.get("comp"),
+                              fields.get("stream"), fields.get("task"),
+                              raw_values=self._raw_values,
+                              decode=_decode_values)
+
+
+def _lazy_messages_generator(chunks):
+    """Like _messages_generator, but yielding tuples whose values are
+    decoded only when accessed.
+    """
+    # Messages are parsed in a single pass by one unpacker, without building
+    # objects for the tuple values, whose encoded bytes are sliced out of
+    # pending, holding a copy of the input from the start of the message
+    # being parsed, at the stream offset pending_offset.
+    unpacker = msgpack.Unpacker(encoding="latin1")
+    pending = bytearray()
+    pending_offset = 0
+    parser = None
+    for chunk in chunks:
+        unpacker.feed(chunk)
+        pending.extend(chunk)
+
+        while True:
+            if parser is None:
+                start = unpacker.tell()
+                if start - pending_offset >= len(pending):
+                    break
+                parser = _MessageParser(
+                    start, _is_map(pending[start - pending_offset]))
+            try:
+                message = parser.parse(unpacker, pending, pending_offset)
+            except msgpack.OutOfData:
+                # The message ends in a later chunk
+                break
+            parser = None
+            yield message
+
+        start = unpacker.tell() if parser is None else parser.start
+        del pending[:start - pending_offset]
+        pending_offset = start
+
+    # Handle EOF, which usually means Storm went away
+    raise StormWentAwayError()
+
 
 class MsgpackSerializer(Serializer):
+    """Msgpack serializer.
+
+    In buffered mode, outgoing messages are packed into a single reusable
+    :class:`msgpack.Packer` buffer. Input is read in chunks of at most
+    ``read_size`` bytes into a single preallocated buffer.
 
-    def __init__(self, input_stream, output_stream):
-        super(MsgpackSerializer, self).__init__(input_stream, output_stream)
+    With ``lazy_tuples``, tuple commands are read as
+    :class:`~pyleus.storm.LazyStormTuple` without building a dictionary for
+    them, and their values are decoded only when accessed. Their other fields
+    are read one by one, which is slower than decoding small messages at
+    once, so it only pays off for big values that are seldom accessed.
+    """
 
-        self._messages = _messages_generator(self._input_stream)
+    PROTOCOL = "msgpack"
+    SUPPORTS_BATCHING = True
+
+    def __init__(self, input_stream, output_stream, read_size=DEFAULT_READ_SIZE,
+                 lazy_tuples=False, **kwargs):
+        super(MsgpackSerializer, self).__init__(
+            input_stream, output_stream, **kwargs)
+
+        if lazy_tuples:
+            self._messages = _lazy_messages_generator(
+                self._read_chunks(read_size))
+        else:
+            self._messages = _messages_generator(self._read_chunks(read_size))
+
+        self._packer = msgpack.Packer(use_bin_type=True, encoding="latin1",
+                                      autoreset=not self._buffered)
 
     def read_msg(self):
         """"Messages are delimited by msgapck itself, no need for Storm
@@ -46,6 +177,29 @@ class MsgpackSerializer(Serializer):
         """"Messages are delimited by msgapck itself, no need for Storm
         multilang end line.
         """
-        msgpack.pack(msg_dict, self._output_stream, use_bin_type=True,
-                     encoding="latin1")
-        self._output_stream.flush()
+        if not self._buffered:
+            self._output_stream.write(self._packer.pack(msg_dict))
+            self._output_stream.flush()
+            return
+
+        self._packer.pack(msg_dict)
+        self._buffer_updated(len(self._packer.getbuffer()))
+
+    def send_msgs(self, msg_dicts):
+        """Pack several message dictionaries into one chunk of data and write
+        it to the output stream with a single flush.
+        """
+        if not self._buffered:
+            data = b"".join(self._packer.pack(msg_dict)
+                            for msg_dict in msg_dicts)
+            self._output_stream.write(data)
+            self._output_stream.flush()
+            return
+
+        for msg_dict in msg_dicts:
+            self._packer.pack(msg_dict)
+        self._buffer_updated(len(self._packer.getbuffer()))
+
+    def _write_buffer(self):
+        self._output_stream.write(self._packer.bytes())
+        self._packer.reset()
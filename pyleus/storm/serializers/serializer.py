@@ -1,14 +1,171 @@
 """Base class for all serialziers used by Storm component. Please note that for
 each serializer a Java counterpart need to be built.
 """
+import io
+import os
+import time
+
+from six.moves import builtins
+
+from pyleus.storm.instrumentation import CountingStream
+from pyleus.storm.instrumentation import clock
+
+# Thresholds triggering a flush of the output buffer in buffered mode
+DEFAULT_MAX_BUFFER_SIZE = 64 * 1024
+DEFAULT_MAX_BUFFER_AGE = 0.1
+
+# Maximum number of bytes read from the input stream at once
+DEFAULT_READ_SIZE = 1024 ** 2
+
+# memoryview appeared in Python 2.7
+_HAS_MEMORYVIEW = hasattr(builtins, "memoryview")
+
+
+def read_chunks(input_stream, read_size=DEFAULT_READ_SIZE):
+    """Yield chunks of at most read_size bytes from the input stream as
+    memoryview slices of a single preallocated buffer. Each chunk is only
+    valid until the next one is requested. Stop on EOF.
+
+    On interpreters without memoryview (Python 2.6), chunks are bytes
+    objects read with os.read() instead.
+    """
+    if not _HAS_MEMORYVIEW:
+        return _read_chunks_legacy(input_stream, read_size)
+    return _readinto_chunks(input_stream, read_size)
+
+
+def _readinto_chunks(input_stream, read_size):
+    # f.read(n) on sys.stdin blocks until n bytes are read, causing
+    # serializer to hang.
+    # readinto() on an unbuffered file object is a single read(2): it will
+    # block if there is nothing to read, but will return as soon as it is able
+    # to read at most n bytes. Reading into the same preallocated buffer over
+    # and over avoids allocating a new bytes object of read_size on each call.
+    raw_input_stream = io.FileIO(input_stream.fileno(), "rb", closefd=False)
+    read_buffer = memoryview(bytearray(read_size))
+    while True:
+        n_bytes = raw_input_stream.readinto(read_buffer)
+        if not n_bytes:
+            return
+        yield read_buffer[:n_bytes]
+
+
+def _read_chunks_legacy(input_stream, read_size):
+    # os.read() is a single read(2) too, but allocates a new bytes object
+    # for every chunk
+    while True:
+        chunk = os.read(input_stream.fileno(), read_size)
+        if not chunk:
+            return
+        yield chunk
 
 
 class Serializer(object):
+    """Base class for serializers.
+
+    In buffered mode, outgoing messages are accumulated in memory and
+    written to the output stream only at protocol sync points: before blocking
+    for more input in :meth:`~._read_chunks`, when :meth:`~.flush` is called explicitly, or when
+    the buffer grows bigger than ``max_buffer_size`` bytes or older than
+    ``max_buffer_age`` seconds.
+    """
+
+    #: Storm multilang serializer speaking the same wire format, one of
+    #: ``json`` or ``msgpack``.
+    PROTOCOL = None
 
-    def __init__(self, input_stream, output_stream):
+    #: Whether the serializer implements buffered mode.
+    SUPPORTS_BATCHING = False
+
+    #: :class:`~pyleus.storm.instrumentation.Instrumentation` recording the
+    #: serializer activity, ``None`` unless counted.
+    instrumentation = None
+
+    #: Callable without arguments called right before blocking for more
+    #: input, ``None`` by default. Only serializers reading their input
+    #: through :meth:`~._read_chunks` call it.
+    before_read = None
+
+    def __init__(self, input_stream, output_stream, buffered=False,
+                 max_buffer_size=DEFAULT_MAX_BUFFER_SIZE,
+                 max_buffer_age=DEFAULT_MAX_BUFFER_AGE):
         self._input_stream = input_stream
         self._output_stream = output_stream
 
+        self._buffered = buffered
+        self._max_buffer_size = max_buffer_size
+        self._max_buffer_age = max_buffer_age
+
+        # Size and creation time of the messages waiting in the buffer
+        self._buffer_size = 0
+        self._buffer_time = None
+
+    def _read_chunks(self, read_size):
+        """Like :func:`~.read_chunks` on the input stream, calling
+        :attr:`~.before_read` then flushing the output buffer before reading
+        each chunk, since Storm may be waiting for our output before sending
+        anything. Counts the bytes read once counted and records the time
+        spent waiting for them once instrumented.
+        """
+        chunks = read_chunks(self._input_stream, read_size)
+        while True:
+            before_read = self.before_read
+            if before_read is not None:
+                before_read()
+            if self._buffer_size:
+                self.flush()
+            instrumentation = self.instrumentation
+            if instrumentation is None:
+                chunk = next(chunks, None)
+            elif instrumentation.timing:
+                start = clock()
+                chunk = next(chunks, None)
+                instrumentation.record_read(
+                    clock() - start, 0 if chunk is None else len(chunk))
+            else:
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    instrumentation.count_read(len(chunk))
+            if chunk is None:
+                return
+            yield chunk
+
+    def count(self, instrumentation):
+        """Count into instrumentation the bytes read and written.
+
+        Only serializers reading their input through :meth:`~._read_chunks`
+        count the bytes read.
+        """
+        self.instrumentation = instrumentation
+        self._output_stream = CountingStream(
+            self._output_stream, instrumentation)
+
+    def instrument(self, instrumentation):
+        """Record into instrumentation the time spent waiting for input,
+        decoding messages and sending them, and count the bytes read and
+        written if they are not counted yet.
+
+        Only serializers reading their input through :meth:`~._read_chunks`
+        tell the wait for input apart from decoding.
+        """
+        if self.instrumentation is not instrumentation:
+            self.count(instrumentation)
+
+        read_msg = self.read_msg
+
+        def instrumented_read_msg():
+            read_wait = instrumentation.read_wait
+            start = clock()
+            msg = read_msg()
+            instrumentation.record(
+                'deserialize',
+                clock() - start - (instrumentation.read_wait - read_wait))
+            return msg
+
+        self.read_msg = instrumented_read_msg
+        self.send_msg = instrumentation.timed('emit', self.send_msg)
+        self.send_msgs = instrumentation.timed('emit', self.send_msgs)
+
     def read_msg(self):
         """Return the dictionary message received on the input stream.
         raises: StormWentAwayError if EOF is reached."""
@@ -17,3 +174,41 @@ class Serializer(object):
     def send_msg(self, msg_dict):
         """Serialize a message dictionary and write it to the output stream."""
         raise NotImplementedError
+
+    def send_msgs(self, msg_dicts):
+        """Serialize several message dictionaries and write them to the output
+        stream. Serializers should override this to write them at once.
+        """
+        for msg_dict in msg_dicts:
+            self.send_msg(msg_dict)
+
+    def _buffer_updated(self, buffer_size):
+        """Called by subclasses in buffered mode after adding a message to
+        their buffer, flush it if any threshold is hit.
+        """
+        self._buffer_size = buffer_size
+
+        now = time.time()
+        if self._buffer_time is None:
+            self._buffer_time = now
+
+        if (buffer_size >= self._max_buffer_size or
+                now - self._buffer_time >= self._max_buffer_age):
+            self.flush()
+
+    def _write_buffer(self):
+        """Write the buffered messages to the output stream and empty the
+        buffer.
+
+        .. note:: Implement in subclasses supporting buffered mode.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """Write the buffered messages, if any, and flush the output stream."""
+        if self._buffer_size:
+            self._write_buffer()
+            self._buffer_size = 0
+            self._buffer_time = None
+
+        self._output_stream.flush()
@@ -1,10 +1,22 @@
-"""Module containing the implementation of the Spout component."""
+"""Module containing the implementation of the Spout component, a subclassed
+BufferedSpout component reading its source in the background, a subclassed
+BatchSpout component emitting and acking tuples in batches, and a subclassed
+ReliableSpout component tracking and replaying its tuples.
+"""
 from __future__ import absolute_import
 
+from collections import deque
+import heapq
+import itertools
 import logging
+import threading
+import time
+
+import msgpack
 
 from pyleus.storm import StormWentAwayError
 from pyleus.storm.component import Component
+from pyleus.storm.metrics import BUILTIN_PREFIX
 
 log = logging.getLogger(__name__)
 
@@ -54,8 +66,27 @@ class Spout(Component):
         elif command == 'fail':
             self.fail(msg['id'])
 
+    def _instrument(self, instrumentation):
+        """Also time the commands going through _handle_command()."""
+        super(Spout, self)._instrument(instrumentation)
+        self._handle_command = instrumentation.timed(
+            'process', self._handle_command)
+
+    def _add_builtin_metrics(self, instrumentation):
+        """Also count the tuples acked or failed."""
+        super(Spout, self)._add_builtin_metrics(instrumentation)
+
+        handle_command = self._handle_command
+
+        def counted_handle_command(msg):
+            instrumentation.count_commands(msg['command'])
+            return handle_command(msg)
+
+        self._handle_command = counted_handle_command
+
     def _sync(self):
-        """Send a sync message."""
+        """Send a sync message, flushing metrics beforehand when due."""
+        self._maybe_flush_metrics()
         self.send_command('sync')
 
     def run_component(self):
@@ -71,7 +102,7 @@ class Spout(Component):
     def emit(
             self, values,
             stream=None, tup_id=None,
-            direct_task=None, need_task_ids=True):
+            direct_task=None, need_task_ids=True, pipelined=False):
         """Build and send an output tuple command dict and return the ids of
         the tasks to which the tuple was sent by Storm.
 
@@ -92,6 +123,11 @@ class Spout(Component):
          whether emit should return the ids of the task the message has been
          sent to, default ``True``
         :type need_task_ids: ``bool``
+        :param pipelined:
+         return a :class:`~pyleus.storm.component.TaskIdsFuture` instead of
+         waiting for Storm to send the task ids, so that other tuples can be
+         emitted meanwhile, default ``False``
+        :type pipelined: ``bool``
 
         .. note:: ``tup_id`` should be JSON-serializable.
 
@@ -104,12 +140,51 @@ class Spout(Component):
         .. tip::
            Setting ``need_task_ids`` to ``False`` really helps in achieving
            better performances. You should always do that if your application
-           does not leverage task ids.
+           does not leverage task ids. If it does, consider ``pipelined``.
 
         .. danger::
            ``direct_task`` is not yet supported.
 
         """
+        command_dict = self._emit_command_dict(
+            values, stream, tup_id, direct_task)
+
+        return self._send_emit(command_dict, need_task_ids, pipelined)
+
+    def emit_many(
+            self, values_iterable,
+            stream=None, tup_ids=None,
+            direct_task=None, need_task_ids=True, pipelined=False):
+        """Build the output tuple command dicts for several tuples, send them
+        to Storm with a single write and return the list of the ids of the
+        tasks to which each tuple was sent by Storm.
+
+        :param values_iterable: pyleus tuple values to be emitted
+        :type values_iterable: iterable of ``tuple`` or ``list``
+        :param tup_ids:
+         identifiers of the tuples, in the same order as
+         ``values_iterable``, default ``None``
+        :type tup_ids: iterable of ``str`` or ``long``
+
+        All the tuples share the other arguments, documented in
+        :meth:`~.emit`. With ``pipelined``, a list of
+        :class:`~pyleus.storm.component.TaskIdsFuture` is returned.
+        """
+        if tup_ids is None:
+            command_dicts = [
+                self._emit_command_dict(values, stream, None, direct_task)
+                for values in values_iterable]
+        else:
+            values_list = list(values_iterable)
+            tup_ids = list(tup_ids)
+            assert len(values_list) == len(tup_ids)
+            command_dicts = [
+                self._emit_command_dict(values, stream, tup_id, direct_task)
+                for values, tup_id in zip(values_list, tup_ids)]
+
+        return self._send_emits(command_dicts, need_task_ids, pipelined)
+
+    def _emit_command_dict(self, values, stream, tup_id, direct_task):
         assert isinstance(values, list) or isinstance(values, tuple)
 
         command_dict = {
@@ -128,13 +203,371 @@ class Spout(Component):
         if direct_task is not None:
             command_dict['task'] = direct_task
 
-        # By default, Storm sends back to the component the task ids of the
-        # tasks receiving the tuple. If need_task_ids is set to False, Storm
-        # won't send the task ids for that message
-        if not need_task_ids:
-            command_dict['need_task_ids'] = False
+        return command_dict
+
+
+class BufferedSpout(Spout):
+    """A Spout reading its tuples from a source in a background thread, so
+    that blocking I/O never delays its answers to Storm.
+
+    Implement generate() in a subclass. It is run in a background thread,
+    filling a buffer from which up to ``BATCH_SIZE`` tuples are emitted, with
+    a single write, each time Storm asks for the next tuple.
+
+    Once the buffer holds ``HIGH_WATERMARK`` tuples, generate() is not
+    resumed until it is drained down to ``LOW_WATERMARK``.
+    """
+
+    #: ``int`` maximum number of tuples emitted at once.
+    BATCH_SIZE = 1
+
+    #: ``int`` number of buffered tuples pausing the background thread.
+    HIGH_WATERMARK = 1000
+
+    #: ``int`` number of buffered tuples resuming the background thread.
+    LOW_WATERMARK = 500
+
+    def __init__(self, *args, **kwargs):
+        super(BufferedSpout, self).__init__(*args, **kwargs)
+
+        self._buffer = deque()
+        # Held to update the buffer and its metrics, notified when the buffer
+        # is drained down to the low watermark
+        self._buffer_cond = threading.Condition()
+        self._generate_thread = None
+        # Exception raised by generate(), re-raised in the main thread
+        self._generate_error = None
+
+        self._empty_since = time.time()
+        self._reset_buffer_metrics()
+
+    def generate(self):
+        """Generate the tuples to emit. Called in a background thread once
+        the spout is initialized, blocking I/O is fine here.
+
+        :return:
+         iterable of ``(values, tup_id)`` pairs, ``tup_id`` being ``None``
+         for tuples not tracked for reliability
+        :rtype: iterable of ``tuple``
+
+        .. note:: Implement in subclass.
+        """
+        raise NotImplementedError()
+
+    def _reset_buffer_metrics(self):
+        self._occupancy_sum = 0
+        self._occupancy_samples = 0
+        self._empty_time = 0.0
+        self._paused_time = 0.0
+
+    def get_buffer_metrics(self):
+        """Return metrics about the buffer since the previous call.
+
+        :return:
+         ``dict`` with the number of tuples in the ``buffer``, their
+         ``mean_occupancy`` when Storm asked for tuples, and the seconds the
+         buffer spent ``empty`` and the background thread spent ``paused``
+         because of the high watermark
+        :rtype: ``dict``
+        """
+        with self._buffer_cond:
+            now = time.time()
+            empty_time = self._empty_time
+            if self._empty_since is not None:
+                empty_time += now - self._empty_since
+                self._empty_since = now
+
+            metrics = {
+                'buffer': len(self._buffer),
+                'mean_occupancy': (
+                    float(self._occupancy_sum) / self._occupancy_samples
+                    if self._occupancy_samples else 0.0),
+                'empty': empty_time,
+                'paused': self._paused_time,
+            }
+            self._reset_buffer_metrics()
+
+        return metrics
+
+    def _add_builtin_metrics(self, instrumentation):
+        """Also send the buffer metrics along with the built-in metrics."""
+        super(BufferedSpout, self)._add_builtin_metrics(instrumentation)
+        self.metrics.gauge(BUILTIN_PREFIX + "buffer", self.get_buffer_metrics)
+
+    def run_component(self):
+        """Start the background thread, then run the Spout main loop."""
+        self._generate_thread = threading.Thread(target=self._generate_loop)
+        # Do not hang on exit because of a thread blocked on the source
+        self._generate_thread.daemon = True
+        self._generate_thread.start()
+
+        super(BufferedSpout, self).run_component()
+
+    def _generate_loop(self):
+        """Background thread main loop."""
+        try:
+            for item in self.generate():
+                self._buffer_item(item)
+        except Exception as e:
+            log.exception("Exception in {0}.generate".format(
+                type(self).__name__))
+            self._generate_error = e
+
+    def _buffer_item(self, item):
+        with self._buffer_cond:
+            if len(self._buffer) >= self.HIGH_WATERMARK:
+                paused_since = time.time()
+                while len(self._buffer) > self.LOW_WATERMARK:
+                    self._buffer_cond.wait()
+                self._paused_time += time.time() - paused_since
+
+            if self._empty_since is not None:
+                self._empty_time += time.time() - self._empty_since
+                self._empty_since = None
+
+            self._buffer.append(item)
+
+    def _drain(self):
+        """Return up to ``BATCH_SIZE`` items from the buffer."""
+        with self._buffer_cond:
+            size = len(self._buffer)
+            self._occupancy_sum += size
+            self._occupancy_samples += 1
+
+            items = [self._buffer.popleft()
+                     for _ in range(min(size, self.BATCH_SIZE))]
+
+            if size - len(items) <= self.LOW_WATERMARK:
+                self._buffer_cond.notify()
+            if not self._buffer and self._empty_since is None:
+                self._empty_since = time.time()
+
+        return items
+
+    def next_tuple(self):
+        """Emit the buffered tuples, up to ``BATCH_SIZE`` of them, without
+        waiting for more.
+        """
+        if self._generate_error is not None:
+            raise self._generate_error
+
+        items = self._drain()
+        if items:
+            values_list, tup_ids = zip(*items)
+            self.emit_many(
+                values_list, tup_ids=tup_ids, need_task_ids=False)
+
+
+class BatchSpout(BufferedSpout):
+    """A BufferedSpout emitting up to ``BATCH_SIZE`` tuples at once, and
+    handling acks and fails in bulk.
+
+    Acks and fails are collected and handed over together to
+    :meth:`~.ack_many` and :meth:`~.fail_many` on the next batch, or once
+    ``BATCH_SIZE`` of them are collected.
+    """
+
+    BATCH_SIZE = 100
 
-        self.send_command('emit', command_dict)
+    def __init__(self, *args, **kwargs):
+        super(BatchSpout, self).__init__(*args, **kwargs)
 
-        if need_task_ids:
-            return self.read_taskid()
+        self._acked = []
+        self._failed = []
+
+    def ack_many(self, tup_ids):
+        """Ack several tuples to the source. Call :meth:`~.Spout.ack` for each
+        of them by default.
+
+        :param tup_ids: tuple identifiers
+        :type tup_ids: ``list``
+        """
+        for tup_id in tup_ids:
+            self.ack(tup_id)
+
+    def fail_many(self, tup_ids):
+        """Fail several tuples to the source. Call :meth:`~.Spout.fail` for
+        each of them by default.
+
+        :param tup_ids: tuple identifiers
+        :type tup_ids: ``list``
+        """
+        for tup_id in tup_ids:
+            self.fail(tup_id)
+
+    def _handle_command(self, msg):
+        """Collect acks and fails, emit a batch on next."""
+        command = msg['command']
+
+        if command == 'next':
+            self.next_tuple()
+        elif command == 'ack':
+            self._acked.append(msg['id'])
+            if len(self._acked) >= self.BATCH_SIZE:
+                self._flush_acks()
+        elif command == 'fail':
+            self._failed.append(msg['id'])
+            if len(self._failed) >= self.BATCH_SIZE:
+                self._flush_acks()
+
+    def _flush_acks(self):
+        if self._acked:
+            acked, self._acked = self._acked, []
+            self.ack_many(acked)
+        if self._failed:
+            failed, self._failed = self._failed, []
+            self.fail_many(failed)
+
+    def next_tuple(self):
+        """Hand the collected acks and fails over, then emit the buffered
+        tuples.
+        """
+        self._flush_acks()
+        super(BatchSpout, self).next_tuple()
+
+
+class _PendingTuple(object):
+    """Values of a tuple emitted by a ReliableSpout and not acked yet."""
+
+    __slots__ = ("packed_values", "retries")
+
+    def __init__(self, packed_values):
+        # Packed with msgpack, much smaller than Python objects
+        self.packed_values = packed_values
+        self.retries = 0
+
+
+# Same options as MsgpackSerializer, so that values are replayed as they
+# were first emitted
+def _pack_values(values):
+    return msgpack.packb(values, use_bin_type=True, encoding="latin1")
+
+
+def _unpack_values(packed_values):
+    return msgpack.unpackb(packed_values, encoding="latin1")
+
+
+class ReliableSpout(Spout):
+    """A Spout keeping track of the tuples it emits until they are acked,
+    and replaying the failed ones.
+
+    Implement next_values() in a subclass, returning the values of the next
+    tuple to emit. ReliableSpout generates the tuple ids, and keeps the values
+    of up to ``MAX_PENDING`` tuples: no new tuple is emitted while that many
+    are pending.
+
+    Failed tuples are replayed after ``RETRY_DELAY`` seconds, doubling
+    each time up to ``MAX_RETRY_DELAY``. Tuples failed more than
+    ``MAX_RETRIES`` times are given up on and handed to on_give_up().
+    """
+
+    #: ``int`` maximum number of tuples emitted and not acked yet.
+    MAX_PENDING = 1000
+
+    #: ``int`` maximum number of replays of a tuple, ``None`` for no limit.
+    MAX_RETRIES = 3
+
+    #: ``float`` seconds before the first replay of a failed tuple.
+    RETRY_DELAY = 1.0
+
+    #: ``float`` maximum number of seconds before replaying a failed tuple.
+    MAX_RETRY_DELAY = 60.0
+
+    def __init__(self, *args, **kwargs):
+        super(ReliableSpout, self).__init__(*args, **kwargs)
+
+        self._pending = {}
+        self._tup_ids = itertools.count()
+        # Heap of (replay time, tuple id) of failed tuples
+        self._replays = []
+
+    def next_values(self):
+        """Return the values of the next tuple to emit.
+
+        :return: tuple values, or ``None`` if there is nothing to emit
+        :rtype: ``tuple``, ``list`` or ``None``
+
+        .. note:: Implement in subclass.
+        """
+        raise NotImplementedError()
+
+    def on_ack(self, values):
+        """Called when a tuple has been fully processed.
+
+        :param values: values of the tuple
+        :type values: ``list``
+
+        .. note:: Implement in subclass. Default behaviour is ``pass``.
+        """
+        pass
+
+    def on_give_up(self, values):
+        """Called when a tuple failed more than ``MAX_RETRIES`` times.
+
+        :param values: values of the tuple
+        :type values: ``list``
+
+        .. note:: Implement in subclass. Default behaviour is to log it.
+        """
+        log.warning("Giving up on tuple {0!r}".format(values))
+
+    @property
+    def pending_count(self):
+        """Number of tuples emitted and not acked yet, including the ones
+        waiting to be replayed.
+        """
+        return len(self._pending)
+
+    def _add_builtin_metrics(self, instrumentation):
+        """Also send the number of pending tuples along with the built-in
+        metrics.
+        """
+        super(ReliableSpout, self)._add_builtin_metrics(instrumentation)
+        self.metrics.gauge(
+            BUILTIN_PREFIX + "pending", lambda: self.pending_count)
+
+    def next_tuple(self):
+        """Replay the failed tuples which are due, or emit the next tuple."""
+        now = time.time()
+        if self._replays and self._replays[0][0] <= now:
+            tup_ids = []
+            while self._replays and self._replays[0][0] <= now:
+                tup_ids.append(heapq.heappop(self._replays)[1])
+            self.emit_many(
+                [_unpack_values(self._pending[tup_id].packed_values)
+                 for tup_id in tup_ids],
+                tup_ids=tup_ids, need_task_ids=False)
+            return
+
+        if len(self._pending) >= self.MAX_PENDING:
+            return
+
+        values = self.next_values()
+        if values is None:
+            return
+
+        tup_id = next(self._tup_ids)
+        self._pending[tup_id] = _PendingTuple(_pack_values(values))
+        self.emit(values, tup_id=tup_id, need_task_ids=False)
+
+    def ack(self, tup_id):
+        """Forget about a fully processed tuple."""
+        pending = self._pending.pop(tup_id, None)
+        if pending is not None:
+            self.on_ack(_unpack_values(pending.packed_values))
+
+    def fail(self, tup_id):
+        """Schedule the replay of a failed tuple, or give up on it."""
+        pending = self._pending.get(tup_id)
+        if pending is None:
+            return
+
+        if self.MAX_RETRIES is not None and pending.retries >= self.MAX_RETRIES:
+            del self._pending[tup_id]
+            self.on_give_up(_unpack_values(pending.packed_values))
+            return
+
+        delay = min(self.RETRY_DELAY * 2 ** pending.retries,
+                    self.MAX_RETRY_DELAY)
+        pending.retries += 1
+        heapq.heappush(self._replays, (time.time() + delay, tup_id))
@@ -0,0 +1,112 @@
+"""NumPy-vectorized Bolt component.
+
+It requires `NumPy`_, which is not a dependency of pyleus: add it to the
+requirements of your topology.
+
+.. _NumPy: https://pypi.python.org/pypi/numpy
+"""
+from __future__ import absolute_import
+
+import logging
+
+import numpy
+
+from .storm import BatchingBolt
+from .storm import DEFAULT_STREAM
+from .storm.component import _serialize
+
+log = logging.getLogger(__name__)
+
+
+class VectorBolt(BatchingBolt):
+    """BatchingBolt presenting each batch of tuples as columnar NumPy arrays,
+    so that numeric computations run on the whole batch at once instead of
+    tuple by tuple.
+    """
+
+    #: ``list`` of the names of the fields of the input tuples, used as keys
+    #: of the columns passed to :meth:`~.process_columns`. If ``None``,
+    #: columns are passed as a ``list`` in the order of the tuple values.
+    INPUT_FIELDS = None
+
+    def process_columns(self, columns):
+        """Process a batch of tuples as columns.
+
+        :param columns:
+         one array per field of the input tuples, with one item per tuple, by
+         field name if ``INPUT_FIELDS`` is set
+        :type columns: ``dict`` or ``list`` of ``numpy.ndarray``
+
+        :return:
+         columns to emit on the default stream as per
+         :meth:`~.emit_columns`, or ``None`` to emit nothing.
+        :rtype: ``dict``, ``list`` or ``None``
+
+        .. note:: Implement in subclass.
+        """
+        raise NotImplementedError()
+
+    def process_batch(self, tups):
+        """Turn the batch into columns, pass them to :meth:`~.process_columns`
+        and emit the resulting columns, if any.
+
+        .. note:: All the input tuples must have the same number of values,
+           otherwise ``ValueError`` is raised.
+        """
+        columns = self._to_columns(tups)
+
+        result = self.process_columns(columns)
+        if result is not None:
+            self.emit_columns(result, need_task_ids=False)
+
+    def _to_columns(self, tups):
+        rows = [tup.values for tup in tups]
+        # zip() would silently truncate the longer rows
+        if rows and len(set(len(row) for row in rows)) > 1:
+            raise ValueError("Got tuples with different numbers of values")
+
+        # zip() transposes the batch without a Python level loop over values
+        columns = [numpy.asarray(column) for column in zip(*rows)]
+
+        if self.INPUT_FIELDS is None:
+            return columns
+
+        if len(columns) != len(self.INPUT_FIELDS):
+            raise ValueError(
+                "Got tuples with {0} values, expected fields {1}".format(
+                    len(columns), self.INPUT_FIELDS))
+        return dict(zip(self.INPUT_FIELDS, columns))
+
+    def _output_fields(self, stream):
+        if isinstance(self.OUTPUT_FIELDS, dict):
+            return _serialize(self.OUTPUT_FIELDS[stream])
+        return _serialize(self.OUTPUT_FIELDS)
+
+    def emit_columns(self, columns, stream=None, **kwargs):
+        """Emit one tuple per row of the given columns with
+        :meth:`~pyleus.storm.bolt.Bolt.emit_many`.
+
+        :param columns:
+         one array per output field, either by field name or in the order of
+         the output fields of the stream
+        :type columns: ``dict`` or ``list`` of ``numpy.ndarray`` or ``list``
+        :param stream:
+         output stream the tuples are going to belong to, default ``DEFAULT``
+        :type stream: ``str``
+
+        The other arguments are passed on to
+        :meth:`~pyleus.storm.bolt.Bolt.emit_many`.
+        """
+        if isinstance(columns, dict):
+            fields = self._output_fields(
+                DEFAULT_STREAM if stream is None else stream)
+            columns = [columns[field] for field in fields]
+
+        # tolist() converts NumPy scalars to Python objects the serializers
+        # can handle
+        columns = [numpy.asarray(column).tolist() for column in columns]
+        if len(set(len(column) for column in columns)) > 1:
+            raise ValueError("Columns to emit have different lengths")
+
+        return self.emit_many(
+            list(zip(*columns)), stream=stream, **kwargs)
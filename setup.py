@@ -176,7 +176,7 @@ setup(
     },
     install_requires=[
         "PyYAML",
-        "msgpack-python",
+        "msgpack-python>=0.5.6",
         "virtualenv",
         "six",
     ] + extra_install_requires,
@@ -16,3 +16,20 @@ class SerializerTestCase(object):
             input_stream=self.mock_input_stream,
             output_stream=self.mock_output_stream,
         )
+
+
+class CustomSerializer(Serializer):
+
+    PROTOCOL = "json"
+
+    def read_msg(self):
+        pass
+
+    def send_msg(self, msg_dict):
+        pass
+
+
+class IncompleteSerializer(Serializer):
+
+    def read_msg(self):
+        pass
@@ -0,0 +1,233 @@
+import asyncio
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import pytest
+
+from pyleus.async_components import AsyncBolt, AsyncSpout
+from pyleus.storm import StormWentAwayError
+from pyleus.storm.serializers.serializer import Serializer
+from pyleus.testing import ComponentTestCase, mock
+
+
+def _tuple_msg(tup_id, comp=None, stream="default", task=1, values=()):
+    return {
+        'id': tup_id, 'comp': comp, 'stream': stream, 'task': task,
+        'tuple': values,
+    }
+
+TICK = _tuple_msg(None, comp='__system', stream='__tick')
+HEARTBEAT = _tuple_msg(None, stream='__heartbeat', task=-1)
+
+# Put in the input queue to make Storm go away
+EOF = object()
+
+
+class AsyncComponentTestCase(ComponentTestCase):
+
+    @pytest.fixture(autouse=True)
+    def setup_serializer(self, request):
+        """Feed the component with the messages put in self.input_queue and
+        record the messages it sends.
+        """
+        self.input_queue = queue.Queue()
+        self.sent = []
+        # Storm goes away once this returns True
+        self.stop_when = lambda: False
+
+        def send_msgs(msgs):
+            self.sent.extend(msgs)
+            if self.stop_when():
+                self.input_queue.put(EOF)
+
+        def read_msg():
+            msg = self.input_queue.get(timeout=5)
+            if msg is EOF:
+                raise StormWentAwayError()
+            return msg
+
+        patch = mock.patch.object(
+            self.instance, '_serializer', autospec=Serializer)
+        serializer = patch.start()
+        request.addfinalizer(patch.stop)
+        serializer.read_msg.side_effect = read_msg
+        serializer.send_msg.side_effect = lambda msg: send_msgs([msg])
+        serializer.send_msgs.side_effect = send_msgs
+
+    def commands(self, command):
+        return [msg for msg in self.sent if msg['command'] == command]
+
+
+class TestAsyncBolt(AsyncComponentTestCase):
+
+    class EchoBolt(AsyncBolt):
+        MAX_IN_FLIGHT = 2
+
+        async def process_tuple(self, tup):
+            if tup.values == ("boom",):
+                raise ValueError()
+            self.task_ids = await self.emit(tup.values, anchors=[tup])
+
+        async def process_tick(self):
+            pass
+
+    INSTANCE_CLS = EchoBolt
+
+    def test_run_component(self):
+        def stop_when():
+            if self.sent[-1]['command'] == 'emit':
+                self.input_queue.put([42])
+            return len(self.commands('ack')) == 2
+
+        self.stop_when = stop_when
+        for msg in (HEARTBEAT, TICK, _tuple_msg(1, values=("foo",))):
+            self.input_queue.put(msg)
+
+        self.instance.run_component()
+
+        assert self.commands('sync') == [{'command': "sync"}]
+        assert self.commands('emit') == [
+            {'command': "emit", 'anchors': [1], 'tuple': ("foo",)}]
+        assert self.instance.task_ids == [42]
+        assert [msg['id'] for msg in self.commands('ack')] == [None, 1]
+
+    def test_fail(self):
+        self.stop_when = lambda: self.sent[-1]['command'] == 'fail'
+        self.input_queue.put(_tuple_msg(1, values=("boom",)))
+
+        self.instance.run_component()
+
+        assert [msg['id'] for msg in self.commands('fail')] == [1]
+
+    def test_max_in_flight(self):
+        in_flight = []
+        release = []
+
+        async def process_tuple(tup):
+            in_flight.append(tup.id)
+            if tup.id == 3:
+                return
+            event = asyncio.Event()
+            release.append(event)
+            if len(in_flight) == 2:
+                # Both slots are busy, the third tuple has to wait
+                await asyncio.sleep(0.05)
+                assert in_flight == [1, 2]
+                for event in release:
+                    event.set()
+            await event.wait()
+
+        self.instance.process_tuple = process_tuple
+        self.stop_when = lambda: len(self.commands('ack')) == 3
+        for tup_id in (1, 2, 3):
+            self.input_queue.put(_tuple_msg(tup_id))
+
+        self.instance.run_component()
+
+        assert in_flight == [1, 2, 3]
+
+    def test_heartbeat_while_all_slots_busy(self):
+        synced = []
+
+        async def process_tuple(tup):
+            if tup.id == 2:
+                # Both slots are busy and the other tuples are queued: the
+                # heartbeat comes after one more tuple
+                self.input_queue.put(_tuple_msg(6))
+                self.input_queue.put(HEARTBEAT)
+            if tup.id in (1, 2):
+                # Hold both slots until the heartbeat is answered
+                for _ in range(200):
+                    if self.commands('sync'):
+                        break
+                    await asyncio.sleep(0.01)
+                synced.append(bool(self.commands('sync')))
+
+        self.instance.process_tuple = process_tuple
+        self.stop_when = lambda: len(self.commands('ack')) == 6
+        for tup_id in (1, 2, 3, 4, 5):
+            self.input_queue.put(_tuple_msg(tup_id))
+
+        self.instance.run_component()
+
+        assert synced == [True, True]
+
+    def test_instrumentation(self):
+        async def process_tuple(tup):
+            await asyncio.sleep(0.05)
+
+        self.instance.process_tuple = process_tuple
+        instrumentation = self.instance.enable_instrumentation()
+        self.stop_when = lambda: len(self.commands('ack')) == 2
+        for msg in (_tuple_msg(1), HEARTBEAT, _tuple_msg(2)):
+            self.input_queue.put(msg)
+
+        self.instance.run_component()
+
+        assert instrumentation.counters['tuples'] == 2
+        assert instrumentation.counters['acks'] == 2
+        histogram = instrumentation.histograms['process']
+        assert histogram.count == 2
+        assert histogram.min >= 0.05
+
+    def test_buffered_serializer(self):
+        pyleus_config = {'serializer_options': {'buffered': True}}
+        with mock.patch.object(self.instance, 'pyleus_config', pyleus_config):
+            with pytest.raises(ValueError):
+                self.instance.initialize_serializer()
+
+
+class TestAsyncSpout(AsyncComponentTestCase):
+
+    INSTANCE_CLS = AsyncSpout
+
+    def test_run_component(self):
+        calls = []
+
+        async def next_tuple():
+            calls.append('next')
+            self.instance.emit((1,), tup_id=7, need_task_ids=False)
+
+        async def ack(tup_id):
+            calls.append(('ack', tup_id))
+
+        async def fail(tup_id):
+            calls.append(('fail', tup_id))
+
+        self.instance.next_tuple = next_tuple
+        self.instance.ack = ack
+        self.instance.fail = fail
+        self.stop_when = lambda: len(self.commands('sync')) == 3
+        for msg in ({'command': "next"}, {'command': "ack", 'id': 7},
+                    {'command': "fail", 'id': 8}):
+            self.input_queue.put(msg)
+
+        self.instance.run_component()
+
+        assert calls == ['next', ('ack', 7), ('fail', 8)]
+        assert len(self.commands('sync')) == 3
+        assert self.commands('emit') == [
+            {'command': "emit", 'tuple': (1,), 'id': 7,
+             'need_task_ids': False}]
+
+    def test_instrumentation(self):
+        async def ack(tup_id):
+            await asyncio.sleep(0.05)
+            self.input_queue.put(EOF)
+
+        self.instance.ack = ack
+        instrumentation = self.instance.enable_instrumentation()
+        for msg in ({'command': "next"}, {'command': "ack", 'id': 7},
+                    {'command': "fail", 'id': 8}):
+            self.input_queue.put(msg)
+
+        self.instance.run_component()
+
+        assert instrumentation.counters['acks'] == 1
+        assert instrumentation.counters['fails'] == 1
+        histogram = instrumentation.histograms['process']
+        assert histogram.count == 3
+        assert histogram.max >= 0.05
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+from pyleus.cli import build_cache
+from pyleus.cli.build_cache import VirtualenvCache
+from pyleus.cli.build_cache import venv_cache_key
+from pyleus.testing import mock
+
+
+def _make_venv(path, size=10):
+    os.makedirs(os.path.join(path, "bin"))
+    with open(os.path.join(path, "bin", "python"), "w") as f:
+        f.write("x" * size)
+    os.symlink("bin", os.path.join(path, "local"))
+
+
+class TestVenvCacheKey(object):
+
+    @pytest.fixture
+    def req(self, tmpdir):
+        tmpdir.join("constraints.txt").write("bar==1.0\n")
+        req = tmpdir.join("requirements.txt")
+        req.write("foo\n-c constraints.txt\n")
+        return str(req)
+
+    def _key(self, req, **kwargs):
+        options = dict(
+            include_packages=["fruit"],
+            system_site_packages=False,
+            pypi_index_url=None,
+            python_interpreter=None,
+        )
+        options.update(kwargs)
+        return venv_cache_key(req, **options)
+
+    def test_stable(self, req):
+        assert self._key(req) == self._key(req)
+
+    def test_options(self, req):
+        key = self._key(req)
+        assert self._key(req, include_packages=["ninja"]) != key
+        assert self._key(req, system_site_packages=True) != key
+        assert self._key(req, pypi_index_url="http://pypi") != key
+        assert self._key(None) != key
+
+    def test_pyleus_version(self, req):
+        key = self._key(req)
+        with mock.patch.object(build_cache, '__version__', "0.0.0"):
+            assert self._key(req) != key
+
+    def test_requirements_contents(self, req, tmpdir):
+        key = self._key(req)
+        tmpdir.join("constraints.txt").write("bar==2.0\n")
+        assert self._key(req) != key
+
+    def test_wheelhouse_contents(self, req, tmpdir):
+        wheelhouse = tmpdir.join("wheels")
+        wheelhouse.ensure("foo-1.0-py2.py3-none-any.whl")
+        key = self._key(req, wheelhouse=str(wheelhouse))
+        assert self._key(req) != key
+
+        wheelhouse.ensure("foo-2.0-py2.py3-none-any.whl")
+        assert self._key(req, wheelhouse=str(wheelhouse)) != key
+
+
+class TestVirtualenvCache(object):
+
+    @pytest.fixture
+    def cache(self, tmpdir):
+        return VirtualenvCache(str(tmpdir.join("cache")), max_size=25)
+
+    def test_get_missing(self, cache, tmpdir):
+        assert not cache.get("key", str(tmpdir.join("dst")))
+        assert not tmpdir.join("dst").check()
+
+    def test_put_get(self, cache, tmpdir):
+        src = str(tmpdir.join("src"))
+        _make_venv(src)
+        cache.put("key", src)
+
+        dst = str(tmpdir.join("dst"))
+        assert cache.get("key", dst)
+        with open(os.path.join(dst, "bin", "python")) as f:
+            assert f.read() == "x" * 10
+        assert os.readlink(os.path.join(dst, "local")) == "bin"
+
+    def test_put_existing(self, cache, tmpdir):
+        src = str(tmpdir.join("src"))
+        _make_venv(src)
+        cache.put("key", src)
+        cache.put("key", src)
+
+        assert os.listdir(cache.cache_dir) == ["key"]
+
+    def test_evict_least_recently_used(self, cache, tmpdir):
+        for i, key in enumerate(["a", "b"]):
+            src = str(tmpdir.join(key))
+            _make_venv(src)
+            cache.put(key, src)
+            os.utime(os.path.join(cache.cache_dir, key), (i, i))
+
+        # Using a makes b the least recently used
+        cache.get("a", str(tmpdir.join("dst")))
+        src = str(tmpdir.join("c"))
+        _make_venv(src)
+        cache.put("c", src)
+
+        assert sorted(os.listdir(cache.cache_dir)) == ["a", "c"]
+
+    def test_evict_abandoned_tmp(self, cache):
+        os.makedirs(os.path.join(cache.cache_dir, ".tmp-old"))
+        os.utime(os.path.join(cache.cache_dir, ".tmp-old"), (0, 0))
+        os.makedirs(os.path.join(cache.cache_dir, ".tmp-new"))
+
+        cache.evict()
+
+        assert os.listdir(cache.cache_dir) == [".tmp-new"]
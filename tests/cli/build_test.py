@@ -31,26 +31,80 @@ class TestBuild(object):
 
     @mock.patch.object(os, 'walk', autospec=True)
     def test__zip_dir(self, mock_walk):
-        mock_arc = mock.Mock(autospec=True)
+        mock_writer = mock.Mock(autospec=True)
         mock_walk.return_value = [
             ("foo", ["bar"], ["baz"]),
             (os.path.join("foo", "bar"), [], ["qux"])
         ]
-        build._zip_dir("foo", mock_arc)
+        build._zip_dir("foo", mock_writer)
         mock_walk.assert_any_call("foo")
         expected = [
-            mock.call(os.path.join("foo", "baz"), "baz", zipfile.ZIP_DEFLATED),
+            mock.call(os.path.join("foo", "baz"), "baz"),
             mock.call(os.path.join("foo", "bar", "qux"),
-                      os.path.join("bar", "qux"), zipfile.ZIP_DEFLATED),
+                      os.path.join("bar", "qux")),
         ]
-        mock_arc.write.assert_has_calls(expected)
+        mock_writer.add_file.assert_has_calls(expected)
 
+    @mock.patch.object(build, 'JarWriter', autospec=True)
     @mock.patch.object(zipfile, 'ZipFile', autospec=True)
     @mock.patch.object(build, '_zip_dir', autospec=True)
-    def test__pack_jar(self, mock_zip_dir, mock_zipfile):
-        build._pack_jar("foo", "bar")
+    def test__pack_jar(self, mock_zip_dir, mock_zipfile, mock_writer):
+        build._pack_jar("foo", "bar", compress_level=1, compress_workers=4)
         mock_zipfile.assert_called_once_with("bar", "w")
-        mock_zip_dir.assert_called_once_with("foo", mock_zipfile.return_value)
+        mock_writer.assert_called_once_with(
+            mock_zipfile.return_value, level=1, workers=4)
+        mock_zip_dir.assert_called_once_with(
+            "foo", mock_writer.return_value, None)
+        mock_writer.return_value.close.assert_called_once_with()
+        mock_zipfile.return_value.close.assert_called_once_with()
+
+    def test__pack_jar_base_jar(self, tmpdir):
+        base_jar = str(tmpdir.join("base.jar"))
+        zf = zipfile.ZipFile(base_jar, "w")
+        zf.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\n")
+        zf.writestr("org/Foo.class", b"\xca\xfe" * 100, zipfile.ZIP_DEFLATED)
+        zf.close()
+        tmp_dir = tmpdir.join("tmp")
+        tmp_dir.join("resources", "foo.py").write("foo", ensure=True)
+        output_jar = str(tmpdir.join("out.jar"))
+
+        base_zf = zipfile.ZipFile(base_jar)
+        with mock.patch.object(
+                build.JarWriter, 'add_file', autospec=True,
+                side_effect=build.JarWriter.add_file) as mock_add_file:
+            build._pack_jar(str(tmp_dir), output_jar, base_jar=base_zf)
+
+        mock_add_file.assert_called_once_with(
+            mock.ANY, str(tmp_dir.join("resources", "foo.py")),
+            os.path.join("resources", "foo.py"))
+        zf = zipfile.ZipFile(output_jar)
+        assert zf.namelist() == [
+            "META-INF/MANIFEST.MF", "org/Foo.class", "resources/foo.py"]
+        assert zf.read("org/Foo.class") == b"\xca\xfe" * 100
+        assert zf.getinfo("org/Foo.class").compress_type == (
+            zipfile.ZIP_DEFLATED)
+
+    def test__pack_jar_incremental(self, tmpdir):
+        tmp_dir = tmpdir.join("tmp")
+        tmp_dir.join("foo.py").write("foo", ensure=True)
+        tmp_dir.join("bar", "bar.py").write("bar", ensure=True)
+        output_jar = str(tmpdir.join("out.jar"))
+        build._pack_jar(str(tmp_dir), output_jar, incremental=True)
+
+        tmp_dir.join("foo.py").write("new foo")
+        tmp_dir.join("baz.py").write("baz")
+        with mock.patch.object(
+                build.JarWriter, 'add_raw', autospec=True,
+                side_effect=build.JarWriter.add_raw) as mock_add_raw:
+            build._pack_jar(str(tmp_dir), output_jar, incremental=True)
+
+        ((_, copied, _), _), = mock_add_raw.call_args_list
+        assert copied.filename == "bar/bar.py"
+        zf = zipfile.ZipFile(output_jar)
+        assert sorted(zf.namelist()) == ["bar/bar.py", "baz.py", "foo.py"]
+        assert zf.read("foo.py") == b"new foo"
+        assert zf.read("bar/bar.py") == b"bar"
+        assert not tmpdir.join("out.jar.tmp").check()
 
     @mock.patch.object(os.path, 'exists', autospec=True)
     def test__validate_venv_dir_contains_venv(self, mock_exists):
@@ -105,6 +159,81 @@ class TestBuild(object):
         assert venv.install_from_requirements.call_count == 0
         mock_remove_base_jar.assert_called_once_with(venv)
 
+    @mock.patch.object(build, '_remove_pyleus_base_jar', autospec=True)
+    @mock.patch.object(build, 'VirtualenvProxy', autospec=True)
+    def test__set_up_virtualenv_wheelhouse(self, mock_venv,
+                                           mock_remove_base_jar):
+        venv = mock_venv.return_value
+        build._set_up_virtualenv(
+            venv_name="foo",
+            tmp_dir="bar",
+            req="baz.txt",
+            include_packages=["fruit"],
+            system_site_packages=True,
+            pypi_index_url=None,
+            python_interpreter="python2.7",
+            verbose=False,
+            wheelhouse="wheels",
+            update_wheelhouse=True)
+        packages = ["pyleus=={0}".format(__version__), "fruit"]
+        venv.download_wheels.assert_called_once_with(
+            packages, "baz.txt", "wheels")
+        venv.install_from_wheelhouse.assert_called_once_with(
+            packages, "baz.txt", "wheels")
+        assert not venv.install_package.called
+        assert not venv.install_from_requirements.called
+        mock_remove_base_jar.assert_called_once_with(venv)
+
+    @mock.patch.object(build, 'venv_cache_key', autospec=True)
+    @mock.patch.object(build, '_remove_pyleus_base_jar', autospec=True)
+    @mock.patch.object(build, 'VirtualenvProxy', autospec=True)
+    def test__set_up_virtualenv_cache_hit(self, mock_venv,
+                                          mock_remove_base_jar, mock_key):
+        cache = mock.Mock()
+        cache.get.return_value = True
+        build._set_up_virtualenv(
+            venv_name="foo",
+            tmp_dir="bar",
+            req="baz.txt",
+            include_packages=["fruit"],
+            system_site_packages=True,
+            pypi_index_url=None,
+            python_interpreter="python2.7",
+            verbose=False,
+            cache=cache)
+        cache.get.assert_called_once_with(
+            mock_key.return_value, os.path.join("bar", "foo"))
+        mock_venv.assert_called_once_with(
+            os.path.join("bar", "foo"), create=False,
+            system_site_packages=True, pypi_index_url=None,
+            python_interpreter="python2.7", verbose=False)
+        assert not mock_venv.return_value.install_package.called
+        assert not mock_remove_base_jar.called
+        assert not cache.put.called
+
+    @mock.patch.object(build, 'venv_cache_key', autospec=True)
+    @mock.patch.object(build, '_remove_pyleus_base_jar', autospec=True)
+    @mock.patch.object(build, 'VirtualenvProxy', autospec=True)
+    def test__set_up_virtualenv_cache_miss(self, mock_venv,
+                                           mock_remove_base_jar, mock_key):
+        venv = mock_venv.return_value
+        cache = mock.Mock()
+        cache.get.return_value = False
+        build._set_up_virtualenv(
+            venv_name="foo",
+            tmp_dir="bar",
+            req="baz.txt",
+            include_packages=["fruit"],
+            system_site_packages=True,
+            pypi_index_url=None,
+            python_interpreter="python2.7",
+            verbose=False,
+            cache=cache)
+        venv.install_from_requirements.assert_called_once_with("baz.txt")
+        mock_remove_base_jar.assert_called_once_with(venv)
+        cache.put.assert_called_once_with(
+            mock_key.return_value, os.path.join("bar", "foo"))
+
     @mock.patch.object(glob, 'glob', autospec=True)
     def test__content_to_copy(self, mock_glob):
         mock_glob.return_value = [os.path.join("foo", "good1.mkv"),
@@ -185,3 +314,42 @@ class TestBuild(object):
             build._remove_pyleus_base_jar(mock_venv)
 
         assert not mock_remove.called
+
+    def test__resolve_serializer_protocol_builtin(self):
+        spec = mock.Mock(serializer="msgpack", spec=["serializer"])
+        mock_venv = mock.Mock()
+
+        build._resolve_serializer_protocol(spec, mock_venv, "resources")
+
+        assert not mock_venv.execute_module.called
+        assert not hasattr(spec, "serializer_protocol")
+
+    def test__resolve_serializer_protocol_builtin_alias(self):
+        spec = mock.Mock(serializer="fast_json")
+        mock_venv = mock.Mock()
+
+        build._resolve_serializer_protocol(spec, mock_venv, "resources")
+
+        assert not mock_venv.execute_module.called
+        assert spec.serializer_protocol == "json"
+
+    def test__resolve_serializer_protocol_plugin(self):
+        spec = mock.Mock(serializer="my_package.MySerializer")
+        mock_venv = mock.Mock()
+        mock_venv.execute_module.return_value = "json\n"
+
+        build._resolve_serializer_protocol(spec, mock_venv, "resources")
+
+        mock_venv.execute_module.assert_called_once_with(
+            module="pyleus._serializer_protocol",
+            args=["my_package.MySerializer"],
+            cwd="resources")
+        assert spec.serializer_protocol == "json"
+
+    def test__resolve_serializer_protocol_unsupported(self):
+        spec = mock.Mock(serializer="my_package.MySerializer")
+        mock_venv = mock.Mock()
+        mock_venv.execute_module.return_value = "cbor\n"
+
+        with pytest.raises(exception.InvalidTopologyError):
+            build._resolve_serializer_protocol(spec, mock_venv, "resources")
@@ -0,0 +1,193 @@
+import os
+import zipfile
+import zlib
+
+import pytest
+
+from pyleus.cli import jar
+from pyleus.testing import mock
+
+
+def _write_jar(path, entries, compression=zipfile.ZIP_DEFLATED):
+    zf = zipfile.ZipFile(path, "w")
+    for name, data in entries:
+        zf.writestr(name, data, compression)
+    zf.close()
+
+
+class TestJar(object):
+
+    def test_file_crc32(self, tmpdir):
+        path = tmpdir.join("foo")
+        path.write_binary(b"foo" * 1000)
+        assert jar.file_crc32(str(path)) == (
+            zlib.crc32(b"foo" * 1000) & 0xffffffff)
+
+    @pytest.mark.parametrize("internals", [True, False])
+    @pytest.mark.parametrize("compression", [
+        zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+    def test_copy_raw_entries(self, tmpdir, compression, internals):
+        src = str(tmpdir.join("src.jar"))
+        dst = str(tmpdir.join("dst.jar"))
+        entries = [("a/b.py", b"b" * 100), ("c.txt", b"c")]
+        _write_jar(src, entries, compression)
+
+        src_zip = zipfile.ZipFile(src)
+        dst_zip = zipfile.ZipFile(dst, "w")
+        dst_zip.writestr("before", b"before")
+        with mock.patch.object(
+                jar, '_has_zipfile_internals', return_value=internals):
+            with open(src, "rb") as fp:
+                for info in src_zip.infolist():
+                    jar.write_raw_entry(
+                        dst_zip, info, jar.read_raw_entry(fp, info))
+        dst_zip.writestr("after", b"after")
+        dst_zip.close()
+
+        dst_zip = zipfile.ZipFile(dst)
+        assert dst_zip.testzip() is None
+        assert dst_zip.namelist() == ["before", "a/b.py", "c.txt", "after"]
+        for name, data in entries:
+            assert dst_zip.read(name) == data
+            assert dst_zip.getinfo(name).compress_type == compression
+
+    @pytest.mark.parametrize("internals", [True, False])
+    def test_write_raw_entry_changed(self, tmpdir, internals):
+        info = zipfile.ZipInfo("foo")
+        info.CRC = zlib.crc32(b"foo") & 0xffffffff
+        info.file_size = info.compress_size = 3
+        zf = zipfile.ZipFile(str(tmpdir.join("dst.jar")), "w")
+
+        with mock.patch.object(
+                jar, '_has_zipfile_internals', return_value=internals):
+            with pytest.raises(ValueError):
+                jar.write_raw_entry(zf, info, [b"foo", b"bar"])
+
+    def test_has_zipfile_internals(self, tmpdir):
+        zf = zipfile.ZipFile(str(tmpdir.join("foo.jar")), "w")
+        assert jar._has_zipfile_internals(zf)
+
+        with mock.patch.object(
+                jar, '_ZIPFILE_INTERNALS', ("_not_an_attribute",)):
+            assert not jar._has_zipfile_internals(zf)
+        zf.close()
+
+    def test_compress_file_in_chunks(self, tmpdir):
+        text = tmpdir.join("text.py")
+        text.write_binary(b"text" * 10000)
+        package = tmpdir.join("package.whl")
+        package.write_binary(b"whl" * 10000)
+
+        with mock.patch.object(jar, '_CHUNK_SIZE', 1024):
+            info, raw = jar.compress_file(str(text), "text.py")
+            assert info.compress_type == zipfile.ZIP_DEFLATED
+            assert zlib.decompress(
+                b"".join(raw), -zlib.MAX_WBITS) == b"text" * 10000
+            assert info.file_size == 40000
+
+            info, raw = jar.compress_file(str(package), "package.whl")
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert not isinstance(raw, bytes)
+            chunks = list(raw)
+
+        assert max(len(chunk) for chunk in chunks) == 1024
+        assert b"".join(chunks) == b"whl" * 10000
+
+    def test_read_raw_entry_in_chunks(self, tmpdir):
+        src = str(tmpdir.join("src.jar"))
+        _write_jar(src, [("a", b"a" * 10), ("b", b"b" * 10)],
+                   zipfile.ZIP_STORED)
+
+        src_zip = zipfile.ZipFile(src)
+        with mock.patch.object(jar, '_CHUNK_SIZE', 4):
+            with open(src, "rb") as fp:
+                a = jar.read_raw_entry(fp, src_zip.getinfo("a"))
+                b = jar.read_raw_entry(fp, src_zip.getinfo("b"))
+                # Iterators sharing fp are read in turn
+                chunks = [(next(a), next(b)) for _ in range(3)]
+        assert chunks == [(b"aaaa", b"bbbb")] * 2 + [(b"aa", b"bb")]
+
+    def test_read_raw_entry_bad_header(self, tmpdir):
+        src = str(tmpdir.join("src.jar"))
+        _write_jar(src, [("foo", b"foo")])
+        info = zipfile.ZipFile(src).getinfo("foo")
+        info.header_offset += 1
+
+        with open(src, "rb") as fp:
+            with pytest.raises(ValueError):
+                jar.read_raw_entry(fp, info)
+
+
+class TestJarWriter(object):
+
+    @pytest.fixture
+    def files(self, tmpdir):
+        files = [
+            ("text.py", b"text" * 10000),
+            ("random.so", os.urandom(100 * 1024)),
+            ("package.whl", b"whl" * 10000),
+            ("empty.txt", b""),
+        ]
+        for name, data in files:
+            tmpdir.join(name).write_binary(data)
+        return files
+
+    def _pack(self, tmpdir, files, **kwargs):
+        output_jar = str(tmpdir.join("out.jar"))
+        zf = zipfile.ZipFile(output_jar, "w")
+        writer = jar.JarWriter(zf, **kwargs)
+        for name, _ in files:
+            writer.add_file(str(tmpdir.join(name)), os.path.join("a", name))
+        info = zipfile.ZipInfo("raw")
+        info.CRC = zlib.crc32(b"raw") & 0xffffffff
+        info.file_size = info.compress_size = 3
+        writer.add_raw(info, b"raw")
+        writer.close()
+        zf.close()
+        return zipfile.ZipFile(output_jar)
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    def test_order_and_content(self, tmpdir, files, workers):
+        zf = self._pack(tmpdir, files, workers=workers)
+
+        assert zf.testzip() is None
+        assert zf.namelist() == ["a/" + name for name, _ in files] + ["raw"]
+        for name, data in files:
+            assert zf.read("a/" + name) == data
+        assert zf.read("raw") == b"raw"
+
+    def test_without_thread_pool(self, tmpdir, files):
+        with mock.patch.object(jar, 'ThreadPoolExecutor', None):
+            zf = self._pack(tmpdir, files, workers=3)
+
+        assert zf.testzip() is None
+        assert zf.namelist() == ["a/" + name for name, _ in files] + ["raw"]
+
+    def test_without_zipfile_internals(self, tmpdir, files):
+        with mock.patch.object(
+                jar, '_has_zipfile_internals', return_value=False):
+            zf = self._pack(tmpdir, files)
+
+        assert zf.testzip() is None
+        assert zf.namelist() == ["a/" + name for name, _ in files] + ["raw"]
+        for name, data in files:
+            assert zf.read("a/" + name) == data
+        assert zf.getinfo("a/text.py").compress_type == zipfile.ZIP_DEFLATED
+
+    def test_compression(self, tmpdir, files):
+        zf = self._pack(tmpdir, files)
+
+        assert zf.getinfo("a/text.py").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.getinfo("a/random.so").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("a/package.whl").compress_type == zipfile.ZIP_STORED
+
+    def test_level(self, tmpdir, files):
+        fast = self._pack(tmpdir, files, level=1)
+        fast_size = fast.getinfo("a/text.py").compress_size
+        best = self._pack(tmpdir, files, level=9)
+        assert best.getinfo("a/text.py").compress_size <= fast_size
+
+        stored = self._pack(tmpdir, files, level=0)
+        for name, _ in files:
+            assert stored.getinfo("a/" + name).compress_type == (
+                zipfile.ZIP_STORED)
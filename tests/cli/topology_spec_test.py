@@ -0,0 +1,31 @@
+import pytest
+
+from pyleus.cli.topology_spec import TopologySpec
+from pyleus.exception import InvalidTopologyError
+
+
+def _specs(**kwargs):
+    specs = {
+        'name': "topology",
+        'topology': [{'spout': {'name': "spout", 'module': "spout"}}],
+    }
+    specs.update(kwargs)
+    return specs
+
+
+class TestTopologySpec(object):
+
+    def test_instrumentation(self):
+        spec = TopologySpec(_specs(instrumentation=True))
+
+        assert spec.instrumentation is True
+        assert spec.asdict()['instrumentation'] is True
+
+    def test_instrumentation_default(self):
+        spec = TopologySpec(_specs())
+
+        assert 'instrumentation' not in spec.asdict()
+
+    def test_instrumentation_not_boolean(self):
+        with pytest.raises(InvalidTopologyError):
+            TopologySpec(_specs(instrumentation="yes"))
@@ -101,3 +101,33 @@ class TestVirtualenvProxyMethods(object):
             stderr=self.venv._err_stream,
             err_msg=mock.ANY
         )
+
+    @mock.patch.object(venv_proxy, '_exec_shell_cmd', autospec=True)
+    def test_download_wheels(self, mock_cmd):
+        self.venv.download_wheels(["Ninja==7.7.7"], "foo.txt", "wheels")
+        mock_cmd.assert_called_once_with(
+            [
+                self.venv._get_path_to_bin("python"), "-m", "pip", "wheel", "-w", "wheels",
+                "Ninja==7.7.7",
+                "-r", "foo.txt",
+                "-i", PYPI_URL,
+            ],
+            stdout=self.venv._out_stream,
+            stderr=self.venv._err_stream,
+            err_msg=mock.ANY
+        )
+
+    @mock.patch.object(venv_proxy, '_exec_shell_cmd', autospec=True)
+    def test_install_from_wheelhouse(self, mock_cmd):
+        self.venv.install_from_wheelhouse(
+            ["Ninja==7.7.7", "fruit"], None, "wheels")
+        mock_cmd.assert_called_once_with(
+            [
+                self.venv._get_path_to_bin("python"), "-m", "pip",
+                "install", "--no-index", "--find-links", "wheels",
+                "Ninja==7.7.7", "fruit",
+            ],
+            stdout=self.venv._out_stream,
+            stderr=self.venv._err_stream,
+            err_msg=mock.ANY
+        )
@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+
+import pytest
+
+from pyleus.concurrent_bolt import ConcurrentBolt, ProcessPoolBolt
+from pyleus.storm import StormTuple
+from pyleus.testing import ComponentTestCase, mock
+
+
+class TestConcurrentBolt(ComponentTestCase):
+
+    INSTANCE_CLS = ConcurrentBolt
+
+    TICK = StormTuple(None, '__system', '__tick', None, None)
+    HEARTBEAT = StormTuple(None, None, '__heartbeat', -1, [])
+    TUPLE = StormTuple(1, None, None, None, None)
+
+    @pytest.fixture(autouse=True)
+    def setup_mocks(self, request):
+        patches = mock.patch.multiple(self.instance, process_tick=mock.DEFAULT,
+                                      process_tuple=mock.DEFAULT,
+                                      ack=mock.DEFAULT, fail=mock.DEFAULT,
+                                      sync=mock.DEFAULT)
+
+        request.addfinalizer(lambda: patches.__exit__(None, None, None))
+        values = patches.__enter__()
+        self.mock_process_tick = values['process_tick']
+        self.mock_process_tuple = values['process_tuple']
+        self.mock_ack = values['ack']
+        self.mock_fail = values['fail']
+        self.mock_sync = values['sync']
+
+    def _run(self, *tups):
+        with mock.patch.object(
+                self.instance, 'read_tuple', side_effect=list(tups) + [
+                    KeyboardInterrupt()]):
+            with pytest.raises(KeyboardInterrupt):
+                self.instance.run_component()
+        self.instance._executor.shutdown(wait=True)
+
+    def test_tuple(self):
+        self._run(self.TUPLE)
+
+        self.mock_process_tuple.assert_called_once_with(self.TUPLE)
+        self.mock_ack.assert_called_once_with(self.TUPLE)
+
+    def test_tick(self):
+        self._run(self.TICK)
+
+        self.mock_process_tick.assert_called_once_with()
+        assert not self.mock_process_tuple.called
+        self.mock_ack.assert_called_once_with(self.TICK)
+
+    def test_exception(self):
+        self.mock_process_tuple.side_effect = ValueError()
+
+        self._run(self.TUPLE)
+
+        self.mock_fail.assert_called_once_with(self.TUPLE)
+        assert not self.mock_ack.called
+
+    def test_heartbeat_while_busy(self):
+        # The heartbeat is answered while a tuple is still being processed
+        synced = threading.Event()
+        self.mock_sync.side_effect = lambda: synced.set()
+        self.mock_process_tuple.side_effect = lambda tup: synced.wait(5)
+
+        self._run(self.TUPLE, self.HEARTBEAT)
+
+        assert synced.is_set()
+        self.mock_ack.assert_called_once_with(self.TUPLE)
+
+    def test_instrumentation(self):
+        self.mock_process_tuple.side_effect = lambda tup: time.sleep(0.05)
+        with mock.patch.object(self.instance, '_serializer'):
+            instrumentation = self.instance.enable_instrumentation()
+
+        self._run(self.TUPLE, self.HEARTBEAT)
+
+        assert instrumentation.counters['tuples'] == 1
+        histogram = instrumentation.histograms['process']
+        assert histogram.count == 1
+        assert histogram.max >= 0.05
+
+    def test_in_flight_limit(self):
+        self.instance._slots = threading.BoundedSemaphore(1)
+        self.instance._executor = mock.Mock()
+
+        self.instance._process_tuple(self.TUPLE)
+
+        assert not self.instance._slots.acquire(False)
+
+    def test_heartbeat_while_all_slots_busy(self):
+        # The heartbeat queued behind a tuple waiting for a slot is answered
+        # before the slot is freed
+        self.instance._slots = threading.BoundedSemaphore(1)
+        self.instance.SLOT_TIMEOUT = 0.01
+        synced = threading.Event()
+        self.mock_sync.side_effect = lambda: synced.set()
+        waited = []
+        self.mock_process_tuple.side_effect = \
+            lambda tup: waited.append(synced.wait(5))
+        other_tuple = StormTuple(2, None, None, None, None)
+
+        self._run(self.TUPLE, other_tuple, self.HEARTBEAT)
+
+        assert waited == [True, True]
+        assert sorted(self.mock_ack.call_args_list) == [
+            mock.call(self.TUPLE), mock.call(other_tuple)]
+
+    def test_send_command_locked(self):
+        def check_locked(*args):
+            assert self.instance._write_lock.locked()
+
+        with mock.patch.object(self.instance, '_serializer') as serializer:
+            serializer.send_msg.side_effect = check_locked
+            serializer.send_msgs.side_effect = check_locked
+            self.instance.send_command('ack', {'id': 1})
+            self.instance.send_commands('ack', [{'id': 1}])
+
+        assert not self.instance._write_lock.locked()
+
+    def test_emit_need_task_ids(self):
+        with pytest.raises(ValueError):
+            self.instance.emit((1,), need_task_ids=True)
+
+        with pytest.raises(ValueError):
+            self.instance.emit_many([(1,)], need_task_ids=True)
+
+    def test_emit(self):
+        with mock.patch.object(
+                self.instance, '_send_emit', autospec=True) as mock_send_emit:
+            self.instance.emit((1,))
+
+        mock_send_emit.assert_called_once_with(
+            {'anchors': [], 'tuple': (1,)}, False, False)
+
+    def test_buffered_serializer(self):
+        pyleus_config = {'serializer_options': {'buffered': True}}
+        with mock.patch.object(self.instance, 'pyleus_config', pyleus_config):
+            with pytest.raises(ValueError):
+                self.instance.initialize_serializer()
+
+    @pytest.mark.parametrize("cls", [ConcurrentBolt, ProcessPoolBolt])
+    def test_without_futures(self, cls):
+        with mock.patch(
+                'pyleus.concurrent_bolt.ThreadPoolExecutor', None):
+            with pytest.raises(ImportError):
+                cls(input_stream=mock.Mock(), output_stream=mock.Mock())
+
+
+class SquareBolt(ProcessPoolBolt):
+
+    WORKERS = 2
+
+    def initialize_worker(self):
+        self.pid = os.getpid()
+
+    def process_tuple_in_worker(self, tup):
+        value, = tup.values
+        if value is None:
+            raise ValueError()
+        return [(value * value, self.pid)]
+
+
+class TestProcessPoolBolt(ComponentTestCase):
+
+    INSTANCE_CLS = SquareBolt
+
+    TICK = StormTuple(None, '__system', '__tick', None, None)
+
+    @pytest.fixture(autouse=True)
+    def setup_mocks(self, request):
+        patches = mock.patch.multiple(self.instance, process_tick=mock.DEFAULT,
+                                      emit_many=mock.DEFAULT,
+                                      ack=mock.DEFAULT, fail=mock.DEFAULT)
+
+        request.addfinalizer(lambda: patches.__exit__(None, None, None))
+        values = patches.__enter__()
+        self.mock_process_tick = values['process_tick']
+        self.mock_emit_many = values['emit_many']
+        self.mock_ack = values['ack']
+        self.mock_fail = values['fail']
+
+    def _run(self, *tups):
+        self.instance._executor = self.instance._create_executor()
+        for tup in tups:
+            self.instance._process_tuple(tup)
+        self.instance._executor.shutdown(wait=True)
+
+    def test_defaults(self):
+        assert self.instance.MAX_IN_FLIGHT == 4
+
+    def test_process_in_workers(self):
+        tups = [StormTuple(i, None, None, None, (i,)) for i in range(3)]
+
+        self._run(*tups)
+
+        assert sorted(self.mock_ack.call_args_list) == [
+            mock.call(tup) for tup in tups]
+        for tup in tups:
+            (emitted, pid), = self.mock_emit_many.call_args_list[
+                self.mock_ack.call_args_list.index(mock.call(tup))][0][0]
+            assert emitted == tup.id * tup.id
+            assert pid != os.getpid()
+
+    def test_process_in_workers_without_initializer(self):
+        tup = StormTuple(1, None, None, None, (3,))
+
+        with mock.patch(
+                'pyleus.concurrent_bolt._HAS_EXECUTOR_INITIALIZER', False):
+            self._run(tup)
+
+        self.mock_ack.assert_called_once_with(tup)
+        (emitted, pid), = self.mock_emit_many.call_args[0][0]
+        assert emitted == 9
+        assert pid != os.getpid()
+
+    def test_instrumentation(self):
+        with mock.patch.object(self.instance, '_serializer'):
+            instrumentation = self.instance.enable_instrumentation()
+
+        self._run(StormTuple(1, None, None, None, (3,)))
+
+        assert instrumentation.histograms['process'].count == 1
+
+    def test_worker_exception(self):
+        tup = StormTuple(1, None, None, None, (None,))
+
+        self._run(tup)
+
+        self.mock_fail.assert_called_once_with(tup)
+        assert not self.mock_ack.called
+
+    def test_tick(self):
+        self._run(self.TICK)
+
+        self.mock_process_tick.assert_called_once_with()
+        self.mock_ack.assert_called_once_with(self.TICK)
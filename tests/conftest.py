@@ -0,0 +1,6 @@
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 7):
+    # Uses the async/await syntax of pyleus.async_components
+    collect_ignore.append("async_components_test.py")
@@ -1,9 +1,13 @@
 from collections import namedtuple
 import contextlib
+import io
+import time
 
+import msgpack
 import pytest
 
-from pyleus.storm import StormTuple, Bolt, SimpleBolt
+from pyleus.storm import StormTuple, Bolt, SimpleBolt, BatchingBolt
+from pyleus.storm.component import StormConfig
 from pyleus.testing import ComponentTestCase, mock
 
 
@@ -34,6 +38,41 @@ class TestBolt(ComponentTestCase):
             assert not values['process_tuple'].called
             assert not values['ack'].called
 
+    def test_instrumentation(self):
+        heartbeat = StormTuple(None, None, '__heartbeat', -1, [])
+        tup = StormTuple(1, None, None, None, [])
+
+        with mock.patch.multiple(self.instance,
+                _serializer=mock.DEFAULT,
+                process_tuple=mock.DEFAULT,
+                send_command=mock.DEFAULT) as values:
+            instrumentation = self.instance.enable_instrumentation()
+
+            self.instance._process_tuple(heartbeat)
+            self.instance._process_tuple(tup)
+
+            values['process_tuple'].assert_called_once_with(tup)
+
+        assert instrumentation.histograms['process'].count == 2
+        assert instrumentation.counters['tuples'] == 1
+
+    def test_sync_flushes_metrics(self):
+        self.instance.METRICS_INTERVAL = 10
+        self.instance._metrics_deadline = 0
+        self.instance.metrics.counter("foo").incr()
+
+        with mock.patch.object(self.instance, 'send_command', autospec=True) as \
+                mock_send_command:
+            self.instance.sync()
+
+        assert mock_send_command.call_args_list == [
+            mock.call('metrics', {
+                'name': "pyleus",
+                'params': {'counters': {'foo': 1}, 'values': {}},
+            }),
+            mock.call('sync'),
+        ]
+
     def test_fail(self):
         tup = mock.Mock(id=1234)
 
@@ -52,6 +91,15 @@ class TestBolt(ComponentTestCase):
         mock_read_taskid.assert_called_once_with()
         mock_send_command.assert_called_once_with('emit', expected_command_dict)
 
+    @contextlib.contextmanager
+    def _test_emit_helper_pipelined(self, expected_command_dict):
+        with mock.patch.object(self.instance, 'read_taskid', autospec=True) as mock_read_taskid:
+            with mock.patch.object(self.instance, 'send_command', autospec=True) as mock_send_command:
+                yield mock_send_command
+
+        assert mock_read_taskid.call_count == 0
+        mock_send_command.assert_called_once_with('emit', expected_command_dict)
+
     @contextlib.contextmanager
     def _test_emit_helper_no_taskid(self, expected_command_dict):
         with mock.patch.object(self.instance, 'read_taskid', autospec=True) as mock_read_taskid:
@@ -61,6 +109,24 @@ class TestBolt(ComponentTestCase):
         assert mock_read_taskid.call_count == 0
         mock_send_command.assert_called_once_with('emit', expected_command_dict)
 
+    def test_ack_many(self):
+        tups = [mock.Mock(id=i) for i in (1, 2)]
+
+        with mock.patch.object(
+                self.instance, 'send_commands', autospec=True) as mock_send:
+            self.instance.ack_many(tups)
+
+        mock_send.assert_called_once_with('ack', [{'id': 1}, {'id': 2}])
+
+    def test_fail_many(self):
+        tups = [mock.Mock(id=i) for i in (1, 2)]
+
+        with mock.patch.object(
+                self.instance, 'send_commands', autospec=True) as mock_send:
+            self.instance.fail_many(tups)
+
+        mock_send.assert_called_once_with('fail', [{'id': 1}, {'id': 2}])
+
     def test_emit_simple(self):
         expected_command_dict = {
             'anchors': [],
@@ -80,6 +146,17 @@ class TestBolt(ComponentTestCase):
         with self._test_emit_helper_no_taskid(expected_command_dict):
             self.instance.emit((1, 2, 3), need_task_ids=False)
 
+    def test_emit_pipelined(self):
+        expected_command_dict = {
+            'anchors': [],
+            'tuple': (1, 2, 3),
+        }
+
+        with self._test_emit_helper_pipelined(expected_command_dict):
+            future = self.instance.emit((1, 2, 3), pipelined=True)
+
+        assert not future.done()
+
     def test_emit_with_list(self):
         expected_command_dict = {
             'anchors': [],
@@ -145,6 +222,27 @@ class TestBolt(ComponentTestCase):
         with pytest.raises(AssertionError):
             self.instance.emit("not-a-list-or-tuple")
 
+    def test_emit_many(self):
+        anchors = [mock.Mock(id=i) for i in (4, 5)]
+
+        with mock.patch.object(
+                self.instance, '_send_emits', autospec=True) as mock_send_emits:
+            result = self.instance.emit_many(
+                [(1, 2), [3, 4]], stream=mock.sentinel.stream, anchors=anchors,
+                need_task_ids=False)
+
+        assert result == mock_send_emits.return_value
+        mock_send_emits.assert_called_once_with([
+            {'anchors': [4, 5], 'stream': mock.sentinel.stream,
+             'tuple': (1, 2)},
+            {'anchors': [4, 5], 'stream': mock.sentinel.stream,
+             'tuple': (3, 4)},
+        ], False, False)
+
+    def test_emit_many_with_bad_values(self):
+        with pytest.raises(AssertionError):
+            self.instance.emit_many([(1, 2), "not-a-list-or-tuple"])
+
 
 class TestSimpleBolt(ComponentTestCase):
 
@@ -205,3 +303,207 @@ class TestSimpleBolt(ComponentTestCase):
 
         with pytest.raises(MyException):
             self.instance._process_tuple(self.TUPLE)
+
+
+class TestSimpleBoltAckBatching(ComponentTestCase):
+
+    class BatchingSimpleBolt(SimpleBolt):
+        ACK_BATCH_SIZE = 3
+        ACK_BATCH_TIMEOUT = 10.0
+
+    INSTANCE_CLS = BatchingSimpleBolt
+
+    TICK = StormTuple(None, '__system', '__tick', None, None)
+    HEARTBEAT = StormTuple(None, None, '__heartbeat', -1, [])
+
+    @pytest.fixture(autouse=True)
+    def setup_mocks(self, request):
+        patches = mock.patch.multiple(self.instance, process_tick=mock.DEFAULT,
+                                      process_tuple=mock.DEFAULT,
+                                      ack=mock.DEFAULT, ack_many=mock.DEFAULT,
+                                      sync=mock.DEFAULT)
+
+        request.addfinalizer(lambda: patches.__exit__(None, None, None))
+        values = patches.__enter__()
+        self.mock_ack = values['ack']
+        self.mock_ack_many = values['ack_many']
+        self.mock_sync = values['sync']
+        self.tuples = [StormTuple(i, None, None, None, None) for i in range(4)]
+
+    def test_batch_size(self):
+        for tup in self.tuples:
+            self.instance._process_tuple(tup)
+
+        self.mock_ack_many.assert_called_once_with(self.tuples[:3])
+        assert not self.mock_ack.called
+
+    def test_batch_timeout(self):
+        with mock.patch.object(time, 'time', side_effect=[0.0, 1.0, 11.0]):
+            for tup in self.tuples[:3]:
+                self.instance._process_tuple(tup)
+
+        self.mock_ack_many.assert_called_once_with(self.tuples[:3])
+
+    def test_batch_timeout_capped_to_message_timeout(self):
+        self.instance.conf = StormConfig({'topology.message.timeout.secs': 4})
+
+        with mock.patch.object(time, 'time', side_effect=[0.0, 2.0]):
+            for tup in self.tuples[:2]:
+                self.instance._process_tuple(tup)
+
+        self.mock_ack_many.assert_called_once_with(self.tuples[:2])
+
+    def test_heartbeat_flushes_acks(self):
+        self.instance._process_tuple(self.tuples[0])
+        assert not self.mock_ack_many.called
+
+        self.instance._process_tuple(self.HEARTBEAT)
+
+        self.mock_ack_many.assert_called_once_with(self.tuples[:1])
+        self.mock_sync.assert_called_once_with()
+
+    def test_tick_flushes_acks(self):
+        self.instance._process_tuple(self.tuples[0])
+        self.instance._process_tuple(self.TICK)
+
+        self.mock_ack_many.assert_called_once_with([self.tuples[0], self.TICK])
+
+    def test_flush_acks_nothing_pending(self):
+        self.instance.flush_acks()
+
+        assert not self.mock_ack_many.called
+
+    def test_acks_flushed_before_waiting_for_input(self):
+        events = []
+        chunks = [b"".join(msgpack.packb({
+            'id': i, 'comp': "spout", 'stream': "default", 'task': 1,
+            'tuple': [i],
+        }) for i in range(2)), b""]
+
+        def readinto(buf):
+            events.append("read")
+            chunk = chunks.pop(0)
+            buf[:len(chunk)] = chunk
+            return len(chunk)
+
+        self.mock_ack_many.side_effect = lambda tups: events.append(
+            ("ack_many", [tup.id for tup in tups]))
+        self.instance.pyleus_config = {'serializer': "msgpack"}
+        self.instance.initialize_serializer()
+
+        with mock.patch.object(io, 'FileIO') as mock_file_io:
+            mock_file_io.return_value.readinto.side_effect = readinto
+            self.instance.run_component()
+
+        # Both tuples came in one read, their acks are sent at once before
+        # the bolt waits for the next tuples
+        assert events == ["read", ("ack_many", [0, 1]), "read"]
+
+
+class TestBatchingBolt(ComponentTestCase):
+
+    class SmallBatchingBolt(BatchingBolt):
+        BATCH_SIZE = 3
+        BATCH_TIMEOUT = 10.0
+
+    INSTANCE_CLS = SmallBatchingBolt
+
+    TICK = StormTuple(None, '__system', '__tick', None, None)
+    HEARTBEAT = StormTuple(None, None, '__heartbeat', -1, [])
+
+    @pytest.fixture(autouse=True)
+    def setup_mocks(self, request):
+        patches = mock.patch.multiple(self.instance,
+                                      process_batch=mock.DEFAULT,
+                                      process_tick=mock.DEFAULT,
+                                      ack=mock.DEFAULT, ack_many=mock.DEFAULT,
+                                      fail_many=mock.DEFAULT,
+                                      sync=mock.DEFAULT)
+
+        request.addfinalizer(lambda: patches.__exit__(None, None, None))
+        values = patches.__enter__()
+        self.mock_process_batch = values['process_batch']
+        self.mock_process_tick = values['process_tick']
+        self.mock_ack = values['ack']
+        self.mock_ack_many = values['ack_many']
+        self.mock_fail_many = values['fail_many']
+        self.mock_sync = values['sync']
+        self.tuples = [StormTuple(i, None, None, None, None) for i in range(4)]
+
+    def test_batch_size(self):
+        for tup in self.tuples:
+            self.instance._process_tuple(tup)
+
+        self.mock_process_batch.assert_called_once_with(self.tuples[:3])
+        self.mock_ack_many.assert_called_once_with(self.tuples[:3])
+        assert self.instance._batch == self.tuples[3:]
+
+    def test_batch_timeout(self):
+        with mock.patch.object(time, 'time', side_effect=[0.0, 10.0]):
+            for tup in self.tuples[:2]:
+                self.instance._process_tuple(tup)
+
+        self.mock_process_batch.assert_called_once_with(self.tuples[:2])
+
+    def test_heartbeat(self):
+        with mock.patch.object(time, 'time', side_effect=[0.0, 1.0]):
+            self.instance._process_tuple(self.tuples[0])
+            self.instance._process_tuple(self.HEARTBEAT)
+
+        assert not self.mock_process_batch.called
+        self.mock_sync.assert_called_once_with()
+
+    def test_heartbeat_batch_timeout(self):
+        with mock.patch.object(time, 'time', side_effect=[0.0, 10.0]):
+            self.instance._process_tuple(self.tuples[0])
+            self.instance._process_tuple(self.HEARTBEAT)
+
+        self.mock_process_batch.assert_called_once_with(self.tuples[:1])
+        self.mock_sync.assert_called_once_with()
+
+    def test_tick(self):
+        self.instance._process_tuple(self.tuples[0])
+        self.instance._process_tuple(self.TICK)
+
+        self.mock_process_batch.assert_called_once_with(self.tuples[:1])
+        self.mock_process_tick.assert_called_once_with()
+        self.mock_ack.assert_called_once_with(self.TICK)
+
+    def test_tick_empty_batch(self):
+        self.instance._process_tuple(self.TICK)
+
+        assert not self.mock_process_batch.called
+        self.mock_process_tick.assert_called_once_with()
+
+    def test_exception(self):
+        self.mock_process_batch.side_effect = ValueError()
+
+        for tup in self.tuples[:3]:
+            self.instance._process_tuple(tup)
+
+        self.mock_fail_many.assert_called_once_with(self.tuples[:3])
+        assert not self.mock_ack_many.called
+        assert self.instance._current_batch is None
+
+    def test_emit_anchors_to_batch(self):
+        def process_batch(tups):
+            self.instance.emit((1,), need_task_ids=False)
+            self.instance.emit((2,), anchors=[], need_task_ids=False)
+            self.instance.emit_many([(3,)], need_task_ids=False)
+
+        self.mock_process_batch.side_effect = process_batch
+
+        with mock.patch.object(
+                self.instance, 'send_commands', autospec=True):
+            with mock.patch.object(
+                    self.instance, 'send_command',
+                    autospec=True) as mock_send_command:
+                for tup in self.tuples[:3]:
+                    self.instance._process_tuple(tup)
+
+                _, (_, many_dicts), _ = self.instance.send_commands.mock_calls[0]
+
+        (_, (_, first), _), (_, (_, second), _) = mock_send_command.mock_calls
+        assert first['anchors'] == [0, 1, 2]
+        assert second['anchors'] == []
+        assert many_dicts[0]['anchors'] == [0, 1, 2]
@@ -1,8 +1,11 @@
 import logging.config
 import os.path
 
-from pyleus.storm import StormTuple
+import pytest
+
+from pyleus.storm import LazyStormTuple, StormTuple
 from pyleus.storm.component import DEFAULT_LOGGING_CONFIG_PATH
+from pyleus.storm.component import SERIALIZERS
 from pyleus.storm.serializers.serializer import Serializer
 from pyleus.testing import ComponentTestCase, mock, builtins
 
@@ -87,6 +90,42 @@ class TestComponent(ComponentTestCase):
         assert self.instance.read_taskid() == next_taskid
         assert len(self.instance._pending_taskids) == 2
 
+    def test__send_emit_pipelined(self):
+        command_msg = dict(this_is_a_command=True)
+        messages = [[1], command_msg, [2], [3]]
+
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            self.instance._serializer.read_msg.side_effect = messages
+
+            first = self.instance._send_emit({}, True, True)
+            second = self.instance._send_emit({}, True, True)
+            assert not first.done()
+
+            # A blocking emit waits for the task ids of previous emits too
+            assert self.instance._send_emit({}, True, False) == [3]
+
+        assert first.result() == [1]
+        assert second.result() == [2]
+        assert list(self.instance._pending_commands) == [command_msg]
+
+    def test_read_command_resolves_pipelined_emits(self):
+        command_msg = dict(this_is_a_command=True)
+        callback = mock.Mock()
+
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            self.instance._serializer.read_msg.side_effect = [
+                [1], command_msg]
+
+            future = self.instance._send_emit({}, True, True)
+            future.add_done_callback(callback)
+            assert self.instance.read_command() == command_msg
+
+        assert future.done()
+        callback.assert_called_once_with([1])
+        assert not self.instance._pending_taskids
+
     def test_read_tuple(self):
         command_dict = {
             'id': "id",
@@ -106,6 +145,24 @@ class TestComponent(ComponentTestCase):
         assert isinstance(storm_tuple, StormTuple)
         assert storm_tuple == expected_storm_tuple
 
+    def test_read_tuple_lazy(self):
+        lazy_tuple = LazyStormTuple(
+            "id", "comp", "stream", "task", "raw", mock.Mock())
+
+        with mock.patch.object(
+                self.instance, 'read_command', return_value=lazy_tuple):
+            storm_tuple = self.instance.read_tuple()
+
+        assert storm_tuple is lazy_tuple
+        assert not lazy_tuple._decode.called
+
+    def test__msg_is_command_lazy_tuple(self):
+        lazy_tuple = LazyStormTuple(
+            "id", "comp", "stream", "task", "raw", mock.Mock())
+
+        assert self.instance._msg_is_command(lazy_tuple)
+        assert not self.instance._msg_is_taskid(lazy_tuple)
+
     def test__create_pidfile(self):
         with mock.patch.object(builtins, 'open', autospec=True) as mock_open:
             self.instance._create_pidfile("pid_dir", "pid")
@@ -138,6 +195,34 @@ class TestComponent(ComponentTestCase):
         assert conf == {"foo": "bar"}
         assert context == "context"
 
+    def test__start_profiler_disabled(self):
+        with mock.patch.object(self.instance, 'pyleus_config', {}):
+            assert self.instance._start_profiler() is None
+
+    @mock.patch('pyleus.storm.component.SamplingProfiler', autospec=True)
+    def test__start_profiler(self, mock_profiler_cls):
+        self.instance._pid_dir = "pid_dir"
+        pyleus_config = {'profiler': {'interval': 0.1}}
+
+        with mock.patch.object(self.instance, 'pyleus_config', pyleus_config):
+            with mock.patch('os.getpid', return_value=1234):
+                profiler = self.instance._start_profiler()
+
+        mock_profiler_cls.assert_called_once_with(
+            os.path.join("pid_dir", "profile-1234.folded"), interval=0.1)
+        profiler.start.assert_called_once_with()
+
+    @mock.patch('pyleus.storm.component.SamplingProfiler', autospec=True)
+    def test__start_profiler_dir(self, mock_profiler_cls):
+        pyleus_config = {'profiler': {'dir': "/tmp"}}
+
+        with mock.patch.object(self.instance, 'pyleus_config', pyleus_config):
+            with mock.patch('os.getpid', return_value=1234):
+                self.instance._start_profiler()
+
+        mock_profiler_cls.assert_called_once_with(
+            os.path.join("/tmp", "profile-1234.folded"))
+
     def test_send_command_with_opts(self):
         with mock.patch.object(
                 self.instance, '_serializer', autospec=Serializer):
@@ -157,6 +242,182 @@ class TestComponent(ComponentTestCase):
                 'command': "test",
             })
 
+    def test_send_command_sync_flushes(self):
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            self.instance.send_command('sync')
+
+            self.instance._serializer.send_msg.assert_called_once_with({
+                'command': "sync",
+            })
+            self.instance._serializer.flush.assert_called_once_with()
+
+    def test_send_command_no_flush(self):
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            self.instance.send_command('emit', {'tuple': (1, 2)})
+
+            assert not self.instance._serializer.flush.called
+
+    def test_initialize_serializer_options(self):
+        pyleus_config = {
+            'serializer': "msgpack",
+            'serializer_options': {'buffered': True},
+        }
+        with mock.patch.object(self.instance, 'pyleus_config', pyleus_config):
+            with mock.patch.dict(SERIALIZERS, msgpack=mock.Mock()):
+                self.instance.initialize_serializer()
+
+                SERIALIZERS['msgpack'].assert_called_once_with(
+                    self.mock_input_stream, self.mock_output_stream,
+                    buffered=True)
+
+    def test_initialize_serializer_no_batching(self):
+        pyleus_config = {
+            'serializer': "testing.serializer.CustomSerializer",
+            'serializer_options': {'buffered': True},
+        }
+        with mock.patch.object(self.instance, 'pyleus_config', pyleus_config):
+            with pytest.raises(ValueError):
+                self.instance.initialize_serializer()
+
+    def test_initialize_serializer_unknown(self):
+        with mock.patch.object(
+                self.instance, 'pyleus_config', {'serializer': "foo"}):
+            with pytest.raises(ValueError):
+                self.instance.initialize_serializer()
+
+    def test_send_commands(self):
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            self.instance.send_commands('test', [{'option': 1}, {'option': 2}])
+
+            self.instance._serializer.send_msgs.assert_called_once_with([
+                {'command': "test", 'option': 1},
+                {'command': "test", 'option': 2},
+            ])
+            assert not self.instance._serializer.flush.called
+
+    def test__send_emits(self):
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            self.instance._serializer.read_msg.side_effect = [[1], [2]]
+
+            assert self.instance._send_emits(
+                [{'tuple': (1,)}, {'tuple': (2,)}], True, False) == [[1], [2]]
+            assert self.instance._serializer.send_msgs.call_count == 1
+
+    def test__send_emits_no_taskids(self):
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            assert self.instance._send_emits(
+                [{'tuple': (1,)}], False, False) is None
+
+            self.instance._serializer.send_msgs.assert_called_once_with([
+                {'command': "emit", 'tuple': (1,), 'need_task_ids': False},
+            ])
+            assert not self.instance._serializer.read_msg.called
+
+    def test__send_emits_pipelined(self):
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            self.instance._serializer.read_msg.side_effect = [[1], [2]]
+
+            futures = self.instance._send_emits(
+                [{'tuple': (1,)}, {'tuple': (2,)}], True, True)
+            assert not self.instance._serializer.read_msg.called
+
+            assert futures[1].result() == [2]
+            assert futures[0].done()
+
+    def test_enable_instrumentation(self):
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            instrumentation = self.instance.enable_instrumentation()
+            self.instance._serializer.read_msg.side_effect = [[1]]
+
+            assert self.instance.enable_instrumentation() is instrumentation
+            self.instance._serializer.instrument.assert_called_once_with(
+                instrumentation)
+
+            self.instance.send_command('ack', {'id': 1})
+            self.instance.send_commands('fail', [{'id': 2}, {'id': 3}])
+            self.instance._send_emit({'tuple': (1,)}, True, False)
+
+            assert self.instance._serializer.send_msgs.call_count == 1
+
+        assert instrumentation.counters['acks'] == 1
+        assert instrumentation.counters['fails'] == 2
+        assert instrumentation.counters['emits'] == 1
+        assert instrumentation.histograms['taskids'].count == 1
+
+    def test_flush_metrics(self):
+        self.instance.metrics.counter("foo").incr()
+
+        with mock.patch.object(
+                self.instance, 'send_command', autospec=True) as \
+                mock_send_command:
+            self.instance.flush_metrics()
+
+        mock_send_command.assert_called_once_with('metrics', {
+            'name': "pyleus",
+            'params': {'counters': {'foo': 1}, 'values': {}},
+        })
+
+    def test_flush_metrics_nothing(self):
+        with mock.patch.object(
+                self.instance, 'send_command', autospec=True) as \
+                mock_send_command:
+            self.instance.flush_metrics()
+
+        assert not mock_send_command.called
+
+    def test_flush_metrics_builtin(self):
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            self.instance.enable_instrumentation()
+            self.instance.send_command('ack', {'id': 1})
+            self.instance.flush_metrics()
+
+            msg = self.instance._serializer.send_msg.call_args[0][0]
+
+        assert msg['command'] == "metrics"
+        assert msg['params']['counters']['pyleus.acks'] == 1
+
+    def test_flush_metrics_builtin_without_instrumentation(self):
+        with mock.patch.object(
+                self.instance, '_serializer', autospec=Serializer):
+            instrumentation = self.instance._enable_builtin_metrics()
+            self.instance.send_command('ack', {'id': 1})
+            self.instance.flush_metrics()
+
+            msg = self.instance._serializer.send_msg.call_args[0][0]
+            assert not self.instance._serializer.instrument.called
+
+        assert not instrumentation.timing
+        assert msg['params']['counters']['pyleus.acks'] == 1
+        assert msg['params']['values'] == {}
+
+    def test__maybe_flush_metrics(self):
+        self.instance.METRICS_INTERVAL = 10
+
+        with mock.patch.object(
+                self.instance, 'flush_metrics', autospec=True) as \
+                mock_flush_metrics:
+            # Not set up yet
+            self.instance._maybe_flush_metrics()
+            assert not mock_flush_metrics.called
+
+            self.instance._metrics_deadline = 100
+            with mock.patch('time.time', return_value=99):
+                self.instance._maybe_flush_metrics()
+            assert not mock_flush_metrics.called
+
+            with mock.patch('time.time', return_value=100):
+                self.instance._maybe_flush_metrics()
+            mock_flush_metrics.assert_called_once_with()
+            assert self.instance._metrics_deadline == 110
+
     def test_send_command_clobber_command(self):
         with mock.patch.object(
                 self.instance, '_serializer', autospec=Serializer):
@@ -1,4 +1,5 @@
-from pyleus.storm import StormTuple, is_tick
+from pyleus.storm import LazyStormTuple, StormTuple, is_heartbeat, is_tick
+from pyleus.testing import mock
 
 
 class TestStormUtilFunctions(object):
@@ -12,3 +13,41 @@ class TestStormUtilFunctions(object):
         assert not is_tick(tup)
         tup = StormTuple(None, None, '__tick', None, None)
         assert not is_tick(tup)
+
+
+class TestLazyStormTuple(object):
+
+    def test_values_decoded_once_on_access(self):
+        decode = mock.Mock(return_value=[1, 2])
+        tup = LazyStormTuple("id", "comp", "stream", 3, b"raw", decode)
+
+        assert tup.stream == "stream"
+        assert not decode.called
+
+        assert tup.values == [1, 2]
+        assert tup.values == [1, 2]
+        decode.assert_called_once_with(b"raw")
+
+    def test_compatible_with_storm_tuple(self):
+        tup = LazyStormTuple("id", "comp", "stream", 3, b"raw",
+                             lambda raw: [1, 2])
+
+        assert tup == StormTuple("id", "comp", "stream", 3, [1, 2])
+        assert tuple(tup) == ("id", "comp", "stream", 3, [1, 2])
+        assert len(tup) == 5
+        assert tup[1] == "comp"
+        assert tup[-1] == [1, 2]
+        assert tup[:2] == ("id", "comp")
+        tup_id, comp, stream, task, values = tup
+        assert values == [1, 2]
+
+    def test_is_tick_and_is_heartbeat(self):
+        decode = mock.Mock()
+        tick = LazyStormTuple(None, '__system', '__tick', None, b"", decode)
+        heartbeat = LazyStormTuple(None, None, '__heartbeat', -1, b"", decode)
+
+        assert is_tick(tick)
+        assert not is_heartbeat(tick)
+        assert is_heartbeat(heartbeat)
+        assert not is_tick(heartbeat)
+        assert not decode.called
@@ -0,0 +1,113 @@
+import pytest
+
+from pyleus.storm import instrumentation
+from pyleus.storm.instrumentation import Histogram
+from pyleus.storm.instrumentation import Instrumentation
+
+
+def test_bit_length_legacy():
+    for value in list(range(1000)) + [2 ** 39, 2 ** 40 - 1]:
+        bits = 0
+        while value >> bits:
+            bits += 1
+        assert instrumentation._bit_length_legacy(value) == bits
+
+
+class TestHistogram(object):
+
+    @pytest.fixture(autouse=True)
+    def setup_histogram(self):
+        self.histogram = Histogram()
+
+    def test_empty(self):
+        assert self.histogram.snapshot() == {
+            'count': 0, 'min': None, 'max': None, 'mean': None,
+            'p50': None, 'p90': None, 'p99': None, 'p999': None,
+        }
+
+    def test_record(self):
+        for i in range(1, 101):
+            self.histogram.record(i / 1000.0)
+
+        assert self.histogram.count == 100
+        assert self.histogram.min == 0.001
+        assert self.histogram.max == 0.1
+        assert self.histogram.mean == pytest.approx(0.0505)
+
+    def test_percentile(self):
+        for i in range(1, 1001):
+            self.histogram.record(i / 1000000.0)
+
+        # Buckets are accurate to about 6%
+        assert self.histogram.percentile(50) == pytest.approx(0.0005, rel=0.07)
+        assert self.histogram.percentile(99) == pytest.approx(0.00099, rel=0.07)
+        assert self.histogram.percentile(100) == 0.001
+
+    def test_percentile_small_values_exact(self):
+        for value in (1, 2, 3, 4):
+            self.histogram.record(value / 1000000.0)
+
+        assert self.histogram.percentile(50) == 0.000002
+
+    def test_record_huge_value(self):
+        self.histogram.record(10 ** 9)
+
+        assert self.histogram.count == 1
+        assert self.histogram.percentile(50) == pytest.approx(
+            2 ** 40 / 1000000.0, rel=0.07)
+
+    def test_reset(self):
+        self.histogram.record(0.5)
+        self.histogram.reset()
+
+        assert self.histogram.count == 0
+        assert self.histogram.percentile(50) is None
+
+
+class TestInstrumentation(object):
+
+    @pytest.fixture(autouse=True)
+    def setup_instrumentation(self):
+        self.instrumentation = Instrumentation()
+
+    def test_timed(self):
+        def fn(x, y=0):
+            if x is None:
+                raise ValueError()
+            return x + y
+
+        timed_fn = self.instrumentation.timed('process', fn)
+
+        assert timed_fn(1, y=2) == 3
+        with pytest.raises(ValueError):
+            timed_fn(None)
+        assert self.instrumentation.histograms['process'].count == 2
+
+    def test_record_read(self):
+        self.instrumentation.record_read(0.5, 10)
+        self.instrumentation.record_read(0.25, 5)
+
+        assert self.instrumentation.histograms['read'].count == 2
+        assert self.instrumentation.read_wait == 0.75
+        assert self.instrumentation.counters['bytes_in'] == 15
+
+    def test_count_commands(self):
+        self.instrumentation.count_commands('emit', 3)
+        self.instrumentation.count_commands('ack')
+        self.instrumentation.count_commands('sync')
+
+        assert self.instrumentation.counters['emits'] == 3
+        assert self.instrumentation.counters['acks'] == 1
+        assert self.instrumentation.counters['fails'] == 0
+
+    def test_snapshot_reset(self):
+        self.instrumentation.record('emit', 0.001)
+        self.instrumentation.count_commands('fail')
+
+        snapshot = self.instrumentation.snapshot(reset=True)
+
+        assert snapshot['histograms']['emit']['count'] == 1
+        assert snapshot['histograms']['taskids']['count'] == 0
+        assert snapshot['counters']['fails'] == 1
+        assert self.instrumentation.counters['fails'] == 0
+        assert self.instrumentation.histograms['emit'].count == 0
@@ -0,0 +1,61 @@
+import pytest
+
+from pyleus.storm.instrumentation import Instrumentation
+from pyleus.storm.metrics import MetricsRegistry
+from pyleus.storm.metrics import add_instrumentation_values
+
+
+class TestMetricsRegistry(object):
+
+    @pytest.fixture(autouse=True)
+    def setup_registry(self):
+        self.registry = MetricsRegistry()
+
+    def test_get_values_and_reset(self):
+        self.registry.counter("count").incr(3)
+        self.registry.gauge("gauge").set(7)
+        self.registry.gauge("gauge_fn", lambda: "foo")
+        mean = self.registry.mean("mean")
+        mean.record(1)
+        mean.record(2)
+        self.registry.histogram("histogram").record(0.5)
+
+        values = self.registry.get_values_and_reset()
+
+        assert values['counters'] == {'count': 3}
+        assert values['values']['gauge'] == 7
+        assert values['values']['gauge_fn'] == "foo"
+        assert values['values']['mean'] == 1.5
+        assert values['values']['histogram']['count'] == 1
+
+        # Gauges keep their value, other metrics start over
+        assert self.registry.get_values_and_reset() == {
+            'counters': {'count': 0},
+            'values': {'gauge': 7, 'gauge_fn': "foo"},
+        }
+
+    def test_same_name(self):
+        assert self.registry.counter("foo") is self.registry.counter("foo")
+        assert len(self.registry) == 1
+
+    def test_same_name_other_type(self):
+        self.registry.counter("foo")
+
+        with pytest.raises(ValueError):
+            self.registry.mean("foo")
+
+
+def test_add_instrumentation_values():
+    instrumentation = Instrumentation()
+    instrumentation.count_commands('ack', 2)
+    instrumentation.record('process', 0.001)
+    values = {'counters': {'foo': 1}, 'values': {}}
+
+    add_instrumentation_values(values, instrumentation)
+
+    assert values['counters']['foo'] == 1
+    assert values['counters']['pyleus.acks'] == 2
+    assert values['counters']['pyleus.bytes_in'] == 0
+    assert list(values['values']) == ['pyleus.latency.process']
+    assert values['values']['pyleus.latency.process']['count'] == 1
+    assert instrumentation.counters['acks'] == 0
@@ -0,0 +1,76 @@
+import signal
+import sys
+
+import pytest
+
+from pyleus.storm.profiler import SamplingProfiler
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(signal, "setitimer"), reason="requires signal.setitimer")
+
+
+def _busy():
+    total = 0
+    for i in range(10 ** 7):
+        total += i
+        if _profiler_stacks():
+            return
+
+
+_profiler = None
+
+
+def _profiler_stacks():
+    return _profiler is not None and len(_profiler._stacks) > 0
+
+
+class TestSamplingProfiler(object):
+
+    @pytest.fixture(autouse=True)
+    def setup_profiler(self, tmpdir):
+        self.path = str(tmpdir.join("profile.folded"))
+        self.profiler = SamplingProfiler(self.path, interval=0.001)
+
+    def test_sample(self):
+        self.profiler._sample(signal.SIGPROF, sys._getframe())
+        self.profiler._sample(signal.SIGPROF, sys._getframe())
+
+        (stack, count), = self.profiler._stacks.items()
+        assert count == 2
+        assert stack.endswith(";test_sample (profiler_test.py:{0})".format(
+            TestSamplingProfiler.test_sample.__code__.co_firstlineno))
+
+    def test_sample_all_threads(self):
+        self.profiler.all_threads = True
+
+        self.profiler._sample(signal.SIGPROF, sys._getframe())
+
+        assert any(stack.endswith(
+            "test_sample_all_threads (profiler_test.py:{0})".format(
+                TestSamplingProfiler.test_sample_all_threads.__code__
+                .co_firstlineno))
+            for stack in self.profiler._stacks)
+
+    def test_dump(self):
+        self.profiler._stacks["a;b"] = 3
+        self.profiler._stacks["a"] = 1
+
+        self.profiler.dump()
+
+        with open(self.path) as f:
+            assert f.read() == "a 1\na;b 3\n"
+
+    def test_start_stop(self):
+        global _profiler
+        _profiler = self.profiler
+        previous_handler = signal.getsignal(signal.SIGPROF)
+        try:
+            self.profiler.start()
+            _busy()
+            self.profiler.stop()
+        finally:
+            _profiler = None
+
+        assert signal.getsignal(signal.SIGPROF) == previous_handler
+        with open(self.path) as f:
+            assert "_busy (profiler_test.py:" in f.read()
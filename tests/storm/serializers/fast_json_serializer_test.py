@@ -0,0 +1,100 @@
+from collections import namedtuple
+import io
+import json
+
+import pytest
+
+from pyleus.compat import BytesIO
+from pyleus.testing import mock
+from pyleus.storm.serializers import fast_json_serializer
+from pyleus.storm.serializers.fast_json_serializer import FastJSONSerializer
+from testing.serializer import SerializerTestCase
+
+BACKENDS = fast_json_serializer._available_backends()
+
+
+def _frame(msg):
+    return (json.dumps(msg) + "\nend\n").encode("utf-8")
+
+
+def _decode_output(sio):
+    text, end, _ = sio.getvalue().decode("utf-8").rsplit("\n", 2)
+    assert end == "end"
+    return json.loads(text)
+
+
+class TestFastJSONSerializer(SerializerTestCase):
+
+    INSTANCE_CLS = FastJSONSerializer
+
+    def _instance(self, backend, output_stream=None):
+        return FastJSONSerializer(
+            self.mock_input_stream, output_stream or self.mock_output_stream,
+            backend=backend)
+
+    def test_default_backend(self):
+        assert self.instance.backend == BACKENDS[0]
+
+    def test_unavailable_backend(self):
+        with mock.patch.object(fast_json_serializer, 'orjson', None):
+            with pytest.raises(ValueError):
+                self._instance("orjson")
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_read_msg(self, backend):
+        msg_dict = {
+            'hello': u"w\xf6rld",
+            'tuple': [1, 2.5, None],
+        }
+
+        instance = self._instance(backend)
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(_frame(msg_dict))):
+            assert instance.read_msg() == msg_dict
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_big_int_round_trip(self, backend):
+        msg_dict = {'tuple': [2 ** 70, -2 ** 64]}
+
+        sio = BytesIO()
+        instance = self._instance(backend, sio)
+        instance.send_msg(msg_dict)
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(sio.getvalue())):
+            msg = instance.read_msg()
+
+        assert msg == msg_dict
+        assert not any(isinstance(value, float) for value in msg['tuple'])
+
+    def test_read_msg_ujson_fallback(self):
+        instance = self._instance(BACKENDS[0])
+        instance._loads = mock.Mock(side_effect=ValueError("Too big"))
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(_frame({'big': 2 ** 70}))):
+            assert instance.read_msg() == {'big': 2 ** 70}
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_send_msg(self, backend):
+        msg_dict = {
+            'command': "emit",
+            'tuple': (1, u"w\xf6rld/", {2: None}),
+        }
+
+        sio = BytesIO()
+        self._instance(backend, sio).send_msg(msg_dict)
+
+        # Same semantics as the stock JSON serializer
+        assert _decode_output(sio) == json.loads(json.dumps(msg_dict))
+
+    @pytest.mark.parametrize("backend", BACKENDS)
+    def test_send_msg_fallback(self, backend):
+        MyTuple = namedtuple('MyTuple', "a b")
+        msg_dict = {
+            'big': 2 ** 70,
+            'named': MyTuple(1, 2),
+        }
+
+        sio = BytesIO()
+        self._instance(backend, sio).send_msg(msg_dict)
+
+        assert _decode_output(sio) == {'big': 2 ** 70, 'named': [1, 2]}
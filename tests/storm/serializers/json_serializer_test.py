@@ -1,15 +1,25 @@
+import io
+
 try:
     import simplejson as json
     _ = json # pyflakes
 except ImportError:
     import json
 
-from pyleus.compat import StringIO
+import pytest
+
+from pyleus.compat import BytesIO
+from pyleus.storm import StormWentAwayError
+from pyleus.storm.instrumentation import Instrumentation
 from pyleus.testing import mock
 from pyleus.storm.serializers.json_serializer import JSONSerializer
 from testing.serializer import SerializerTestCase
 
 
+def _frame(msg):
+    return (json.dumps(msg) + "\nend\n").encode("utf-8")
+
+
 class TestJSONSerializer(SerializerTestCase):
 
     INSTANCE_CLS = JSONSerializer
@@ -19,32 +29,138 @@ class TestJSONSerializer(SerializerTestCase):
             'hello': "world",
         }
 
-        self.mock_input_stream.readline.side_effect = [
-            json.dumps(msg_dict),
-            "end",
-        ]
-
-        assert self.instance.read_msg() == msg_dict
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(_frame(msg_dict))):
+            assert self.instance.read_msg() == msg_dict
 
     def test_read_msg_list(self):
         msg_list = [3, 4, 5]
 
-        self.mock_input_stream.readline.side_effect = [
-            json.dumps(msg_list),
-            "end",
-        ]
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(_frame(msg_list))):
+            assert self.instance.read_msg() == msg_list
+
+    def test_read_msg_multiple_frames(self):
+        msg_list = [3, 4, 5]
+        msg_dict = {
+            'hello': "world\nend",
+            'unicode': u"\xe8",
+        }
+
+        encoded_msgs = _frame(msg_list) + _frame(msg_dict)
+
+        # A tiny read size splits both messages and delimiters across reads
+        instance = JSONSerializer(
+            self.mock_input_stream, self.mock_output_stream, read_size=3)
+
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(encoded_msgs)):
+            assert instance.read_msg() == msg_list
+            assert instance.read_msg() == msg_dict
 
-        assert self.instance.read_msg() == msg_list
+    def test_read_msg_eof(self):
+        with mock.patch.object(io, 'FileIO', return_value=BytesIO()):
+            with pytest.raises(StormWentAwayError):
+                self.instance.read_msg()
 
     def test_send_msg(self):
         msg_dict = {
             'hello': "world",
         }
 
-        expected_output = """{"hello": "world"}\nend\n"""
+        expected_output = b"""{"hello": "world"}\nend\n"""
 
         with mock.patch.object(
-                self.instance, '_output_stream', StringIO()) as sio:
+                self.instance, '_output_stream', BytesIO()) as sio:
             self.instance.send_msg(msg_dict)
 
         assert sio.getvalue() == expected_output
+
+    def test_send_msgs(self):
+        msg_dicts = [{'hello': "world"}, {'command': "sync"}]
+
+        output_stream = mock.Mock()
+        instance = JSONSerializer(self.mock_input_stream, output_stream)
+        instance.send_msgs(msg_dicts)
+
+        output_stream.write.assert_called_once_with(
+            b"".join(_frame(msg) for msg in msg_dicts))
+        output_stream.flush.assert_called_once_with()
+
+    def test_send_msgs_buffered(self):
+        msg_dicts = [{'hello': "world"}, {'command': "sync"}]
+
+        output_stream = mock.Mock()
+        instance = JSONSerializer(
+            self.mock_input_stream, output_stream, buffered=True)
+        instance.send_msgs(msg_dicts)
+
+        assert not output_stream.write.called
+
+        instance.flush()
+
+        output_stream.write.assert_called_once_with(
+            b"".join(_frame(msg) for msg in msg_dicts))
+
+    def test_send_msg_buffered(self):
+        msg_dicts = [{'hello': "world"}, {'command': "sync"}]
+
+        output_stream = mock.Mock()
+        instance = JSONSerializer(
+            self.mock_input_stream, output_stream, buffered=True)
+        for msg_dict in msg_dicts:
+            instance.send_msg(msg_dict)
+
+        assert not output_stream.write.called
+
+        instance.flush()
+
+        output_stream.write.assert_called_once_with(
+            b"".join(_frame(msg) for msg in msg_dicts))
+        output_stream.flush.assert_called_once_with()
+
+    def test_read_msg_flushes_buffer(self):
+        output_stream = mock.Mock()
+        instance = JSONSerializer(
+            self.mock_input_stream, output_stream, buffered=True)
+        instance.send_msg({'hello': "world"})
+
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(_frame([1]))):
+            instance.read_msg()
+
+        output_stream.write.assert_called_once_with(_frame({'hello': "world"}))
+
+    def test_read_msg_buffered_input_does_not_flush(self):
+        output_stream = mock.Mock()
+        instance = JSONSerializer(
+            self.mock_input_stream, output_stream, buffered=True)
+
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(_frame([1]) + _frame([2]))):
+            instance.read_msg()
+            instance.send_msg({'hello': "world"})
+            # The next message was read along with the first one
+            assert instance.read_msg() == [2]
+
+        assert not output_stream.write.called
+
+    def test_instrument(self):
+        instrumentation = Instrumentation()
+        output_stream = BytesIO()
+        instance = JSONSerializer(self.mock_input_stream, output_stream)
+        instance.instrument(instrumentation)
+
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(_frame([1]))):
+            assert instance.read_msg() == [1]
+        instance.send_msgs([{'hello': "world"}])
+        instance.send_msg({'command': "sync"})
+
+        histograms = instrumentation.histograms
+        assert histograms['read'].count == 1
+        assert histograms['deserialize'].count == 1
+        assert histograms['emit'].count == 2
+        assert instrumentation.counters['bytes_in'] == len(_frame([1]))
+        assert instrumentation.counters['bytes_out'] == len(
+            output_stream.getvalue())
@@ -1,9 +1,13 @@
+import io
 import os
 
 import msgpack
+import pytest
 
 from pyleus.compat import BytesIO
+from pyleus.storm import LazyStormTuple, StormTuple, StormWentAwayError
 from pyleus.testing import mock
+from pyleus.storm.serializers import serializer
 from pyleus.storm.serializers.msgpack_serializer import MsgpackSerializer
 from testing.serializer import SerializerTestCase
 
@@ -20,7 +24,7 @@ class TestMsgpackSerializer(SerializerTestCase):
         encoded_msg = msgpack.packb(msg_dict)
 
         with mock.patch.object(
-                os, 'read', return_value=encoded_msg, autospec=True):
+                io, 'FileIO', return_value=BytesIO(encoded_msg)):
 
             assert self.instance.read_msg() == msg_dict
 
@@ -30,10 +34,121 @@ class TestMsgpackSerializer(SerializerTestCase):
         encoded_msg = msgpack.packb(msg_list)
 
         with mock.patch.object(
-                os, 'read', return_value=encoded_msg, autospec=True):
+                io, 'FileIO', return_value=BytesIO(encoded_msg)):
 
             assert self.instance.read_msg() == msg_list
 
+    def test_read_msg_small_read_size(self):
+        msg_list = [3, 4, 5]
+        msg_dict = {
+            'hello': "world",
+        }
+
+        encoded_msgs = msgpack.packb(msg_list) + msgpack.packb(msg_dict)
+
+        instance = MsgpackSerializer(
+            self.mock_input_stream, self.mock_output_stream, read_size=3)
+
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(encoded_msgs)):
+            assert instance.read_msg() == msg_list
+            assert instance.read_msg() == msg_dict
+
+    def test_read_msg_without_memoryview(self):
+        msg_list = [3, 4, 5]
+        msg_dict = {
+            'hello': "world",
+        }
+
+        encoded_msgs = msgpack.packb(msg_list) + msgpack.packb(msg_dict)
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, encoded_msgs)
+        os.close(write_fd)
+
+        with os.fdopen(read_fd, "rb") as input_stream:
+            with mock.patch.object(serializer, '_HAS_MEMORYVIEW', False):
+                instance = MsgpackSerializer(
+                    input_stream, self.mock_output_stream, read_size=3)
+                assert instance.read_msg() == msg_list
+                assert instance.read_msg() == msg_dict
+
+    def test_read_msg_lazy_tuples(self):
+        setup_info = {'pidDir': "pid_dir", 'conf': {}, 'context': {}}
+        tuple_command = {
+            'id': "1234", 'comp': "spout", 'stream': "default", 'task': 3,
+            'tuple': ["x" * 100, [1, 2]],
+        }
+        taskids = [3, 4, 5]
+        spout_command = {'command': "ack", 'id': 1234}
+        msgs = [setup_info, tuple_command, taskids, spout_command]
+
+        encoded_msgs = b"".join(msgpack.packb(msg) for msg in msgs)
+
+        # A tiny read size splits messages across reads
+        instance = MsgpackSerializer(
+            self.mock_input_stream, self.mock_output_stream, read_size=7,
+            lazy_tuples=True)
+
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(encoded_msgs)):
+            assert instance.read_msg() == setup_info
+            tup = instance.read_msg()
+            assert instance.read_msg() == taskids
+            assert instance.read_msg() == spout_command
+
+        assert isinstance(tup, LazyStormTuple)
+        assert tup == StormTuple(
+            "1234", "spout", "default", 3, ["x" * 100, [1, 2]])
+
+    def test_read_msg_lazy_tuples_byte_by_byte(self):
+        tuple_commands = [{
+            'id': str(i), 'comp': "spout", 'stream': "default", 'task': i,
+            'tuple': ["x" * i, {'i': i}],
+        } for i in range(5)]
+
+        encoded_msgs = b"".join(msgpack.packb(msg) for msg in tuple_commands)
+
+        instance = MsgpackSerializer(
+            self.mock_input_stream, self.mock_output_stream, read_size=1,
+            lazy_tuples=True)
+
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(encoded_msgs)):
+            for msg in tuple_commands:
+                assert instance.read_msg() == StormTuple(
+                    msg['id'], msg['comp'], msg['stream'], msg['task'],
+                    msg['tuple'])
+            with pytest.raises(StormWentAwayError):
+                instance.read_msg()
+
+    def test_read_msg_lazy_tuples_any_read_size(self):
+        tuple_commands = [{
+            'id': str(i), 'comp': "spout", 'stream': "default", 'task': i,
+            'tuple': ["x" * 10 * i, list(range(i))],
+        } for i in range(3)]
+
+        encoded_msgs = b"".join(msgpack.packb(msg) for msg in tuple_commands)
+
+        for read_size in range(1, len(encoded_msgs) + 1):
+            with mock.patch.object(
+                    msgpack, 'Unpacker', wraps=msgpack.Unpacker) as unpacker:
+                instance = MsgpackSerializer(
+                    self.mock_input_stream, self.mock_output_stream,
+                    read_size=read_size, lazy_tuples=True)
+
+                with mock.patch.object(
+                        io, 'FileIO', return_value=BytesIO(encoded_msgs)):
+                    for msg in tuple_commands:
+                        assert instance.read_msg().values == msg['tuple']
+
+            # Messages spanning several reads are not parsed again
+            assert unpacker.call_count == 1
+
+    def test_read_msg_eof(self):
+        with mock.patch.object(io, 'FileIO', return_value=BytesIO()):
+            with pytest.raises(StormWentAwayError):
+                self.instance.read_msg()
+
     def test_send_msg(self):
         msg_dict = {
             'hello': "world",
@@ -46,3 +161,83 @@ class TestMsgpackSerializer(SerializerTestCase):
             self.instance.send_msg(msg_dict)
 
         assert sio.getvalue() == expected_output
+
+    def test_send_msgs(self):
+        msg_dicts = [{'hello': "world"}, {'command': "sync"}]
+
+        output_stream = mock.Mock()
+        instance = MsgpackSerializer(self.mock_input_stream, output_stream)
+        instance.send_msgs(msg_dicts)
+
+        output_stream.write.assert_called_once_with(
+            b"".join(msgpack.packb(msg) for msg in msg_dicts))
+        output_stream.flush.assert_called_once_with()
+
+    def test_send_msgs_buffered(self):
+        msg_dicts = [{'hello': "world"}, {'command': "sync"}]
+
+        output_stream = mock.Mock()
+        instance = MsgpackSerializer(
+            self.mock_input_stream, output_stream, buffered=True)
+        instance.send_msgs(msg_dicts)
+
+        assert not output_stream.write.called
+
+        instance.flush()
+
+        output_stream.write.assert_called_once_with(
+            b"".join(msgpack.packb(msg) for msg in msg_dicts))
+
+    def test_send_msg_buffered(self):
+        msg_dicts = [{'hello': "world"}, {'command': "sync"}]
+
+        output_stream = mock.Mock()
+        instance = MsgpackSerializer(
+            self.mock_input_stream, output_stream, buffered=True)
+        for msg_dict in msg_dicts:
+            instance.send_msg(msg_dict)
+
+        assert not output_stream.write.called
+
+        instance.flush()
+
+        output_stream.write.assert_called_once_with(
+            b"".join(msgpack.packb(msg) for msg in msg_dicts))
+        output_stream.flush.assert_called_once_with()
+
+    def test_send_msg_buffered_size_threshold(self):
+        output_stream = mock.Mock()
+        instance = MsgpackSerializer(
+            self.mock_input_stream, output_stream, buffered=True,
+            max_buffer_size=1)
+        instance.send_msg({'hello': "world"})
+
+        output_stream.write.assert_called_once_with(
+            msgpack.packb({'hello': "world"}))
+
+    def test_send_msg_buffered_age_threshold(self):
+        output_stream = mock.Mock()
+        instance = MsgpackSerializer(
+            self.mock_input_stream, output_stream, buffered=True,
+            max_buffer_age=10)
+
+        with mock.patch('time.time', side_effect=[100, 105, 111]):
+            instance.send_msg({'hello': "world"})
+            instance.send_msg({'hello': "world"})
+            assert not output_stream.write.called
+            instance.send_msg({'hello': "world"})
+
+        assert output_stream.write.call_count == 1
+
+    def test_read_msg_flushes_buffer(self):
+        output_stream = mock.Mock()
+        instance = MsgpackSerializer(
+            self.mock_input_stream, output_stream, buffered=True)
+        instance.send_msg({'hello': "world"})
+
+        with mock.patch.object(
+                io, 'FileIO', return_value=BytesIO(msgpack.packb([1]))):
+            instance.read_msg()
+
+        output_stream.write.assert_called_once_with(
+            msgpack.packb({'hello': "world"}))
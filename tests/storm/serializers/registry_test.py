@@ -0,0 +1,81 @@
+import importlib
+import sys
+
+import pytest
+
+from pyleus.storm import serializers
+from pyleus.storm.serializers import load_serializer
+from pyleus.storm.serializers import supports_batching
+from pyleus.storm.serializers.json_serializer import JSONSerializer
+from pyleus.storm.serializers.msgpack_serializer import MsgpackSerializer
+from pyleus.testing import mock
+from testing.serializer import CustomSerializer
+
+
+class TestLoadSerializer(object):
+
+    def test_builtin(self):
+        with mock.patch.object(
+                serializers, '_iter_entry_points') as mock_iter:
+            assert load_serializer("json") is JSONSerializer
+            assert load_serializer("msgpack") is MsgpackSerializer
+
+        assert not mock_iter.called
+
+    def test_dotted_path(self):
+        assert load_serializer(
+            "testing.serializer.CustomSerializer") is CustomSerializer
+        assert load_serializer(
+            "testing.serializer:CustomSerializer") is CustomSerializer
+
+    @pytest.mark.skipif(
+        sys.version_info < (3, 8), reason="needs importlib.metadata")
+    def test_entry_point(self):
+        metadata = importlib.import_module("importlib.metadata")
+        other = mock.Mock()
+        other.name = "other"
+        entry_point = mock.Mock()
+        entry_point.name = "custom"
+        entry_point.load.return_value = CustomSerializer
+
+        with mock.patch.object(metadata, 'entry_points',
+                               return_value=[other, entry_point]) as mock_eps:
+            assert load_serializer("custom") is CustomSerializer
+
+        mock_eps.assert_called_once_with(group=serializers.ENTRY_POINT_GROUP)
+        assert not other.load.called
+
+    def test_entry_point_pkg_resources(self):
+        entry_point = mock.Mock()
+        entry_point.load.return_value = CustomSerializer
+        pkg_resources = mock.Mock()
+        pkg_resources.iter_entry_points.return_value = [entry_point]
+
+        with mock.patch.dict(sys.modules, {
+                'importlib.metadata': None, 'pkg_resources': pkg_resources}):
+            assert load_serializer("custom") is CustomSerializer
+
+        pkg_resources.iter_entry_points.assert_called_once_with(
+            serializers.ENTRY_POINT_GROUP, "custom")
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            load_serializer("no_such_serializer")
+        with pytest.raises(ValueError):
+            load_serializer("testing.serializer.Nope")
+        with pytest.raises(ValueError):
+            load_serializer(None)
+
+    def test_not_a_serializer(self):
+        with pytest.raises(ValueError):
+            load_serializer("testing.serializer.SerializerTestCase")
+
+    def test_missing_send_msg(self):
+        with pytest.raises(ValueError):
+            load_serializer(
+                "testing.serializer.IncompleteSerializer")
+
+    def test_supports_batching(self):
+        assert supports_batching(JSONSerializer)
+        assert supports_batching(MsgpackSerializer)
+        assert not supports_batching(CustomSerializer)
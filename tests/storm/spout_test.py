@@ -1,7 +1,10 @@
 from collections import namedtuple
 import contextlib
+import time
 
-from pyleus.storm import Spout
+import pytest
+
+from pyleus.storm import Spout, BufferedSpout, BatchSpout, ReliableSpout
 from pyleus.testing import ComponentTestCase, mock
 
 
@@ -16,6 +19,19 @@ class TestSpout(ComponentTestCase):
 
         mock_send_command.assert_called_once_with('sync')
 
+    def test_instrumentation(self):
+        with mock.patch.multiple(self.instance,
+                _serializer=mock.DEFAULT,
+                ack=mock.DEFAULT) as values:
+            instrumentation = self.instance.enable_instrumentation()
+
+            self.instance._handle_command({'command': "ack", 'id': 1})
+
+            values['ack'].assert_called_once_with(1)
+
+        assert instrumentation.histograms['process'].count == 1
+        assert instrumentation.counters['acks'] == 1
+
     @contextlib.contextmanager
     def _test_emit_helper(self, expected_command_dict):
         with mock.patch.object(self.instance, 'read_taskid', autospec=True) as mock_read_taskid:
@@ -25,6 +41,15 @@ class TestSpout(ComponentTestCase):
         mock_read_taskid.assert_called_once_with()
         mock_send_command.assert_called_once_with('emit', expected_command_dict)
 
+    @contextlib.contextmanager
+    def _test_emit_helper_pipelined(self, expected_command_dict):
+        with mock.patch.object(self.instance, 'read_taskid', autospec=True) as mock_read_taskid:
+            with mock.patch.object(self.instance, 'send_command', autospec=True) as mock_send_command:
+                yield mock_send_command
+
+        assert mock_read_taskid.call_count == 0
+        mock_send_command.assert_called_once_with('emit', expected_command_dict)
+
     @contextlib.contextmanager
     def _test_emit_no_taskid_helper(self, expected_command_dict):
         with mock.patch.object(self.instance, 'read_taskid', autospec=True) as mock_read_taskid:
@@ -51,6 +76,16 @@ class TestSpout(ComponentTestCase):
         with self._test_emit_no_taskid_helper(expected_command_dict):
             self.instance.emit((1, 2, 3), need_task_ids=False)
 
+    def test_emit_pipelined(self):
+        expected_command_dict = {
+            'tuple': (1, 2, 3),
+        }
+
+        with self._test_emit_helper_pipelined(expected_command_dict):
+            future = self.instance.emit((1, 2, 3), pipelined=True)
+
+        assert not future.done()
+
     def test_emit_with_list(self):
         expected_command_dict = {
             'tuple': tuple([1, 2, 3]),
@@ -126,3 +161,290 @@ class TestSpout(ComponentTestCase):
             self.instance._handle_command(msg)
 
         mock_fail.assert_called_once_with(mock.sentinel.tuple_id)
+
+    def test_emit_many(self):
+        with mock.patch.object(
+                self.instance, '_send_emits', autospec=True) as mock_send_emits:
+            result = self.instance.emit_many(
+                [(1, 2), [3, 4]], tup_ids=[7, 8], pipelined=True)
+
+        assert result == mock_send_emits.return_value
+        mock_send_emits.assert_called_once_with([
+            {'id': 7, 'tuple': (1, 2)},
+            {'id': 8, 'tuple': (3, 4)},
+        ], True, True)
+
+    def test_emit_many_without_tup_ids(self):
+        with mock.patch.object(
+                self.instance, '_send_emits', autospec=True) as mock_send_emits:
+            self.instance.emit_many(iter([(1, 2)]))
+
+        mock_send_emits.assert_called_once_with([
+            {'tuple': (1, 2)},
+        ], True, False)
+
+
+class TestBufferedSpout(ComponentTestCase):
+
+    class CountSpout(BufferedSpout):
+        BATCH_SIZE = 2
+        HIGH_WATERMARK = 4
+        LOW_WATERMARK = 2
+
+        def generate(self):
+            for i in range(6):
+                self.generated.append(i)
+                yield (i,), (i if i % 2 else None)
+
+    INSTANCE_CLS = CountSpout
+
+    @pytest.fixture(autouse=True)
+    def setup_mocks(self, request):
+        self.instance.generated = []
+        patch = mock.patch.object(self.instance, 'emit_many')
+        self.mock_emit_many = patch.start()
+        request.addfinalizer(patch.stop)
+
+    def _start(self):
+        with mock.patch.object(Spout, 'run_component'):
+            self.instance.run_component()
+
+    def _wait_generated(self, count):
+        for _ in range(500):
+            if len(self.instance.generated) >= count:
+                break
+            time.sleep(0.01)
+        # Let the thread block
+        self.instance._generate_thread.join(0.05)
+
+    def test_next_tuple(self):
+        self.instance._buffer.extend([((0,), None), ((1,), 1), ((2,), None)])
+
+        self.instance.next_tuple()
+
+        self.mock_emit_many.assert_called_once_with(
+            ((0,), (1,)), tup_ids=(None, 1), need_task_ids=False)
+        assert len(self.instance._buffer) == 1
+
+    def test_next_tuple_empty(self):
+        self.instance.next_tuple()
+
+        assert not self.mock_emit_many.called
+
+    def test_watermarks(self):
+        self._start()
+        self._wait_generated(5)
+
+        # Paused with the buffer at the high watermark
+        assert self.instance._generate_thread.is_alive()
+        assert len(self.instance._buffer) == 4
+
+        # Still above the low watermark
+        self.instance.BATCH_SIZE = 1
+        self.instance.next_tuple()
+        self._wait_generated(5)
+        assert len(self.instance._buffer) == 3
+
+        self.instance.next_tuple()
+        self.instance._generate_thread.join(5)
+        assert not self.instance._generate_thread.is_alive()
+        assert [item[0] for item in self.instance._buffer] == [
+            (2,), (3,), (4,), (5,)]
+
+    def test_generate_error(self):
+        with mock.patch.object(
+                self.instance, 'generate', side_effect=ValueError()):
+            self.instance._generate_loop()
+
+        with pytest.raises(ValueError):
+            self.instance.next_tuple()
+
+    def test_get_buffer_metrics(self):
+        with mock.patch.object(time, 'time', return_value=10.0):
+            self.instance._empty_since = 4.0
+            for i in range(3):
+                self.instance._buffer_item(((i,), None))
+            self.instance.next_tuple()
+
+            metrics = self.instance.get_buffer_metrics()
+
+        assert metrics == {
+            'buffer': 1, 'mean_occupancy': 3.0, 'empty': 6.0, 'paused': 0.0}
+
+        with mock.patch.object(time, 'time', return_value=12.0):
+            self.instance.next_tuple()
+            self.instance.next_tuple()
+
+        with mock.patch.object(time, 'time', return_value=15.0):
+            metrics = self.instance.get_buffer_metrics()
+
+        assert metrics == {
+            'buffer': 0, 'mean_occupancy': 0.5, 'empty': 3.0, 'paused': 0.0}
+
+    def test_builtin_buffer_metrics(self):
+        with mock.patch.object(self.instance, '_serializer'):
+            self.instance._enable_builtin_metrics()
+
+        values = self.instance.metrics.get_values_and_reset()['values']
+        assert values['pyleus.buffer']['buffer'] == 0
+
+
+class TestBatchSpout(ComponentTestCase):
+
+    class CountSpout(BatchSpout):
+        BATCH_SIZE = 2
+
+    INSTANCE_CLS = CountSpout
+
+    @pytest.fixture(autouse=True)
+    def setup_mocks(self, request):
+        patches = mock.patch.multiple(self.instance, emit_many=mock.DEFAULT,
+                                      ack=mock.DEFAULT, fail=mock.DEFAULT)
+
+        request.addfinalizer(lambda: patches.__exit__(None, None, None))
+        values = patches.__enter__()
+        self.mock_emit_many = values['emit_many']
+        self.mock_ack = values['ack']
+        self.mock_fail = values['fail']
+
+    def test_next_tuple(self):
+        self.instance._buffer.extend([((0,), None), ((1,), 1), ((2,), None)])
+
+        self.instance.next_tuple()
+
+        self.mock_emit_many.assert_called_once_with(
+            ((0,), (1,)), tup_ids=(None, 1), need_task_ids=False)
+
+    def test_acks_collected(self):
+        self.instance._handle_command({'command': "ack", 'id': 1})
+        self.instance._handle_command({'command': "fail", 'id': 2})
+        assert not self.mock_ack.called
+        assert not self.mock_fail.called
+
+        self.instance._handle_command({'command': "next"})
+
+        self.mock_ack.assert_called_once_with(1)
+        self.mock_fail.assert_called_once_with(2)
+
+    def test_acks_batch_size(self):
+        with mock.patch.object(
+                self.instance, 'ack_many', autospec=True) as mock_ack_many:
+            for tup_id in (1, 2, 3):
+                self.instance._handle_command({'command': "ack", 'id': tup_id})
+
+        mock_ack_many.assert_called_once_with([1, 2])
+        assert self.instance._acked == [3]
+
+
+class TestReliableSpout(ComponentTestCase):
+
+    class CountSpout(ReliableSpout):
+        MAX_PENDING = 2
+        MAX_RETRIES = 2
+        RETRY_DELAY = 1.0
+        MAX_RETRY_DELAY = 1.5
+
+    INSTANCE_CLS = CountSpout
+
+    @pytest.fixture(autouse=True)
+    def setup_mocks(self, request):
+        patches = mock.patch.multiple(self.instance, emit=mock.DEFAULT,
+                                      emit_many=mock.DEFAULT,
+                                      next_values=mock.DEFAULT,
+                                      on_ack=mock.DEFAULT,
+                                      on_give_up=mock.DEFAULT)
+
+        request.addfinalizer(lambda: patches.__exit__(None, None, None))
+        values = patches.__enter__()
+        self.mock_emit = values['emit']
+        self.mock_emit_many = values['emit_many']
+        self.mock_next_values = values['next_values']
+        self.mock_on_ack = values['on_ack']
+        self.mock_on_give_up = values['on_give_up']
+        self.mock_next_values.side_effect = [("a", 1), ("b", 2), ("c", 3)]
+
+    def _next_tuple(self, now=0.0):
+        with mock.patch.object(time, 'time', return_value=now):
+            self.instance.next_tuple()
+
+    def _fail(self, tup_id, now=0.0):
+        with mock.patch.object(time, 'time', return_value=now):
+            self.instance.fail(tup_id)
+
+    def test_next_tuple(self):
+        self._next_tuple()
+        self._next_tuple()
+
+        assert self.mock_emit.call_args_list == [
+            mock.call(("a", 1), tup_id=0, need_task_ids=False),
+            mock.call(("b", 2), tup_id=1, need_task_ids=False),
+        ]
+        assert self.instance.pending_count == 2
+
+    def test_builtin_pending_metric(self):
+        with mock.patch.object(self.instance, '_serializer'):
+            self.instance._enable_builtin_metrics()
+        self._next_tuple()
+
+        values = self.instance.metrics.get_values_and_reset()['values']
+        assert values['pyleus.pending'] == 1
+
+    def test_next_tuple_nothing_to_emit(self):
+        self.mock_next_values.side_effect = None
+        self.mock_next_values.return_value = None
+
+        self._next_tuple()
+
+        assert not self.mock_emit.called
+        assert self.instance.pending_count == 0
+
+    def test_max_pending(self):
+        self._next_tuple()
+        self._next_tuple()
+        self._next_tuple()
+
+        assert self.mock_emit.call_count == 2
+        assert self.mock_next_values.call_count == 2
+
+        self.instance.ack(0)
+        self._next_tuple()
+
+        assert self.mock_emit.call_count == 3
+        self.mock_on_ack.assert_called_once_with(["a", 1])
+
+    def test_replay_backoff(self):
+        self._next_tuple()
+
+        self._fail(0, now=10.0)
+        self._next_tuple(now=10.5)
+        assert not self.mock_emit_many.called
+
+        self._next_tuple(now=11.0)
+        self.mock_emit_many.assert_called_once_with(
+            [["a", 1]], tup_ids=[0], need_task_ids=False)
+
+        # Second replay after twice the delay, capped to MAX_RETRY_DELAY
+        self._fail(0, now=20.0)
+        self._next_tuple(now=21.0)
+        assert self.mock_emit_many.call_count == 1
+        self._next_tuple(now=21.5)
+        assert self.mock_emit_many.call_count == 2
+
+    def test_give_up(self):
+        self._next_tuple()
+
+        for now in (0.0, 10.0):
+            self._fail(0, now=now)
+            self._next_tuple(now=now + 5)
+        self._fail(0, now=20.0)
+
+        self.mock_on_give_up.assert_called_once_with(["a", 1])
+        assert self.instance.pending_count == 0
+        assert not self.instance._replays
+
+    def test_unknown_tup_id(self):
+        self.instance.ack(42)
+        self.instance.fail(42)
+
+        assert not self.mock_on_ack.called
+        assert not self.instance._replays
@@ -0,0 +1,82 @@
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from pyleus.storm import StormTuple
+from pyleus.testing import ComponentTestCase, mock
+from pyleus.vector_bolt import VectorBolt
+
+
+class HeatIndexBolt(VectorBolt):
+
+    INPUT_FIELDS = ["id_sensor", "temp", "hum"]
+    OUTPUT_FIELDS = ["id_sensor", "heat"]
+
+    def process_columns(self, columns):
+        return {
+            'id_sensor': columns['id_sensor'],
+            'heat': columns['temp'] * 2 + columns['hum'],
+        }
+
+
+class TestVectorBolt(ComponentTestCase):
+
+    INSTANCE_CLS = HeatIndexBolt
+
+    @pytest.fixture(autouse=True)
+    def mock_emit_many(self):
+        self.instance.emit_many = mock.Mock()
+
+    def _tuples(self, *values_list):
+        return [StormTuple(i, None, None, None, values)
+                for i, values in enumerate(values_list)]
+
+    def test_process_batch(self):
+        self.instance.process_batch(
+            self._tuples(("a", 80.0, 40.5), ("b", 90.0, 50.0)))
+
+        self.instance.emit_many.assert_called_once_with(
+            [("a", 200.5), ("b", 230.0)], stream=None, need_task_ids=False)
+        emitted, = self.instance.emit_many.call_args[0]
+        # NumPy scalars are converted to builtin types
+        assert type(emitted[0][1]) is float
+
+    def test_process_batch_positional_columns(self):
+        self.instance.INPUT_FIELDS = None
+        with mock.patch.object(
+                self.instance, 'process_columns',
+                return_value=None) as mock_process_columns:
+            self.instance.process_batch(self._tuples((1, 2), (3, 4)))
+
+        columns, = mock_process_columns.call_args[0]
+        assert [column.tolist() for column in columns] == [[1, 3], [2, 4]]
+        assert not self.instance.emit_many.called
+
+    def test_process_batch_wrong_fields(self):
+        with pytest.raises(ValueError):
+            self.instance.process_batch(self._tuples((1, 2)))
+
+    def test_process_batch_different_lengths(self):
+        self.instance.INPUT_FIELDS = None
+        with pytest.raises(ValueError):
+            self.instance.process_batch(self._tuples((1, 2), (3, 4, 5)))
+
+    def test_emit_columns_list(self):
+        self.instance.emit_columns(
+            [["a", "b"], numpy.array([1, 2])], stream="other")
+
+        self.instance.emit_many.assert_called_once_with(
+            [("a", 1), ("b", 2)], stream="other")
+
+    def test_emit_columns_stream_fields(self):
+        self.instance.OUTPUT_FIELDS = {"other": ["x", "y"]}
+
+        self.instance.emit_columns(
+            {'y': numpy.array([1]), 'x': numpy.array([2])}, stream="other")
+
+        self.instance.emit_many.assert_called_once_with(
+            [(2, 1)], stream="other")
+
+    def test_emit_columns_different_lengths(self):
+        with pytest.raises(ValueError):
+            self.instance.emit_columns([[1, 2], [3]])
@@ -45,7 +45,10 @@ public class PyleusTopologyBuilder {
         final TopologySpec topologySpec) {
 
         PythonBolt bolt = pyFactory.createPythonBolt(spec.module,
-                spec.options, topologySpec.logging_config, topologySpec.serializer);
+                spec.options, topologySpec.logging_config, topologySpec.serializer,
+                topologySpec.serializer_options,
+                spec.profiler != null ? spec.profiler : topologySpec.profiler,
+                topologySpec.instrumentation);
         
         if (topologySpec.portable_interpreter != null) {
         	bolt.setPortableInterpreter(topologySpec.portable_interpreter);
@@ -183,7 +186,10 @@ public class PyleusTopologyBuilder {
             final TopologySpec topologySpec) {
 
         PythonSpout spout = pyFactory.createPythonSpout(spec.module,
-                spec.options, topologySpec.logging_config, topologySpec.serializer);
+                spec.options, topologySpec.logging_config, topologySpec.serializer,
+                topologySpec.serializer_options,
+                spec.profiler != null ? spec.profiler : topologySpec.profiler,
+                topologySpec.instrumentation);
         
         if (topologySpec.portable_interpreter != null) {
         	spout.setPortableInterpreter(topologySpec.portable_interpreter);
@@ -308,12 +314,12 @@ public class PyleusTopologyBuilder {
         StormTopology topology = buildTopology(spec);
 
         if (runLocally) {
-            runLocally(spec.name, topology, debug, spec.serializer);
+            runLocally(spec.name, topology, debug, spec.getSerializerProtocol());
         } else {
             Config conf = new Config();
             conf.setDebug(spec.topology_debug);
 
-            setSerializer(conf, spec.serializer);
+            setSerializer(conf, spec.getSerializerProtocol());
 
             if (spec.max_shellbolt_pending != -1) {
                 conf.put(Config.TOPOLOGY_SHELLBOLT_MAX_PENDING, spec.max_shellbolt_pending);
@@ -113,7 +113,9 @@ public class PythonComponentsFactory {
     }
     
     private String[] buildCommand(final String module, final Map<String, Object> argumentsMap,
-            final String loggingConfig, final String serializerConfig) {
+            final String loggingConfig, final String serializerConfig,
+            final Map<String, Object> serializerOptions, final Object profiler,
+            final Boolean instrumentation) {
     	
     	List<String> command = new ArrayList<String>();
     	
@@ -132,6 +134,15 @@ public class PythonComponentsFactory {
             Map<String, Object> pyleusConfig = new HashMap<String, Object>();
             pyleusConfig.put("logging_config_path", loggingConfig);
             pyleusConfig.put("serializer", serializerConfig);
+            if (serializerOptions != null) {
+                pyleusConfig.put("serializer_options", serializerOptions);
+            }
+            if (profiler != null) {
+                pyleusConfig.put("profiler", profiler);
+            }
+            if (instrumentation != null) {
+                pyleusConfig.put("instrumentation", instrumentation);
+            }
             Gson gson = new GsonBuilder().create();
             String json = gson.toJson(pyleusConfig);
             json = json.replace("\"", "\\\"");
@@ -144,17 +155,23 @@ public class PythonComponentsFactory {
 
     public PythonBolt createPythonBolt(final String module,
     		final Map<String, Object> argumentsMap,
-    		final String loggingConfig, final String serializerConfig) {
+    		final String loggingConfig, final String serializerConfig,
+    		final Map<String, Object> serializerOptions, final Object profiler,
+    		final Boolean instrumentation) {
 
         return new PythonBolt(buildCommand(module, argumentsMap,
-        		loggingConfig, serializerConfig));
+        		loggingConfig, serializerConfig, serializerOptions, profiler,
+        		instrumentation));
     }
 
     public PythonSpout createPythonSpout(final String module,
     		final Map<String, Object> argumentsMap,
-    		final String loggingConfig, final String serializerConfig) {
+    		final String loggingConfig, final String serializerConfig,
+    		final Map<String, Object> serializerOptions, final Object profiler,
+    		final Boolean instrumentation) {
 
         return new PythonSpout(buildCommand(module, argumentsMap,
-        		loggingConfig, serializerConfig));
+        		loggingConfig, serializerConfig, serializerOptions, profiler,
+        		instrumentation));
     }
 }
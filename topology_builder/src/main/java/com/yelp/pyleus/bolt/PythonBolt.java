@@ -8,6 +8,7 @@ import java.util.Map.Entry;
 import java.util.logging.Logger;
 
 import com.yelp.pyleus.PythonComponentsFactory;
+import com.yelp.pyleus.metric.PyleusShellMetric;
 
 import backtype.storm.Config;
 import backtype.storm.task.OutputCollector;
@@ -51,6 +52,8 @@ public class PythonBolt extends ShellBolt implements IRichBolt {
 			Logger.getGlobal().severe("Error updating the ShellBot command: " + ex);
 		}
     	
+    	// Metrics can only be registered while preparing
+    	PyleusShellMetric.register(stormConf, context);
     	super.prepare(stormConf, context, collector);
     }
     
@@ -0,0 +1,63 @@
+package com.yelp.pyleus.metric;
+
+import java.util.HashMap;
+import java.util.Map;
+import java.util.Map.Entry;
+
+import backtype.storm.Config;
+import backtype.storm.metric.api.rpc.IShellMetric;
+import backtype.storm.task.TopologyContext;
+import backtype.storm.utils.Utils;
+
+/**
+ * Metric receiving the metrics of a pyleus component through the multilang
+ * "metrics" command. Each flush carries a map of "counters", added up until
+ * Storm collects them, and a map of other "values", replacing the previous
+ * ones.
+ */
+public class PyleusShellMetric implements IShellMetric {
+    // Please keep in sync with python pyleus.storm.metrics
+    public static final String NAME = "pyleus";
+
+    private Map<String, Object> values = new HashMap<String, Object>();
+
+    public static void register(@SuppressWarnings("rawtypes") Map stormConf,
+            TopologyContext context) {
+        int bucketSizeSecs = Utils.getInt(
+                stormConf.get(Config.TOPOLOGY_BUILTIN_METRICS_BUCKET_SIZE_SECS));
+        context.registerMetric(NAME, new PyleusShellMetric(), bucketSizeSecs);
+    }
+
+    @Override
+    @SuppressWarnings("unchecked")
+    public synchronized void updateMetricFromRPC(Object params) {
+        Map<String, Object> paramsMap = (Map<String, Object>) params;
+
+        Map<String, Object> counters = (Map<String, Object>) paramsMap.get("counters");
+        if (counters != null) {
+            for (Entry<String, Object> counter : counters.entrySet()) {
+                long count = ((Number) counter.getValue()).longValue();
+                Object previous = values.get(counter.getKey());
+                if (previous instanceof Number) {
+                    count += ((Number) previous).longValue();
+                }
+                values.put(counter.getKey(), count);
+            }
+        }
+
+        Map<String, Object> others = (Map<String, Object>) paramsMap.get("values");
+        if (others != null) {
+            values.putAll(others);
+        }
+    }
+
+    @Override
+    public synchronized Object getValueAndReset() {
+        if (values.isEmpty()) {
+            return null;
+        }
+        Map<String, Object> result = values;
+        values = new HashMap<String, Object>();
+        return result;
+    }
+}
@@ -103,6 +103,11 @@ public class MessagePackSerializer implements ISerializer {
             }
         }
 
+        if (command.equals("metrics")) {
+            shellMsg.setMetricName(msg.get("name").asRawValue().getString());
+            shellMsg.setMetricParams(metricParamsToJavaType(msg.get("params")));
+        }
+
         String stream = Utils.DEFAULT_STREAM_ID;
         Value streamValue = msg.get("stream");
         if (streamValue != null) {
@@ -177,6 +182,31 @@ public class MessagePackSerializer implements ISerializer {
         }
     }
 
+    /* Unlike tuple values, metrics are never serialized by Kryo, and their
+     * names are expected to be strings by the metrics consumers.*/
+    private Object metricParamsToJavaType(Value element) {
+        switch (element.getType()) {
+            case RAW:
+                return element.asRawValue().getString();
+            case ARRAY:
+                List<Object> elementList = new ArrayList<Object>();
+                for (Value e:element.asArrayValue().getElementArray()) {
+                    elementList.add(metricParamsToJavaType(e));
+                }
+                return elementList;
+            case MAP:
+                Map<Object,Object> elementMap = new HashMap<Object,Object>();
+                for (Map.Entry<Value, Value> v:element.asMapValue().entrySet()) {
+                    elementMap.put(
+                            metricParamsToJavaType(v.getKey()),
+                            metricParamsToJavaType(v.getValue()));
+                }
+                return elementMap;
+            default:
+                return valueToJavaType(element);
+        }
+    }
+
     @Override
     public void writeBoltMsg(BoltMsg boltMsg) throws IOException {
         Map<String, Object> map = new HashMap<String, Object>();
@@ -13,4 +13,5 @@ public class BoltSpec {
     public Integer parallelism_hint = -1;
     public Integer tasks = -1;
     public List<Map<String, Object>> groupings;
+    public Object profiler;
 }
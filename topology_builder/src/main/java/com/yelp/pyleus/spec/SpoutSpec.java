@@ -11,4 +11,5 @@ public class SpoutSpec {
     public Float tick_freq_secs = -1.f;
     public Integer parallelism_hint = -1;
     public Integer tasks = -1;
+    public Object profiler;
 }
@@ -37,6 +37,12 @@ public class TopologySpec {
     public Integer transfer_buffer_size = -1;
 
     public String serializer = MSGPACK_SERIALIZER;
+    // Set by pyleus build when serializer is not a built-in one
+    public String serializer_protocol;
+    public Map<String, Object> serializer_options;
+    // Either a boolean or a map of profiler options
+    public Object profiler;
+    public Boolean instrumentation;
     public String logging_config;
     @SuppressWarnings("unused")
     public String requirements_filename; // Not used in Java.
@@ -48,6 +54,16 @@ public class TopologySpec {
     // Force the use of an interpreter instead of the one from virtualenv
     public String portable_interpreter;
 
+    /**
+     * Returns the multilang protocol spoken by the Python serializer
+     */
+    public String getSerializerProtocol() {
+        if (serializer_protocol != null) {
+            return serializer_protocol;
+        }
+        return serializer;
+    }
+
     private static Constructor getConstructor() {
         Constructor constructor = new Constructor(TopologySpec.class);
 
@@ -8,6 +8,7 @@ import java.util.Map.Entry;
 import java.util.logging.Logger;
 
 import com.yelp.pyleus.PythonComponentsFactory;
+import com.yelp.pyleus.metric.PyleusShellMetric;
 
 import backtype.storm.Config;
 import backtype.storm.spout.ShellSpout;
@@ -59,6 +60,8 @@ public class PythonSpout extends ShellSpout implements IRichSpout {
 			Logger.getGlobal().severe("Error updating the ShellSpout command: " + ex);
 		}
     	
+    	// Metrics can only be registered while opening
+    	PyleusShellMetric.register(stormConf, context);
     	super.open(stormConf, context, collector);
     }
 